@@ -0,0 +1,53 @@
+'''
+Benchmark the risk scoring function on synthetic accounts
+'''
+import time
+
+import numpy as np
+
+from django.core.management.base import BaseCommand
+
+from account import risk
+
+
+class Command(BaseCommand):
+    '''Django command to compare vectorized and per-account scoring'''
+    help = 'Benchmark vectorized risk scoring against scoring one account at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--accounts', type=int, default=1_000_000)
+        parser.add_argument('--chunk-size', type=int, default=risk.DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--sample', type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        '''Handle the command'''
+        count = options['accounts']
+        rng = np.random.default_rng(0)
+        features = {
+            'income': rng.lognormal(10.5, 0.6, count),
+            'balance': rng.normal(500, 2000, count),
+            'requested_total': rng.lognormal(8, 1, count),
+            'request_count': rng.integers(0, 5, count).astype(np.float64),
+            'max_term': rng.integers(1, 104, count).astype(np.float64),
+        }
+        features['income'][rng.random(count) < 0.05] = np.nan
+        score = risk.get_scoring_function()
+
+        start = time.perf_counter()
+        chunk_size = options['chunk_size']
+        for offset in range(0, count, chunk_size):
+            score({name: values[offset:offset + chunk_size] for name, values in features.items()})
+        vectorized = time.perf_counter() - start
+
+        sample = min(options['sample'], count)
+        start = time.perf_counter()
+        for i in range(sample):
+            score({name: values[i:i + 1] for name, values in features.items()})
+        per_account = (time.perf_counter() - start) / sample * count
+
+        self.stdout.write(f'{count} accounts, chunks of {chunk_size}')
+        self.stdout.write(f'vectorized    {vectorized:8.3f} s {count / vectorized:12.0f} accounts/s')
+        self.stdout.write(
+            f'one at a time {per_account:8.3f} s {count / per_account:12.0f} accounts/s '
+            f'(extrapolated from {sample})'
+        )
@@ -0,0 +1,35 @@
+'''
+Score the risk level of every borrower account
+'''
+import time
+
+from django.core.management.base import BaseCommand
+
+from account import risk
+
+
+class Command(BaseCommand):
+    '''Django command to run the batch risk scoring pipeline'''
+    help = 'Score the risk level of every borrower account'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=risk.DEFAULT_CHUNK_SIZE)
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Score partitions of account ids in this many processes',
+        )
+
+    def handle(self, *args, **options):
+        '''Handle the command'''
+        start = time.perf_counter()
+        scored = risk.score_all(
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+        )
+        elapsed = time.perf_counter() - start
+        rate = scored / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Scored {scored} accounts in {elapsed:.2f}s ({rate:.0f} accounts/s)'
+        ))
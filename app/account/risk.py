@@ -0,0 +1,170 @@
+'''
+Risk scoring for borrower accounts
+
+Features are loaded in chunks of accounts as NumPy arrays, scored by a
+vectorized scoring function and written back with bulk updates. The
+scoring function is pluggable through the RISK_SCORING_FUNCTION setting:
+it receives a dict of equally sized float arrays (see FEATURES) and
+returns an array of risk levels from 1 to 5. Missing values are NaN and
+amounts are in currency units, not cents.
+Batch scoring runs over every shard, see core.sharding.
+'''
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, Max, Min, Sum
+from django.utils.module_loading import import_string
+
+from core import sharding
+from core.models import MAX_RISK_LEVEL, MIN_RISK_LEVEL, Account
+from core.money import CENTS_PER_UNIT
+
+# Constants
+FEATURES = ['income', 'balance', 'requested_total', 'request_count', 'max_term']
+# Features loaded as cents, see core.money
+MONEY_FEATURES = {'balance', 'requested_total'}
+DEFAULT_CHUNK_SIZE = 10_000
+DEFAULT_SCORING_FUNCTION = 'account.risk.default_score'
+MIN_LEVEL = MIN_RISK_LEVEL
+MAX_LEVEL = MAX_RISK_LEVEL
+
+
+def default_score(features):
+    '''Score accounts from their debt to income ratio, balance and term'''
+    income = features['income']
+    requested = np.nan_to_num(features['requested_total'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        debt_to_income = requested / income
+
+    level = (
+        MIN_LEVEL
+        + (debt_to_income > 0.1)
+        + (debt_to_income > 0.3)
+        + (debt_to_income > 0.6)
+        + (features['balance'] < 0)
+        + (np.nan_to_num(features['max_term']) > 52)
+    )
+    # No declared income is the highest risk
+    level[~(income > 0)] = MAX_LEVEL
+    return np.clip(level, MIN_LEVEL, MAX_LEVEL).astype(np.int16)
+
+
+def get_scoring_function():
+    '''Return the configured scoring function'''
+    return import_string(getattr(settings, 'RISK_SCORING_FUNCTION', DEFAULT_SCORING_FUNCTION))
+
+
+def borrower_accounts():
+    '''Return borrower accounts annotated with their money request features'''
+    return Account.objects.filter(type='BORROWER').annotate(
+        requested_total=Sum('user__borrower__amount'),
+        request_count=Count('user__borrower'),
+        max_term=Max('user__borrower__term'),
+    )
+
+
+def to_arrays(rows):
+    '''Turn (id, *FEATURES) rows into an id array and a dict of feature arrays'''
+    if not rows:
+        return np.empty(0, dtype=np.int64), {name: np.empty(0) for name in FEATURES}
+    columns = list(zip(*rows))
+    ids = np.array(columns[0], dtype=np.int64)
+    features = {
+        name: np.array(column, dtype=np.float64)
+        for name, column in zip(FEATURES, columns[1:])
+    }
+    for name in MONEY_FEATURES:
+        features[name] /= CENTS_PER_UNIT
+    return ids, features
+
+
+def iter_chunks(start=None, stop=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    '''Yield (ids, features) for borrower accounts with start <= id < stop'''
+    queryset = borrower_accounts().order_by('id')
+    if stop is not None:
+        queryset = queryset.filter(id__lt=stop)
+    last_id = start - 1 if start is not None else None
+    while True:
+        chunk = queryset if last_id is None else queryset.filter(id__gt=last_id)
+        rows = list(chunk.values_list('id', *FEATURES)[:chunk_size])
+        if not rows:
+            return
+        yield to_arrays(rows)
+        last_id = rows[-1][0]
+
+
+def write_levels(ids, levels):
+    '''Store the risk level of each account'''
+    Account.objects.bulk_update(
+        [Account(id=int(pk), risk_level=int(level)) for pk, level in zip(ids, levels)],
+        ['risk_level'],
+        batch_size=1000,
+    )
+
+
+def score_range(start=None, stop=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    '''Score borrower accounts with start <= id < stop and return how many'''
+    score = get_scoring_function()
+    scored = 0
+    for ids, features in iter_chunks(start, stop, chunk_size):
+        write_levels(ids, score(features))
+        scored += len(ids)
+    return scored
+
+
+def _init_worker():
+    '''Set up Django in a worker process started with spawn'''
+    import django
+    django.setup()
+
+
+def _score_partition(job, chunk_size):
+    '''Score one (shard, bounds) partition in a worker process'''
+    alias, bounds = job
+    with sharding.use_shard(alias):
+        return score_range(*bounds, chunk_size=chunk_size)
+
+
+def partitions(workers):
+    '''Split the borrower account ids into contiguous ranges'''
+    bounds = Account.objects.filter(type='BORROWER').aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return []
+    edges = np.linspace(bounds['low'], bounds['high'] + 1, workers + 1).astype(np.int64)
+    return [(int(lo), int(hi)) for lo, hi in zip(edges[:-1], edges[1:]) if hi > lo]
+
+
+def score_all(chunk_size=DEFAULT_CHUNK_SIZE, workers=1):
+    '''Score every borrower account on every shard, in parallel when workers > 1'''
+    shards = sharding.get_shards()
+    if workers <= 1:
+        scored = 0
+        for alias in shards:
+            with sharding.use_shard(alias):
+                scored += score_range(chunk_size=chunk_size)
+        return scored
+
+    jobs = []
+    for alias in shards:
+        with sharding.use_shard(alias):
+            jobs += [(alias, bounds) for bounds in partitions(workers)]
+    # Forked workers must open their own connections, not share the parent's
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        return sum(executor.map(_score_partition, jobs, [chunk_size] * len(jobs)))
+
+
+def score_account(account):
+    '''Score one account synchronously and save its risk level'''
+    if account.type != 'BORROWER':
+        return None
+    rows = list(borrower_accounts().filter(id=account.id).values_list('id', *FEATURES))
+    ids, features = to_arrays(rows)
+    if not len(ids):
+        return None
+    account.risk_level = int(get_scoring_function()(features)[0])
+    Account.objects.filter(id=account.id).update(risk_level=account.risk_level)
+    return account.risk_level
@@ -1,10 +1,16 @@
+from decimal import Decimal
+
 from rest_framework import serializers
 
-from core.models import Account
+from core import audit
+from core.fields import MoneySerializerField
+from core.models import MAX_RISK_LEVEL, MIN_RISK_LEVEL, Account
 
 
 class AccountSerializer(serializers.ModelSerializer):
     '''Serializer for the account object'''
+    balance = MoneySerializerField(read_only=True)
+
     class Meta:
         '''Meta class for the account serializer'''
         model = Account
@@ -13,15 +19,41 @@ class AccountSerializer(serializers.ModelSerializer):
             'user',
             'type',
             'balance',
+            'income',
+            'risk_level',
+            'risk_appetite',
+            'version',
         ]
-        read_only_fields = ['id', 'user', 'balance']
+        read_only_fields = ['id', 'user', 'balance', 'risk_level', 'version']
+        extra_kwargs = {
+            'income': {'min_value': Decimal('0.00')},
+            'risk_appetite': {'min_value': MIN_RISK_LEVEL, 'max_value': MAX_RISK_LEVEL},
+        }
+
+
+    def create(self, validated_data):
+        '''Create an account and score it if it is a borrower'''
+        # Imported here so NumPy is not loaded at startup
+        from account import risk
+        instance = super().create(validated_data)
+        risk.score_account(instance)
+        return instance
 
 
     def update(self, instance, validated_data):
         '''Update an account, preventing the user from changing the type'''
         validated_data.pop('type', None)
+        income_changed = (
+            'income' in validated_data and validated_data['income'] != instance.income
+        )
+        before = audit.snapshot(instance)
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
-        return instance
\ No newline at end of file
+
+        if income_changed:
+            from account import risk
+            risk.score_account(instance)
+        audit.record_update(audit.get_actor(self.context), instance, before)
+        return instance
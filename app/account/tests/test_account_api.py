@@ -1,9 +1,12 @@
 from decimal import Decimal
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
+from django.db.models import F
 from django.test import TestCase
 from django.urls import reverse
 
-from rest_framework import status
+from rest_framework import status, viewsets
 from rest_framework.test import APIClient
 
 from core.models import Account
@@ -165,4 +168,38 @@ class PrivateAccountApiTests(TestCase):
         res = self.client.delete(url)
 
         self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
-        self.assertEqual(Account.objects.count(), 1)
\ No newline at end of file
+        self.assertEqual(Account.objects.count(), 1)
+
+
+    def test_update_income_scores_account(self):
+        '''Test that updating income rescores the account synchronously'''
+        borrower_account = create_borrower_account(borrower=self.borrower)
+
+        url = detail_url(borrower_account.id) # type: ignore
+        res = self.client.patch(url, {'income': Decimal('50000.00')})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['risk_level'], 1) # type: ignore
+        borrower_account.refresh_from_db()
+        self.assertEqual(borrower_account.risk_level, 1)
+
+
+    def test_update_lost_race_returns_412(self):
+        '''Test that an update racing another writer returns 412'''
+        borrower_account = create_borrower_account(borrower=self.borrower)
+        url = detail_url(borrower_account.id) # type: ignore
+
+        original_get_object = viewsets.ModelViewSet.get_object
+
+        # Another writer updates the row after this request loaded it
+        def get_object(view):
+            instance = original_get_object(view)
+            Account.objects.filter(id=instance.id).update(version=F('version') + 1)
+            return instance
+
+        with patch('account.views.viewsets.ModelViewSet.get_object', get_object):
+            res = self.client.patch(url, {'risk_appetite': 3})
+
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        borrower_account.refresh_from_db()
+        self.assertIsNone(borrower_account.risk_appetite)
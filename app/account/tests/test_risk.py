@@ -0,0 +1,80 @@
+from decimal import Decimal
+
+import numpy as np
+
+from django.test import TestCase, override_settings
+
+from core.models import Account
+from core.tests.factories import create_users, create_accounts, create_moneyrequests
+from account import risk
+
+
+def constant_score(features):
+    '''Scoring function that rates every account 2'''
+    return np.full(len(features['income']), 2)
+
+
+class RiskScoringTests(TestCase):
+    '''Test the risk scoring pipeline'''
+    def setUp(self):
+        '''Set up the test environment'''
+        self.users = create_users(6)
+        self.accounts = create_accounts(self.users, income=Decimal('50000.00'))
+
+    def test_default_score(self):
+        '''Test the default scoring function on a few feature vectors'''
+        features = {
+            'income': np.array([50000.0, 50000.0, np.nan, 1000.0]),
+            'balance': np.array([0.0, -10.0, 0.0, 0.0]),
+            'requested_total': np.array([np.nan, 40000.0, 100.0, 200.0]),
+            'request_count': np.array([0.0, 1.0, 1.0, 1.0]),
+            'max_term': np.array([np.nan, 104.0, 7.0, 7.0]),
+        }
+
+        levels = risk.default_score(features)
+
+        self.assertEqual(levels.tolist(), [1, 5, 5, 2])
+
+    def test_score_range_in_chunks(self):
+        '''Test scoring all accounts chunk by chunk writes every level'''
+        create_moneyrequests(self.users[:3], 3, amount=Decimal('40000.00'))
+
+        scored = risk.score_range(chunk_size=4)
+
+        self.assertEqual(scored, 6)
+        levels = dict(Account.objects.values_list('user_id', 'risk_level'))
+        self.assertEqual(levels[self.users[0].id], 4)
+        self.assertEqual(levels[self.users[5].id], 1)
+
+    def test_amounts_in_currency_units(self):
+        '''Test that amounts stored as cents reach the scoring function as units'''
+        create_moneyrequests(self.users[:1], 1, amount=Decimal('12.34'))
+        Account.objects.filter(id=self.accounts[0].id).update(balance=Decimal('-5.50'))
+
+        rows = list(risk.borrower_accounts().filter(id=self.accounts[0].id).values_list('id', *risk.FEATURES))
+        _, features = risk.to_arrays(rows)
+
+        self.assertEqual(features['requested_total'].tolist(), [12.34])
+        self.assertEqual(features['balance'].tolist(), [-5.5])
+
+    def test_score_range_skips_lenders(self):
+        '''Test that lender accounts are not scored'''
+        Account.objects.filter(id=self.accounts[0].id).update(type='LENDER')
+
+        self.assertEqual(risk.score_range(), 5)
+        self.assertIsNone(Account.objects.get(id=self.accounts[0].id).risk_level)
+
+    def test_partitions_cover_all_ids(self):
+        '''Test splitting account ids into contiguous ranges'''
+        ranges = risk.partitions(4)
+
+        ids = [account.id for account in self.accounts]
+        covered = [pk for pk in ids if any(lo <= pk < hi for lo, hi in ranges)]
+        self.assertEqual(covered, ids)
+
+    @override_settings(RISK_SCORING_FUNCTION='account.tests.test_risk.constant_score')
+    def test_pluggable_scoring_function(self):
+        '''Test that the scoring function comes from settings'''
+        risk.score_range()
+
+        self.assertEqual(set(Account.objects.values_list('risk_level', flat=True)), {2})
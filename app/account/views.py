@@ -1,18 +1,20 @@
 from rest_framework import viewsets
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.status import HTTP_405_METHOD_NOT_ALLOWED
 
+from core.authentication import CachedTokenAuthentication
+from core.concurrency import ConditionalUpdateMixin
 from core.models import Account
+from core.sharding import ShardRoutingMixin
 from account import serializers
 
 # Create your views here.
-class AccountViewSet(viewsets.ModelViewSet):
+class AccountViewSet(ShardRoutingMixin, ConditionalUpdateMixin, viewsets.ModelViewSet):
     '''Manage accounts in the database'''
     serializer_class = serializers.AccountSerializer
     queryset = Account.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -0,0 +1,54 @@
+'''
+Benchmark the portfolio loss simulation on synthetic positions
+'''
+import os
+import time
+
+import numpy as np
+
+from django.core.management.base import BaseCommand
+
+from analytics import simulation
+
+
+class Command(BaseCommand):
+    '''Django command to time the simulation in one and several processes'''
+    help = 'Benchmark the Monte Carlo loss simulation, by default 100k positions x 10k paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--positions', type=int, default=100_000)
+        parser.add_argument('--paths', type=int, default=10_000)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--seed', type=int, default=simulation.DEFAULT_SEED)
+
+    def handle(self, *args, **options):
+        '''Handle the command'''
+        count, paths = options['positions'], options['paths']
+        rng = np.random.default_rng(0)
+        positions = {
+            'id': np.arange(count, dtype=np.int64),
+            'amount': rng.integers(10_000, 5_000_000, count),
+            'term': rng.integers(1, 105, count),
+            'payments_per_year': rng.choice([12, 52], count),
+            'probability': rng.choice(list(simulation.DEFAULT_PROBABILITIES.values()), count),
+        }
+
+        self.stdout.write(f'{count} positions x {paths} paths')
+        results = {}
+        for workers in sorted({1, options['workers']}):
+            start = time.perf_counter()
+            results[workers] = simulation.simulate(positions, paths, options['seed'], workers)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'{workers:>2} worker(s) {elapsed:8.2f} s '
+                f'{count * paths / elapsed / 1e6:8.1f} M position-paths/s'
+            )
+
+        result = results[1]
+        self.stdout.write(
+            f'exposure {result["exposure"].to_decimal()} '
+            f'expected loss {result["expected_loss"].to_decimal()} '
+            f'VaR 99 {result["value_at_risk_99"].to_decimal()} '
+            f'ES 99 {result["expected_shortfall_99"].to_decimal()}'
+        )
+        self.stdout.write(f'same result in every run: {all(r == result for r in results.values())}')
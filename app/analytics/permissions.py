@@ -0,0 +1,17 @@
+from rest_framework import permissions
+
+from core.models import Account
+
+
+class IsLenderOrStaff(permissions.BasePermission):
+    '''Allow staff users and users holding a lender account'''
+    message = 'Only lenders and staff can view analytics.'
+
+    def has_permission(self, request, view):
+        '''Check the user is staff or has a lender account'''
+        user = request.user
+        if not (user and user.is_authenticated):
+            return False
+        if user.is_staff:
+            return True
+        return Account.objects.filter(user=user, type='LENDER').exists()
@@ -0,0 +1,104 @@
+from decimal import Decimal
+
+from rest_framework import serializers
+
+from core.fields import MoneySerializerField
+from core.models import MoneyRequestRollup, AccountRollup
+from core.money import Money
+
+# Constants
+SIMULATION_DEFAULT_PATHS = 1000
+SIMULATION_MAX_PATHS = 10_000
+
+
+def average(total, count):
+    '''Return total / count rounded to cents, or None for an empty bucket'''
+    if not count:
+        return None
+    return (Money(total).to_decimal() / count).quantize(Decimal('0.01'))
+
+
+class MoneyRequestRollupSerializer(serializers.ModelSerializer):
+    '''Serializer for a money request rollup bucket'''
+    total_amount = MoneySerializerField(read_only=True)
+    outstanding_principal = MoneySerializerField(read_only=True)
+    average_amount = serializers.SerializerMethodField()
+
+    class Meta:
+        '''Meta class for the money request rollup serializer'''
+        model = MoneyRequestRollup
+        fields = [
+            'term',
+            'frequency',
+            'count',
+            'funded_count',
+            'total_amount',
+            'outstanding_principal',
+            'average_amount',
+        ]
+        read_only_fields = fields
+
+    def get_average_amount(self, obj) -> str | None:
+        '''Return the average requested amount in the bucket'''
+        value = average(obj.total_amount, obj.count)
+        return None if value is None else str(value)
+
+
+class AccountRollupSerializer(serializers.ModelSerializer):
+    '''Serializer for an account rollup bucket'''
+    total_balance = MoneySerializerField(read_only=True)
+
+    class Meta:
+        '''Meta class for the account rollup serializer'''
+        model = AccountRollup
+        fields = ['type', 'count', 'total_balance']
+        read_only_fields = fields
+
+
+class TotalsSerializer(serializers.Serializer):
+    '''Serializer for portfolio wide money request totals'''
+    count = serializers.IntegerField()
+    funded_count = serializers.IntegerField()
+    total_amount = MoneySerializerField()
+    outstanding_principal = MoneySerializerField()
+    average_amount = serializers.DecimalField(max_digits=18, decimal_places=2, allow_null=True)
+
+
+class GroupTotalsSerializer(serializers.Serializer):
+    '''Serializer for money request totals grouped by one dimension'''
+    key = serializers.CharField()
+    count = serializers.IntegerField()
+    total_amount = MoneySerializerField()
+    average_amount = serializers.DecimalField(max_digits=18, decimal_places=2, allow_null=True)
+
+
+class PortfolioSerializer(serializers.Serializer):
+    '''Serializer for the portfolio analytics response'''
+    totals = TotalsSerializer()
+    by_term = GroupTotalsSerializer(many=True)
+    by_frequency = GroupTotalsSerializer(many=True)
+    buckets = MoneyRequestRollupSerializer(many=True)
+    accounts = AccountRollupSerializer(many=True)
+
+
+class SimulationParamsSerializer(serializers.Serializer):
+    '''Serializer for the loss simulation query parameters'''
+    paths = serializers.IntegerField(
+        required=False, default=SIMULATION_DEFAULT_PATHS, min_value=1, max_value=SIMULATION_MAX_PATHS,
+    )
+    seed = serializers.IntegerField(required=False, default=0, min_value=0)
+
+
+class SimulationSerializer(serializers.Serializer):
+    '''Serializer for the simulated losses of a lender's portfolio'''
+    positions = serializers.IntegerField()
+    paths = serializers.IntegerField()
+    seed = serializers.IntegerField()
+    version = serializers.CharField()
+    exposure = MoneySerializerField()
+    expected_loss = MoneySerializerField()
+    loss_std = MoneySerializerField()
+    value_at_risk_95 = MoneySerializerField()
+    value_at_risk_99 = MoneySerializerField()
+    expected_shortfall_99 = MoneySerializerField()
+    expected_defaults = serializers.FloatField()
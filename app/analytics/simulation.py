@@ -0,0 +1,193 @@
+'''
+Monte Carlo simulation of the losses on a lender's portfolio
+
+The positions, a lender's funded money requests, are loaded as NumPy
+arrays: amount in cents, number of payments (term), payments per year
+from the frequency and the yearly default probability of the borrower's
+risk level. Every path draws one uniform number per position. The
+borrower defaults when it falls below the probability of defaulting
+within the term, and the same number gives the payment at which it
+happens (inverse CDF of the geometric distribution). A default loses
+the principal not yet repaid, with straight line repayment, times the
+loss given default. Defaults are independent between borrowers.
+
+Positions are simulated in blocks of positions x paths, each block with
+its own generator spawned from the seed, so a seed gives the same result
+whatever the number of worker processes. Large portfolios are spread
+over a process pool. Results are cached per process for
+SIMULATION_CACHE_TTL seconds, keyed by a digest of the positions, which
+changes whenever an amount, a term or a risk level does.
+'''
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+
+from core import sharding
+from core.models import Account, MoneyRequest
+from core.money import Money
+from core.usercache import LRUCache
+
+# Constants
+DEFAULT_PATHS = 1000
+DEFAULT_SEED = 0
+DEFAULT_CACHE_TTL = 300
+CACHE_SIZE = 1000
+# Yearly default probability per risk level, unscored borrowers count as
+# the riskiest
+DEFAULT_PROBABILITIES = {1: 0.01, 2: 0.03, 3: 0.07, 4: 0.15, 5: 0.30}
+UNSCORED_PROBABILITY = DEFAULT_PROBABILITIES[5]
+LOSS_GIVEN_DEFAULT = 0.9
+PAYMENTS_PER_YEAR = {'WEEKLY': 52, 'MONTHLY': 12}
+DEFAULT_PAYMENTS_PER_YEAR = 12
+# Positions x paths per block, about 8 MB of float32
+BLOCK_ELEMENTS = 2_000_000
+# Below this many positions x paths a process pool costs more than it saves
+PARALLEL_THRESHOLD = 50_000_000
+
+_results = LRUCache()
+
+
+def reset():
+    '''Forget the cached results'''
+    _results.clear()
+
+
+def _positions_on(alias, lender_id):
+    '''Return (id, amount, term, frequency, risk level) rows of the funded requests on a shard'''
+    risk_level = Account.objects.filter(
+        user=OuterRef('borrower'), type='BORROWER',
+    ).order_by('-id').values('risk_level')[:1]
+    return list(
+        MoneyRequest.objects.using(alias)
+        .filter(lender_id=lender_id, status='FUNDED')
+        .annotate(risk_level=Subquery(risk_level))
+        .order_by('id')
+        .values_list('id', 'amount', 'term', 'frequency', 'risk_level')
+    )
+
+
+def load_positions(lender_id):
+    '''Return the arrays describing what a lender has funded, on every shard'''
+    rows = [
+        row
+        for shard_rows in sharding.for_each_shard(lambda alias: _positions_on(alias, lender_id))
+        for row in shard_rows
+    ]
+    return {
+        'id': np.array([row[0] for row in rows], dtype=np.int64),
+        'amount': np.array([row[1] for row in rows], dtype=np.int64),
+        'term': np.array([row[2] for row in rows], dtype=np.int64),
+        'payments_per_year': np.array(
+            [PAYMENTS_PER_YEAR.get(row[3], DEFAULT_PAYMENTS_PER_YEAR) for row in rows], dtype=np.int64,
+        ),
+        'probability': np.array(
+            [DEFAULT_PROBABILITIES.get(row[4], UNSCORED_PROBABILITY) for row in rows],
+            dtype=np.float64,
+        ),
+    }
+
+
+def portfolio_version(positions):
+    '''Return a digest of the positions, the key of cached results'''
+    digest = hashlib.blake2b(digest_size=16)
+    for name in sorted(positions):
+        digest.update(name.encode())
+        digest.update(np.ascontiguousarray(positions[name]).tobytes())
+    return digest.hexdigest()
+
+
+def simulate_block(amount, term, hazard, paths, seed):
+    '''Return the loss before recovery and the defaults of each path for a block of positions
+
+    hazard is the probability of defaulting at each payment. The block is
+    computed in place in float32, positions down and paths across.
+    '''
+    rng = np.random.default_rng(seed)
+    draws = rng.random((len(amount), paths), dtype=np.float32)
+    # Probability of defaulting at one of the term payments
+    within_term = (1 - (1 - hazard) ** term).astype(np.float32)
+    defaulted = draws < within_term[:, None]
+
+    # The payment missed is floor(log(1 - u) / log(1 - hazard)) + 1, which
+    # leaves term - floor(...) payments unpaid, at least one
+    np.log1p(np.negative(draws, out=draws), out=draws)
+    draws /= np.log1p(-hazard).astype(np.float32)[:, None]
+    np.floor(draws, out=draws)
+    np.subtract(term.astype(np.float32)[:, None], draws, out=draws)
+    np.maximum(draws, 1, out=draws)
+    draws *= (amount / term).astype(np.float32)[:, None]
+    draws *= defaulted
+
+    return draws.sum(axis=0, dtype=np.float64), defaulted.sum(axis=0)
+
+
+def _simulate_block(job):
+    '''Run simulate_block from a tuple of its arguments, for executor.map'''
+    return simulate_block(*job)
+
+
+def blocks(positions, paths, seed):
+    '''Yield simulate_block arguments covering every position'''
+    count = len(positions['amount'])
+    size = max(1, BLOCK_ELEMENTS // paths)
+    starts = range(0, count, size)
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+    hazard = 1 - (1 - positions['probability']) ** (1 / positions['payments_per_year'])
+    for start, block_seed in zip(starts, seeds):
+        stop = start + size
+        yield (
+            positions['amount'][start:stop],
+            positions['term'][start:stop],
+            hazard[start:stop],
+            paths,
+            block_seed,
+        )
+
+
+def simulate(positions, paths=DEFAULT_PATHS, seed=DEFAULT_SEED, workers=1):
+    '''Return loss statistics in cents over paths scenarios, at least one'''
+    losses = np.zeros(paths)
+    defaults = np.zeros(paths, dtype=np.int64)
+    jobs = blocks(positions, paths, seed)
+    if workers > 1 and len(positions['amount']) * paths >= PARALLEL_THRESHOLD:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_simulate_block, jobs, chunksize=4))
+    else:
+        results = map(_simulate_block, jobs)
+    for block_losses, block_defaults in results:
+        losses += block_losses
+        defaults += block_defaults
+    losses *= LOSS_GIVEN_DEFAULT
+
+    var_95, var_99 = np.quantile(losses, [0.95, 0.99])
+    return {
+        'positions': len(positions['amount']),
+        'paths': paths,
+        'seed': seed,
+        'exposure': Money(int(positions['amount'].sum())),
+        'expected_loss': Money(round(losses.mean())),
+        'loss_std': Money(round(losses.std())),
+        'value_at_risk_95': Money(round(var_95)),
+        'value_at_risk_99': Money(round(var_99)),
+        # Mean of the worst 1% of paths
+        'expected_shortfall_99': Money(round(losses[losses >= var_99].mean())),
+        'expected_defaults': float(defaults.mean()),
+    }
+
+
+def simulate_lender(lender_id, paths=DEFAULT_PATHS, seed=DEFAULT_SEED, workers=None):
+    '''Return the loss statistics of a lender's portfolio, cached per portfolio version'''
+    positions = load_positions(lender_id)
+    version = portfolio_version(positions)
+    key = (lender_id, version, paths, seed)
+    result = _results.get(key)
+    if result is None:
+        if workers is None:
+            workers = getattr(settings, 'SIMULATION_WORKERS', 1)
+        result = {**simulate(positions, paths, seed, workers), 'version': version}
+        _results.set(key, result, getattr(settings, 'SIMULATION_CACHE_TTL', DEFAULT_CACHE_TTL), CACHE_SIZE)
+    return result
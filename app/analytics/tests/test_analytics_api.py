@@ -0,0 +1,88 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Account, MoneyRequest
+
+PORTFOLIO_URL = reverse('analytics:portfolio')
+
+
+def create_user(**params):
+    '''Helper function to create a user'''
+    return get_user_model().objects.create_user(**params) # type: ignore
+
+
+def create_moneyrequest(borrower, **params):
+    '''Helper function to create a money request'''
+    defaults = {
+        'title': 'Test title',
+        'amount': Decimal('100.00'),
+        'frequency': 'WEEKLY',
+        'term': 7,
+    }
+    defaults.update(params)
+
+    return MoneyRequest.objects.create(borrower=borrower, **defaults)
+
+
+class PublicAnalyticsApiTests(TestCase):
+    '''Test the analytics API for unauthenticated users'''
+    def setUp(self):
+        '''Set up the test environment'''
+        self.client = APIClient()
+
+    def test_auth_required(self):
+        '''Test that authentication is required'''
+        res = self.client.get(PORTFOLIO_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateAnalyticsApiTests(TestCase):
+    '''Test the analytics API for authenticated users'''
+    def setUp(self):
+        '''Set up the test environment'''
+        self.client = APIClient()
+        self.borrower = create_user(email='borrower@testing.com', password='testing*123')
+        self.lender = create_user(email='lender@testing.com', password='testing*123')
+        Account.objects.create(user=self.lender, type='LENDER', balance=Decimal('500.00'))
+
+    def test_borrower_forbidden(self):
+        '''Test that users without a lender account cannot view analytics'''
+        self.client.force_authenticate(self.borrower)
+
+        res = self.client.get(PORTFOLIO_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_portfolio_totals(self):
+        '''Test the portfolio totals for a lender'''
+        create_moneyrequest(self.borrower, lender=self.lender)
+        create_moneyrequest(self.borrower, amount=Decimal('50.00'))
+        create_moneyrequest(self.borrower, term=12, frequency='MONTHLY')
+        self.client.force_authenticate(self.lender)
+
+        with self.assertNumQueries(3):
+            res = self.client.get(PORTFOLIO_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['totals'], { # type: ignore
+            'count': 3,
+            'funded_count': 1,
+            'total_amount': '250.00',
+            'outstanding_principal': '100.00',
+            'average_amount': '83.33',
+        })
+        self.assertEqual(
+            [(row['key'], row['count']) for row in res.data['by_term']], # type: ignore
+            [('7', 2), ('12', 1)],
+        )
+        self.assertEqual(len(res.data['buckets']), 2) # type: ignore
+        self.assertEqual(res.data['accounts'], [ # type: ignore
+            {'type': 'LENDER', 'count': 1, 'total_balance': '500.00'},
+        ])
@@ -0,0 +1,141 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+import numpy as np
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from analytics import simulation
+from core.models import Account, MoneyRequest
+from core.money import Money
+from core.tests import factories
+
+SIMULATION_URL = reverse('analytics:simulation')
+
+
+def create_user(**params):
+    '''Helper function to create a user'''
+    return get_user_model().objects.create_user(**params) # type: ignore
+
+
+def make_positions(count, probability=0.1, seed=0):
+    '''Helper function to build synthetic positions'''
+    rng = np.random.default_rng(seed)
+    return {
+        'id': np.arange(count, dtype=np.int64),
+        'amount': rng.integers(10_000, 1_000_000, count),
+        'term': rng.integers(1, 53, count),
+        'payments_per_year': np.full(count, 52),
+        'probability': np.full(count, probability),
+    }
+
+
+class SimulateTests(SimpleTestCase):
+    '''Test the vectorized simulation engine'''
+    def test_seed_reproducible(self):
+        '''Test that a seed gives the same result and another seed a different one'''
+        positions = make_positions(500)
+
+        first = simulation.simulate(positions, paths=200, seed=1)
+
+        self.assertEqual(simulation.simulate(positions, paths=200, seed=1), first)
+        self.assertNotEqual(simulation.simulate(positions, paths=200, seed=2), first)
+
+    @patch('analytics.simulation.PARALLEL_THRESHOLD', 0)
+    @patch('analytics.simulation.BLOCK_ELEMENTS', 10_000)
+    def test_same_result_with_workers(self):
+        '''Test that splitting blocks over processes does not change the result'''
+        positions = make_positions(500)
+
+        self.assertEqual(
+            simulation.simulate(positions, paths=100, seed=3, workers=2),
+            simulation.simulate(positions, paths=100, seed=3, workers=1),
+        )
+
+    def test_expected_loss_matches_closed_form(self):
+        '''Test the mean loss converges to the analytic expected loss'''
+        positions = make_positions(2000)
+        hazard = 1 - (1 - positions['probability']) ** (1 / positions['payments_per_year'])
+        term, amount = positions['term'], positions['amount']
+        expected = sum(
+            np.where(
+                missed <= term,
+                hazard * (1 - hazard) ** (missed - 1) * amount * (term - missed + 1) / term,
+                0,
+            ).sum()
+            for missed in range(1, 53)
+        ) * simulation.LOSS_GIVEN_DEFAULT
+
+        result = simulation.simulate(positions, paths=2000)
+
+        self.assertAlmostEqual(result['expected_loss'] / expected, 1, delta=0.01)
+        self.assertLessEqual(result['expected_loss'], result['value_at_risk_95'])
+        self.assertLessEqual(result['value_at_risk_99'], result['expected_shortfall_99'])
+
+    def test_empty_portfolio(self):
+        '''Test that nothing funded loses nothing'''
+        result = simulation.simulate(make_positions(0), paths=10)
+
+        self.assertEqual(result['expected_loss'], 0)
+        self.assertEqual(result['exposure'], 0)
+
+
+class SimulationApiTests(TestCase):
+    '''Test the loss simulation endpoint'''
+    def setUp(self):
+        '''Set up the test environment'''
+        simulation.reset()
+        self.addCleanup(simulation.reset)
+        self.client = APIClient()
+        self.lender = create_user(email='lender@testing.com', password='testing*123')
+        Account.objects.create(user=self.lender, type='LENDER')
+        self.client.force_authenticate(self.lender)
+        borrowers = factories.create_users(3, prefix='borrower')
+        factories.create_accounts(borrowers, risk_level=5)
+        factories.create_moneyrequests(
+            borrowers, 6, lender=self.lender, status='FUNDED', amount=Decimal('100.00'),
+        )
+        factories.create_moneyrequests(borrowers, 4)
+
+    def test_borrower_forbidden(self):
+        '''Test that users without a lender account cannot simulate'''
+        self.client.force_authenticate(create_user(email='b@testing.com', password='testing*123'))
+
+        res = self.client.get(SIMULATION_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_simulation(self):
+        '''Test the funded requests are simulated and amounts returned as strings'''
+        res = self.client.get(SIMULATION_URL, {'paths': 500, 'seed': 4})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['positions'], 6) # type: ignore
+        self.assertEqual(res.data['paths'], 500) # type: ignore
+        self.assertEqual(res.data['exposure'], '600.00') # type: ignore
+        self.assertGreater(Decimal(res.data['expected_loss']), 0) # type: ignore
+
+    def test_invalid_paths(self):
+        '''Test that the number of paths is bounded'''
+        res = self.client.get(SIMULATION_URL, {'paths': 10**9})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cached_by_portfolio_version(self):
+        '''Test a result is reused until the portfolio changes'''
+        with patch('analytics.simulation.simulate', wraps=simulation.simulate) as simulate:
+            first = self.client.get(SIMULATION_URL).data
+            self.client.get(SIMULATION_URL)
+            self.assertEqual(simulate.call_count, 1)
+
+            MoneyRequest.objects.filter(lender=self.lender).update(amount=Money('200.00'))
+            second = self.client.get(SIMULATION_URL).data
+
+        self.assertEqual(simulate.call_count, 2)
+        self.assertNotEqual(first['version'], second['version']) # type: ignore
+        self.assertEqual(second['exposure'], '1200.00') # type: ignore
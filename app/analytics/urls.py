@@ -0,0 +1,10 @@
+from django.urls import path
+
+from analytics import views
+
+app_name = 'analytics'
+
+urlpatterns = [
+    path('portfolio/', views.PortfolioView.as_view(), name='portfolio'),
+    path('simulation/', views.SimulationView.as_view(), name='simulation'),
+]
@@ -0,0 +1,81 @@
+from collections import defaultdict
+
+from drf_spectacular.utils import extend_schema
+
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.authentication import CachedTokenAuthentication
+from core.models import MoneyRequestRollup, AccountRollup
+from analytics import serializers
+from analytics.permissions import IsLenderOrStaff
+
+
+def group_totals(buckets, key):
+    '''Sum the buckets by one of their key fields'''
+    groups = defaultdict(lambda: {'count': 0, 'total_amount': 0})
+    for bucket in buckets:
+        group = groups[getattr(bucket, key)]
+        group['count'] += bucket.count
+        group['total_amount'] += bucket.total_amount
+    return [
+        {
+            'key': str(name),
+            'count': group['count'],
+            'total_amount': group['total_amount'],
+            'average_amount': serializers.average(group['total_amount'], group['count']),
+        }
+        for name, group in sorted(groups.items())
+        if group['count']
+    ]
+
+
+# Create your views here.
+class PortfolioView(APIView):
+    '''Portfolio totals served from the precomputed rollups'''
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated, IsLenderOrStaff]
+
+    @extend_schema(responses=serializers.PortfolioSerializer)
+    def get(self, request):
+        '''Return the portfolio totals, O(buckets) regardless of table size'''
+        buckets = list(MoneyRequestRollup.objects.filter(count__gt=0).order_by('term', 'frequency'))
+        accounts = AccountRollup.objects.filter(count__gt=0).order_by('type')
+
+        count = sum(bucket.count for bucket in buckets)
+        total_amount = sum(bucket.total_amount for bucket in buckets)
+        data = {
+            'totals': {
+                'count': count,
+                'funded_count': sum(bucket.funded_count for bucket in buckets),
+                'total_amount': total_amount,
+                'outstanding_principal': sum(bucket.outstanding_principal for bucket in buckets),
+                'average_amount': serializers.average(total_amount, count),
+            },
+            'by_term': group_totals(buckets, 'term'),
+            'by_frequency': group_totals(buckets, 'frequency'),
+            'buckets': buckets,
+            'accounts': accounts,
+        }
+
+        return Response(serializers.PortfolioSerializer(data).data)
+
+
+class SimulationView(APIView):
+    '''Monte Carlo estimate of the losses on what the user has funded'''
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated, IsLenderOrStaff]
+
+    @extend_schema(
+        parameters=[serializers.SimulationParamsSerializer],
+        responses=serializers.SimulationSerializer,
+    )
+    def get(self, request):
+        '''Return expected loss, value at risk and expected shortfall of the funded requests'''
+        # Imported here so NumPy is not loaded at startup
+        from analytics import simulation
+        params = serializers.SimulationParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        result = simulation.simulate_lender(request.user.pk, **params.validated_data)
+        return Response(serializers.SimulationSerializer(result).data)
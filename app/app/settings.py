@@ -52,18 +52,34 @@ INSTALLED_APPS = [
     'user',
     'account',
     'moneyrequest',
+    'analytics',
+    'home',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.UserCacheMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Responses smaller than this are not worth the CPU to compress
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+# No text/html: pages with a CSRF token next to user input would be open
+# to BREACH once compressed
+COMPRESSION_CONTENT_TYPES = [
+    'application/json',
+    'application/vnd.oai.openapi',
+    'text/plain',
+    'text/csv',
+]
+
 ROOT_URLCONF = 'app.urls'
 
 TEMPLATES = [
@@ -96,9 +112,23 @@ DATABASES = {
         'PASSWORD': os.getenv("DB_PASSWORD"),
         'HOST': os.getenv("DB_HOST"),
         'PORT': os.getenv("DB_PORT"),
+        'OPTIONS': {
+            # Seconds to wait for a connection, so a hung server fails fast
+            'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', '5')),
+        },
     }
 }
 
+# Users, tokens and the shard map stay on 'default'. Rows owned by a user
+# (see core.sharding.SHARDED_MODELS) live on one of SHARDS, each an extra
+# database on the same server named by DB_SHARDS, e.g. "loan_1,loan_2"
+SHARDS = ['default']
+for index, name in enumerate(filter(None, os.getenv('DB_SHARDS', '').split(',')), 1):
+    DATABASES[f'shard{index}'] = {**DATABASES['default'], 'NAME': name.strip()}
+    SHARDS.append(f'shard{index}')
+
+DATABASE_ROUTERS = ['core.routers.ShardRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -143,4 +173,62 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
-}
\ No newline at end of file
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'core.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'auth_token': os.getenv('THROTTLE_RATE_AUTH_TOKEN', '20/min'),
+        'signup': os.getenv('THROTTLE_RATE_SIGNUP', '10/min'),
+    },
+}
+
+# OpenAPI schema files written by "manage.py build_schema"
+SCHEMA_ARTIFACT_DIR = BASE_DIR / 'schema'
+
+# Cold start budget checked by "manage.py profile_startup"
+STARTUP_TIME_TARGET_MS = int(os.getenv('STARTUP_TIME_TARGET_MS', '1000'))
+
+# User rows and token owners cached by core.usercache, per process for
+# USER_CACHE_TTL seconds and in the named Django cache if set
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '10000'))
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '30'))
+USER_CACHE_SHARED_ALIAS = os.getenv('USER_CACHE_SHARED_ALIAS') or None
+
+# Seconds a process keeps the shard of a user, and how many ids it takes
+# from the central allocator at a time when there are several shards
+SHARD_MAP_TTL = int(os.getenv('SHARD_MAP_TTL', '60'))
+SHARD_ID_BLOCK_SIZE = int(os.getenv('SHARD_ID_BLOCK_SIZE', '100'))
+
+# Seconds a process keeps the responses of views decorated with
+# core.coalescing.coalesce, 0 only shares the concurrent computations
+COALESCE_CACHE_TTL = float(os.getenv('COALESCE_CACHE_TTL', '1'))
+COALESCE_CACHE_SIZE = int(os.getenv('COALESCE_CACHE_SIZE', '1000'))
+
+# Worker processes for large portfolio loss simulations, and seconds a
+# process keeps a result, see analytics.simulation
+SIMULATION_WORKERS = int(os.getenv('SIMULATION_WORKERS', '1'))
+SIMULATION_CACHE_TTL = int(os.getenv('SIMULATION_CACHE_TTL', '300'))
+
+# Audit trail of API changes, see core.audit: 'background' writes batches
+# from a thread, 'sync' before responding, 'off' not at all. Events that
+# cannot be queued or written go to AUDIT_FALLBACK_PATH for replay_audit.
+AUDIT_MODE = os.getenv('AUDIT_MODE', 'background')
+AUDIT_QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', '10000'))
+AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', '500'))
+AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', '1'))
+AUDIT_FALLBACK_PATH = os.getenv('AUDIT_FALLBACK_PATH', str(BASE_DIR / 'audit-fallback.jsonl'))
+
+# Share of requests profiled by core.middleware.ProfilingMiddleware, staff
+# can also ask for a profile with the X-Profile header
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_SAMPLE_INTERVAL = float(os.getenv('PROFILING_SAMPLE_INTERVAL', '0.005'))
+PROFILING_BUFFER_SIZE = int(os.getenv('PROFILING_BUFFER_SIZE', '50'))
+
+# Seconds /health/ready/ waits for the databases before reporting 503
+HEALTH_CHECK_TIMEOUT = float(os.getenv('HEALTH_CHECK_TIMEOUT', '2'))
+
+# Throttle buckets live in process memory ('local') or in the Django cache
+# ('cache') when several workers should share one budget
+THROTTLE_BUCKET_BACKEND = os.getenv('THROTTLE_BUCKET_BACKEND', 'local')
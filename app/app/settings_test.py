@@ -0,0 +1,49 @@
+"""
+Django settings for running the test suite.
+
+Usage: python manage.py test --settings=app.settings_test [--parallel]
+
+Passwords are hashed with MD5 so creating users is cheap, and the suite runs
+against an in-memory SQLite database unless a PostgreSQL host is configured
+(or TEST_SQLITE=0). With --parallel Django gives every worker process its own
+copy of the test database.
+"""
+
+import os
+
+from app.settings import *  # noqa: F401,F403
+
+SECRET_KEY = SECRET_KEY or 'insecure-test-secret-key'  # noqa: F405
+
+DEBUG = False
+
+# Hashing is not what the tests exercise, PBKDF2 makes every create_user slow
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+]
+
+if os.getenv('TEST_SQLITE', '0' if os.getenv('DB_HOST') else '1') == '1':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        }
+    }
+
+# Extra databases for the sharding tests, which turn them on with SHARDS
+SHARDS = ['default']
+for alias in ('shard1', 'shard2'):
+    name = DATABASES['default']['NAME']  # noqa: F405
+    DATABASES.setdefault(alias, {  # noqa: F405
+        **DATABASES['default'],  # noqa: F405
+        'NAME': name if name == ':memory:' else f'{name}_{alias}',
+    })
+
+# Rolled back test transactions reuse primary keys, a process wide user cache
+# would hand one test the users of another. Tests of the cache turn it on.
+USER_CACHE_TTL = 0
+COALESCE_CACHE_TTL = 0
+
+# A writer thread would commit outside the test transaction, tests see the
+# audit rows of their requests right away instead
+AUDIT_MODE = 'sync'
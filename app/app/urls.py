@@ -16,16 +16,37 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularSwaggerView,
+
+from core.views import (
+    PrecomputedSchemaView,
+    lazy_view,
+    liveness,
+    profile_collapsed,
+    profile_detail,
+    profile_list,
+    readiness,
 )
 
 urlpatterns = [
+    path('admin/profiles/', profile_list, name='profile-list'),
+    path('admin/profiles/<int:profile_id>/', profile_detail, name='profile-detail'),
+    path(
+        'admin/profiles/<int:profile_id>/collapsed/',
+        profile_collapsed,
+        name='profile-collapsed',
+    ),
     path('admin/', admin.site.urls),
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
-    path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='docs'),
+    path('health/live/', liveness, name='health-live'),
+    path('health/ready/', readiness, name='health-ready'),
+    path('api/schema/', PrecomputedSchemaView.as_view(), name='schema'),
+    path(
+        'api/docs/',
+        lazy_view('drf_spectacular.views.SpectacularSwaggerView', url_name='schema'),
+        name='docs',
+    ),
     path('api/user/', include('user.urls')),
     path('api/account/', include('account.urls')),
     path('api/moneyrequest/', include('moneyrequest.urls')),
+    path('api/analytics/', include('analytics.urls')),
+    path('api/home/', include('home.urls')),
 ]
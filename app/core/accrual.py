@@ -0,0 +1,184 @@
+'''
+Daily interest accrual on active contracts
+
+For a business date, every active contract that has started and carries a
+rate accrues remaining_balance * rate / (10_000 * 365) cents, rounded half
+away from zero, recorded as an InterestAccrual row. The interest owed on
+a contract is the sum of its accruals; remaining_balance is left alone.
+
+Contracts are read in chunks by id, through the partial index on active
+contracts, and the interest of a chunk is computed with NumPy and
+written with multi-row INSERT statements. A run is idempotent per business date:
+InterestAccrual is unique per (contract, business_date) and conflicting
+rows are skipped, so rerunning a date, whole or in part, changes nothing.
+A run is also resumable: after each chunk the last contract id written
+is stored in a JobWatermark per date, shard and id range, and a run
+started again after a crash carries on from there.
+Batch accrual runs over every shard, see core.sharding.
+'''
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from django.db import connections, router, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from core import money, sharding
+from core.models import Contract, InterestAccrual, JobWatermark
+
+# Constants
+ACCRUE_JOB = 'accrue_interest'
+DEFAULT_CHUNK_SIZE = 10_000
+DAYS_PER_YEAR = 365
+BASIS_POINTS = 10_000
+
+
+def active_contracts(business_date):
+    '''Return the contracts that accrue interest on business_date'''
+    return Contract.objects.filter(status='ACTIVE', start_date__lte=business_date, rate__gt=0)
+
+
+def daily_interest(balances, rates):
+    '''Return the interest in cents of one day on balances in cents at yearly rates in basis points'''
+    return money.apply_rate(balances, rates, scale=BASIS_POINTS * DAYS_PER_YEAR)
+
+
+def job_name(business_date, start=None):
+    '''Return the JobWatermark job of the id range starting at start for a date'''
+    return f'{ACCRUE_JOB}:{business_date.isoformat()}:{start or 0}'
+
+
+def iter_chunks(business_date, start=None, stop=None, chunk_size=DEFAULT_CHUNK_SIZE, after=0):
+    '''Yield (ids, borrower ids, balances, rates) arrays for contracts with start <= id < stop'''
+    queryset = active_contracts(business_date).order_by('id')
+    if start is not None:
+        queryset = queryset.filter(id__gte=start)
+    if stop is not None:
+        queryset = queryset.filter(id__lt=stop)
+    last_id = after
+    while True:
+        rows = list(
+            queryset.filter(id__gt=last_id)
+            .values_list('id', 'borrower_id', 'remaining_balance', 'rate')[:chunk_size]
+        )
+        if not rows:
+            return
+        yield tuple(np.array(column, dtype=np.int64) for column in zip(*rows))
+        last_id = rows[-1][0]
+
+
+def insert_accruals(connection, columns, rows):
+    '''Insert accrual rows, skipping the ones a previous run already wrote
+
+    A multi-row INSERT written by hand, building the statement through the
+    ORM costs more than running it.
+    '''
+    quote = connection.ops.quote_name
+    table = quote(InterestAccrual._meta.db_table)
+    names = ', '.join(quote(column) for column in columns)
+    conflict = ', '.join(quote(column) for column in ['contract_id', 'business_date'])
+    batch_size = max(1, connection.ops.bulk_batch_size(columns, rows))
+    # One commit for the whole chunk
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            values = ', '.join([f'({", ".join(["%s"] * len(columns))})'] * len(batch))
+            cursor.execute(
+                f'INSERT INTO {table} ({names}) VALUES {values} '
+                f'ON CONFLICT ({conflict}) DO NOTHING',
+                [value for row in batch for value in row],
+            )
+
+
+def post(alias, business_date, ids, borrower_ids, balances, rates):
+    '''Insert the accruals of a chunk of contracts on one shard, return how many have interest'''
+    amounts = daily_interest(balances, rates)
+    due = amounts > 0
+    if not due.any():
+        return 0
+    connection = connections[alias]
+    ops = connection.ops
+    columns = ['contract_id', 'borrower_id', 'balance', 'rate', 'amount']
+    arrays = [ids[due], borrower_ids[due], balances[due], rates[due], amounts[due]]
+    if len(sharding.get_shards()) > 1:
+        # Raw inserts skip the pre_save handler that does this
+        columns.append('id')
+        arrays.append(np.array(sharding.allocate_ids(InterestAccrual, int(due.sum())), dtype=np.int64))
+        sharding.ensure_users(alias, set(borrower_ids[due].tolist()))
+    fixed = [
+        ops.adapt_datefield_value(business_date),
+        ops.adapt_datetimefield_value(timezone.now()),
+    ]
+    columns += ['business_date', 'created_at']
+    rows = [row + fixed for row in np.column_stack(arrays).tolist()]
+    insert_accruals(connection, columns, rows)
+    return len(rows)
+
+
+def accrue_range(business_date, start=None, stop=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    '''Accrue interest on contracts with start <= id < stop and return how many were processed
+
+    Runs on the shard activated with sharding.use_shard, from the watermark
+    of the range.
+    '''
+    alias = router.db_for_write(Contract)
+    watermark, _ = JobWatermark.objects.using(sharding.users_database()).get_or_create(
+        job=job_name(business_date, start), alias=alias,
+    )
+    processed = 0
+    for ids, borrower_ids, balances, rates in iter_chunks(
+        business_date, start, stop, chunk_size, after=watermark.value,
+    ):
+        post(alias, business_date, ids, borrower_ids, balances, rates)
+        processed += len(ids)
+        watermark.value = int(ids[-1])
+        watermark.save(update_fields=['value', 'updated_at'])
+    return processed
+
+
+def _init_worker():
+    '''Set up Django in a worker process started with spawn'''
+    import django
+    django.setup()
+
+
+def _accrue_partition(job, business_date, chunk_size):
+    '''Accrue one (shard, bounds) partition in a worker process'''
+    alias, bounds = job
+    with sharding.use_shard(alias):
+        return accrue_range(business_date, *bounds, chunk_size=chunk_size)
+
+
+def partitions(business_date, workers):
+    '''Split the ids of the contracts accruing on business_date into contiguous ranges'''
+    bounds = active_contracts(business_date).aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return []
+    edges = np.linspace(bounds['low'], bounds['high'] + 1, workers + 1).astype(np.int64)
+    return [(int(lo), int(hi)) for lo, hi in zip(edges[:-1], edges[1:]) if hi > lo]
+
+
+def accrue(business_date, chunk_size=DEFAULT_CHUNK_SIZE, workers=1):
+    '''Accrue interest for business_date on every shard, in parallel when workers > 1
+
+    Returns how many contracts were processed by this run.
+    '''
+    shards = sharding.get_shards()
+    if workers <= 1:
+        processed = 0
+        for alias in shards:
+            with sharding.use_shard(alias):
+                processed += accrue_range(business_date, chunk_size=chunk_size)
+        return processed
+
+    jobs = []
+    for alias in shards:
+        with sharding.use_shard(alias):
+            jobs += [(alias, bounds) for bounds in partitions(business_date, workers)]
+    # Forked workers must open their own connections, not share the parent's
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        return sum(executor.map(
+            _accrue_partition, jobs, [business_date] * len(jobs), [chunk_size] * len(jobs),
+        ))
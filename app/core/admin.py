@@ -1,13 +1,84 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
 from core import models
 
+# Constants
+COUNT_LIMIT = 10_000
+ESTIMATE_THRESHOLD = 100_000
+
+
+class EstimatedCountPaginator(Paginator):
+    '''Paginator for large tables that avoids COUNT(*) over the whole table
+
+    An unfiltered changelist on PostgreSQL uses the planner row estimate
+    once the table is large. Otherwise rows are counted up to COUNT_LIMIT,
+    so only the first COUNT_LIMIT rows can be paged through; search or
+    filter to reach older ones. Pages first fetch their primary keys, which
+    the pk index answers without reading the rows, then load only those.
+    '''
+    @cached_property
+    def count(self):
+        '''Return the estimated or capped number of rows'''
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = self.estimated_count()
+            if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+                return estimate
+        # Without the ordering the database can stop at the limit
+        return queryset.order_by()[:COUNT_LIMIT].count()
+
+    def estimated_count(self):
+        '''Return the planner estimate of the table size, None if unknown'''
+        connection = connections[self.object_list.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [self.object_list.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # reltuples is -1 until the table is first analyzed
+        return int(row[0]) if row and row[0] >= 0 else None
+
+    def page(self, number):
+        '''Return a page, loading the rows by primary key'''
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        ids = list(self.object_list.values_list('pk', flat=True)[bottom:top])
+        return self._get_page(self.object_list.filter(pk__in=ids), number, self)
+
+
+def money_column(name):
+    '''Return a changelist column showing a Money field as an amount, not cents'''
+    @admin.display(description=name, ordering=name)
+    def column(obj):
+        return getattr(obj, name).to_decimal()
+    return column
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    '''Changelist settings for tables with millions of rows'''
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ['-id']
+
+
 # Register your models here.
 class UserAdmin(BaseUserAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     ordering = ['id']
     list_display = ['email', 'name']
+    list_filter = ['is_staff', 'is_superuser', 'is_active']
+    # Prefix search, served on PostgreSQL by core_user_email_upper_prefix_idx
+    search_fields = ['^email']
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
         (
@@ -38,5 +109,64 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
 
+
+class AccountAdmin(LargeTableAdmin):
+    list_display = ['id', 'user', 'type', money_column('balance'), 'risk_level']
+    list_select_related = ['user']
+    list_filter = ['type']
+    search_fields = ['^user__email']
+    autocomplete_fields = ['user']
+    readonly_fields = ['risk_level', 'version']
+
+
+class MoneyRequestAdmin(LargeTableAdmin):
+    list_display = ['id', 'title', 'borrower', 'lender', money_column('amount'), 'frequency', 'term']
+    list_select_related = ['borrower', 'lender']
+    search_fields = ['^borrower__email']
+    autocomplete_fields = ['borrower', 'lender']
+    readonly_fields = ['version']
+
+
+class ArchivedMoneyRequestAdmin(LargeTableAdmin):
+    list_display = ['id', 'title', 'borrower', 'lender', money_column('amount'), 'closed_at', 'archived_at']
+    list_select_related = ['borrower', 'lender']
+    search_fields = ['^borrower__email']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class ContractAdmin(LargeTableAdmin):
+    list_display = [
+        'id', 'borrower', 'lender', money_column('amount'), money_column('remaining_balance'),
+        'rate', 'due_date', 'status',
+    ]
+    list_select_related = ['borrower', 'lender']
+    list_filter = ['status']
+    search_fields = ['^borrower__email']
+    autocomplete_fields = ['borrower', 'lender']
+    readonly_fields = ['remaining_balance', 'closed_at']
+
+
+class AuditEventAdmin(LargeTableAdmin):
+    list_display = ['id', 'created_at', 'actor', 'action', 'model', 'object_id']
+    list_select_related = ['actor']
+    list_filter = ['action', 'model']
+    search_fields = ['^actor__email']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.MoneyRequest)
\ No newline at end of file
+admin.site.register(models.Account, AccountAdmin)
+admin.site.register(models.MoneyRequest, MoneyRequestAdmin)
+admin.site.register(models.ArchivedMoneyRequest, ArchivedMoneyRequestAdmin)
+admin.site.register(models.Contract, ContractAdmin)
+admin.site.register(models.AuditEvent, AuditEventAdmin)
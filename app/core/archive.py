@@ -0,0 +1,75 @@
+'''
+Archival of closed money requests
+
+Closed money requests are copied to ArchivedMoneyRequest and deleted from
+MoneyRequest in batches, each in its own transaction, so the hot table
+and its indexes only hold requests that are still open or funded. Each
+shard archives its own rows.
+'''
+from datetime import timedelta
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from core import sharding
+from core.models import ArchivedMoneyRequest, MoneyRequest
+
+# Constants
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_ARCHIVE_AFTER = timedelta(days=30)
+ARCHIVED_COLUMNS = [
+    field.column for field in ArchivedMoneyRequest._meta.concrete_fields
+    if field.name != 'archived_at'
+]
+
+
+def archivable(before):
+    '''Return the money requests closed before the given time'''
+    return MoneyRequest.objects.filter(status='CLOSED', closed_at__lt=before)
+
+
+def copy_to_archive(connection, ids):
+    '''Copy money requests to the archive inside the database
+
+    INSERT ... SELECT avoids loading the rows into Python, and rows already
+    archived by an interrupted run are skipped.
+    '''
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(column) for column in ARCHIVED_COLUMNS)
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(ArchivedMoneyRequest._meta.db_table)} '
+            f'({columns}, {quote("archived_at")}) '
+            f'SELECT {columns}, %s FROM {quote(MoneyRequest._meta.db_table)} '
+            f'WHERE {quote("id")} IN ({placeholders}) '
+            f'ON CONFLICT ({quote("id")}) DO NOTHING',
+            [connection.ops.adapt_datetimefield_value(timezone.now()), *ids],
+        )
+
+
+def archive_batch(before, batch_size=DEFAULT_BATCH_SIZE, using=None):
+    '''Move one batch of closed money requests and return how many'''
+    using = using or router.db_for_write(MoneyRequest)
+    with transaction.atomic(using=using):
+        ids = list(archivable(before).using(using).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return 0
+        copy_to_archive(connections[using], ids)
+        # Delete through the ORM so on_delete handlers and signals still run
+        MoneyRequest.objects.using(using).filter(id__in=ids).delete()
+    return len(ids)
+
+
+def archive_closed(before=None, batch_size=DEFAULT_BATCH_SIZE):
+    '''Archive every money request closed before the given time'''
+    if before is None:
+        before = timezone.now() - DEFAULT_ARCHIVE_AFTER
+    archived = 0
+    for alias in sharding.get_shards():
+        while True:
+            moved = archive_batch(before, batch_size, using=alias)
+            archived += moved
+            if moved < batch_size:
+                break
+    return archived
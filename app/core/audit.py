@@ -0,0 +1,318 @@
+'''
+Audit trail of changes made through the API
+
+The fields a write changes are captured while the request is handled, as
+{field: [old, new]}, and handed over once its transaction commits. With
+AUDIT_MODE 'background', the default, events go to a bounded in-memory
+queue that a thread of each process writes to AuditEvent in batches,
+every AUDIT_FLUSH_INTERVAL seconds or as soon as AUDIT_BATCH_SIZE events
+are waiting, so requests never wait for the audit INSERT. 'sync' writes
+each event before the response is sent, 'off' records nothing.
+
+Events are not lost when the queue is full, when the database rejects a
+batch or when the process exits with events still queued: they are
+appended to the AUDIT_FALLBACK_PATH file, one JSON object per line, and
+"manage.py replay_audit" loads them. Every event has a unique event_id,
+so writing one twice stores it once. Passwords are never recorded, only
+the fact that they changed.
+'''
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import uuid
+from functools import partial
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connections, router, transaction
+from django.utils import timezone
+
+from core import sharding
+from core.models import AuditEvent
+
+# Constants
+MODES = ('background', 'sync', 'off')
+DEFAULT_MODE = 'background'
+DEFAULT_QUEUE_SIZE = 10_000
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_FALLBACK_PATH = 'audit-fallback.jsonl'
+# Seconds a process exit waits for the last batch before spilling to file
+STOP_TIMEOUT = 5.0
+REDACTED = '[redacted]'
+EXCLUDED_FIELDS = ('password',)
+EVENT_FIELDS = ['event_id', 'actor', 'model', 'object_id', 'action', 'changes', 'created_at']
+
+logger = logging.getLogger(__name__)
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def snapshot(instance):
+    '''Return the loaded column values of instance, keyed by attname
+
+    Deferred columns are left out rather than loaded.
+    '''
+    return {
+        field.attname: instance.__dict__[field.attname]
+        for field in instance._meta.concrete_fields
+        if field.attname in instance.__dict__ and field.name not in EXCLUDED_FIELDS
+    }
+
+
+def get_actor(context):
+    '''Return the user of the request in a serializer context, if any'''
+    return getattr(context.get('request'), 'user', None)
+
+
+def write_events(events):
+    '''Store events in AuditEvent, skipping the ones already stored
+
+    A multi-row INSERT written by hand: bulk_create takes several times
+    longer to build it, time the writer thread holds the GIL that requests
+    are waiting for.
+    '''
+    connection = connections[sharding.users_database()]
+    quote = connection.ops.quote_name
+    fields = [AuditEvent._meta.get_field(name) for name in EVENT_FIELDS]
+    names = ', '.join(quote(field.column) for field in fields)
+    placeholders = f'({", ".join(["%s"] * len(fields))})'
+    batch_size = max(1, connection.ops.bulk_batch_size(fields, events))
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        for start in range(0, len(events), batch_size):
+            batch = events[start:start + batch_size]
+            cursor.execute(
+                f'INSERT INTO {quote(AuditEvent._meta.db_table)} ({names}) '
+                f'VALUES {", ".join([placeholders] * len(batch))} '
+                f'ON CONFLICT ({quote("event_id")}) DO NOTHING',
+                [
+                    field.get_db_prep_save(event[field.attname], connection)
+                    for event in batch for field in fields
+                ],
+            )
+
+
+class AuditWriter:
+    '''Bounded queue of audit events written in batches by a background thread'''
+    def __init__(self, write, size=DEFAULT_QUEUE_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                 interval=DEFAULT_FLUSH_INTERVAL, fallback_path=DEFAULT_FALLBACK_PATH):
+        self.write = write
+        self.size = size
+        self.batch_size = batch_size
+        self.interval = interval
+        self.fallback_path = fallback_path
+        self.queue = queue.Queue(maxsize=size)
+        self.spilled = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def start(self):
+        '''Start the writer thread of this process if it is not running'''
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            # A forked process gets a copy of the parent's queue, which the
+            # parent writes, and no thread
+            self.queue = queue.Queue(maxsize=self.size)
+            self._wake = threading.Event()
+            self._stop = threading.Event()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def put(self, event):
+        '''Queue an event without waiting, spilling it to file if the queue is full'''
+        self.start()
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.spill([event])
+            return
+        if self.queue.qsize() >= self.batch_size:
+            self._wake.set()
+
+    def take(self):
+        '''Return up to batch_size queued events'''
+        events = []
+        while len(events) < self.batch_size:
+            try:
+                events.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return events
+
+    def flush(self):
+        '''Write every queued event, return how many'''
+        written = 0
+        while events := self.take():
+            try:
+                self.write(events)
+            except Exception:
+                logger.exception('Could not write %d audit events', len(events))
+                self.spill(events)
+            written += len(events)
+        return written
+
+    def spill(self, events):
+        '''Append events to the fallback file, for replay_audit'''
+        lines = ''.join(json.dumps(event, cls=DjangoJSONEncoder) + '\n' for event in events)
+        try:
+            with self._lock, open(self.fallback_path, 'a', encoding='utf-8') as file:
+                file.write(lines)
+                file.flush()
+                os.fsync(file.fileno())
+        except OSError:
+            logger.exception('Lost %d audit events: %s', len(events), lines)
+            return
+        self.spilled += len(events)
+
+    def _run(self):
+        '''Write batches until stopped, then what is left'''
+        try:
+            while not self._stop.is_set():
+                self._wake.wait(self.interval)
+                self._wake.clear()
+                close_old_connections()
+                self.flush()
+            self.flush()
+        finally:
+            connections.close_all()
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        '''Write what is queued and stop the thread, called at process exit'''
+        thread = self._thread
+        if thread is None or self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._wake.set()
+        thread.join(timeout)
+        self._thread = None
+        # Whatever a stuck database kept the thread from writing
+        leftover = []
+        while events := self.take():
+            leftover += events
+        if leftover:
+            self.spill(leftover)
+
+
+def get_writer():
+    '''Return the writer of this process, created from the settings'''
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AuditWriter(
+                    write_events,
+                    size=getattr(settings, 'AUDIT_QUEUE_SIZE', DEFAULT_QUEUE_SIZE),
+                    batch_size=getattr(settings, 'AUDIT_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+                    interval=getattr(settings, 'AUDIT_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL),
+                    fallback_path=getattr(settings, 'AUDIT_FALLBACK_PATH', DEFAULT_FALLBACK_PATH),
+                )
+                atexit.register(_writer.stop)
+    return _writer
+
+
+def get_mode():
+    '''Return how events are written, see MODES'''
+    mode = getattr(settings, 'AUDIT_MODE', DEFAULT_MODE)
+    return mode if mode in MODES else DEFAULT_MODE
+
+
+def submit(event):
+    '''Hand a committed event to the writer, or write it now in sync mode'''
+    if get_mode() == 'sync':
+        write_events([event])
+    else:
+        get_writer().put(event)
+
+
+def record(actor, instance, action, changes, object_id=None):
+    '''Record changes to instance once the transaction that saved it commits'''
+    if not changes or get_mode() == 'off':
+        return
+    event = {
+        'event_id': uuid.uuid4().hex,
+        'actor_id': getattr(actor, 'pk', None),
+        'model': instance._meta.label_lower,
+        'object_id': instance.pk if object_id is None else object_id,
+        'action': action,
+        'changes': changes,
+        'created_at': timezone.now(),
+    }
+    using = instance._state.db or router.db_for_write(type(instance), instance=instance)
+    transaction.on_commit(partial(submit, event), using=using)
+
+
+def record_create(actor, instance):
+    '''Record a new instance, every field going from None to its value'''
+    record(actor, instance, 'CREATE', {
+        name: [None, value] for name, value in snapshot(instance).items()
+    })
+
+
+def record_update(actor, instance, before, redacted=()):
+    '''Record the fields of instance that differ from the snapshot before
+
+    Fields named in redacted changed, but their values are not recorded.
+    '''
+    after = snapshot(instance)
+    changes = {
+        name: [before[name], value]
+        for name, value in after.items()
+        if name in before and before[name] != value
+    }
+    changes.update({name: [REDACTED, REDACTED] for name in redacted})
+    record(actor, instance, 'UPDATE', changes)
+
+
+def record_delete(actor, instance, before):
+    '''Record a deleted instance from the snapshot taken before the delete'''
+    pk = before[instance._meta.pk.attname]
+    record(actor, instance, 'DELETE', {
+        name: [value, None] for name, value in before.items()
+    }, object_id=pk)
+
+
+def load_file(path, batch_size=DEFAULT_BATCH_SIZE):
+    '''Store the events of a fallback file, return how many'''
+    loaded = 0
+    batch = []
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                batch.append(json.loads(line))
+            if len(batch) >= batch_size:
+                write_events(batch)
+                loaded += len(batch)
+                batch = []
+    if batch:
+        write_events(batch)
+        loaded += len(batch)
+    return loaded
+
+
+def replay(path, batch_size=DEFAULT_BATCH_SIZE):
+    '''Store the events of a fallback file and remove it, return how many
+
+    The file is renamed first, so events spilled meanwhile start a new one.
+    A file left renamed by a replay that failed is loaded first.
+    '''
+    replaying = f'{path}.replaying'
+    replayed = 0
+    for _ in range(2):
+        if not os.path.exists(replaying):
+            if not os.path.exists(path):
+                break
+            os.replace(path, replaying)
+        replayed += load_file(replaying, batch_size)
+        os.remove(replaying)
+    return replayed
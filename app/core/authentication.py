@@ -0,0 +1,26 @@
+'''
+Authentication backed by the user cache
+'''
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core import usercache
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    '''Token authentication that reads the token owner from core.usercache
+
+    A warm request authenticates without any query. request.auth is an
+    unsaved Token carrying the key and user id.
+    '''
+    def authenticate_credentials(self, key):
+        '''Return (user, token) for a token key'''
+        user_id = usercache.get_token_user_id(key)
+        user = usercache.get_user(user_id) if user_id is not None else None
+        if user is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return user, Token(key=key, user_id=user_id)
@@ -0,0 +1,111 @@
+'''
+Bulk data for the bench_* management commands
+
+Each helper issues a single INSERT for the whole batch. Bench users get an
+unusable password and an address under BENCH_DOMAIN, so the rows a
+benchmark leaves behind cannot be logged into. Commands refuse to write
+unless DEBUG is on or the database is named with --database, and delete
+what they created when they finish.
+'''
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import CommandError
+
+from core import models, rollups, sharding
+
+# Constants
+BENCH_DOMAIN = 'bench.invalid'
+DELETE_BATCH_SIZE = 10_000
+
+
+def add_database_argument(parser):
+    '''Add the --database option naming the database bench data goes to'''
+    parser.add_argument(
+        '--database',
+        help='Database the bench data is written to, required unless DEBUG is on',
+    )
+
+
+def check_database(database):
+    '''Return the alias bench data is written to, raising CommandError if it may not be'''
+    target = sharding.users_database()
+    if database is None:
+        if not settings.DEBUG:
+            raise CommandError(
+                f'Refusing to write bench data to "{target}" with DEBUG off, '
+                f'name it with --database {target} to proceed'
+            )
+    elif database != target:
+        raise CommandError(f'Bench data is written to "{target}", not "{database}"')
+    return target
+
+
+def unique_prefix(name):
+    '''Return an email prefix no earlier run has used'''
+    return f'{name}{time.time_ns()}-'
+
+
+def create_users(count, prefix, **params):
+    '''Create count users that cannot log in and return them'''
+    password = make_password(None)
+    return get_user_model().objects.bulk_create([
+        get_user_model()(
+            email=f'{prefix}{i}@{BENCH_DOMAIN}',
+            password=password,
+            **params,
+        )
+        for i in range(count)
+    ])
+
+
+def create_accounts(users, **params):
+    '''Create one account per user and return them'''
+    defaults = {
+        'type': 'BORROWER',
+    }
+    defaults.update(params)
+
+    return models.Account.objects.bulk_create([
+        models.Account(user=user, **defaults) for user in users
+    ])
+
+
+def create_moneyrequests(borrowers, count, **params):
+    '''Create count money requests spread over borrowers and return them'''
+    defaults = {
+        'title': 'Test title',
+        'description': 'Test description',
+        'amount': Decimal('777.77'),
+        'frequency': 'WEEKLY',
+        'term': 7,
+    }
+    defaults.update(params)
+
+    return models.MoneyRequest.objects.bulk_create([
+        models.MoneyRequest(borrower=borrowers[i % len(borrowers)], **defaults)
+        for i in range(count)
+    ])
+
+
+def delete_users(prefix, batch_size=DELETE_BATCH_SIZE):
+    '''Delete the bench users created with prefix and every row they own
+
+    The rows were inserted without updating the rollups, which are
+    rebuilt afterwards. Returns how many users were deleted.
+    '''
+    User = get_user_model()
+    users = User.objects.filter(email__startswith=prefix, email__endswith=f'@{BENCH_DOMAIN}')
+    deleted = 0
+    while True:
+        ids = list(users.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        User.objects.filter(id__in=ids).delete()
+        deleted += len(ids)
+    if deleted:
+        rollups.rebuild_rollups()
+    return deleted
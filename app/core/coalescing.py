@@ -0,0 +1,181 @@
+'''
+Single-flight coalescing of expensive read views
+
+A DRF handler decorated with coalesce() runs once for the identical
+requests a process receives while it is running: the first request
+computes the response, the others wait for it and get a copy of its
+data. Identical means the same view, handler, path with query string and
+accepted media type, and the same user unless per_user is False. The
+response is rendered once too, except for the browsable API. Each
+request is still authenticated, checked and throttled on its own, since
+DRF does that before calling the handler.
+
+Successful responses are then kept for COALESCE_CACHE_TTL seconds, so a
+burst that arrives just after the computation finished does not start
+another. Errors are shared with the requests already waiting but never
+kept. Coalescing only helps when a process serves several requests at a
+time (threaded or ASGI workers), the short-lived cache helps either way.
+'''
+import functools
+import threading
+from collections import Counter
+
+from django.conf import settings
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+
+from core.usercache import LRUCache
+
+# Constants
+DEFAULT_TTL = 1.0
+DEFAULT_SIZE = 1000
+
+
+class _Call:
+    '''A computation in flight and the callers waiting for it'''
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    '''Run a function once for the callers asking for the same key at the same time'''
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._results = LRUCache()
+        self._stats = Counter()
+
+    def do(self, key, compute, ttl=0, size=DEFAULT_SIZE, cacheable=None):
+        '''Return compute(), or the result of the call already running or cached for key
+
+        Results that cacheable accepts, or all of them without it, are kept
+        for ttl seconds.
+        '''
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                self._stats['cache_hits'] += 1
+                return result
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats['computed'] += 1
+            else:
+                call.waiters += 1
+                self._stats['shared'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = compute()
+        except BaseException as error:
+            call.error = error
+            raise
+        else:
+            if ttl > 0 and (cacheable is None or cacheable(call.result)):
+                self._results.set(key, call.result, ttl, size)
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def waiting(self):
+        '''Return how many callers are waiting for a computation'''
+        with self._lock:
+            return sum(call.waiters for call in self._calls.values())
+
+    def stats(self):
+        '''Return how many results were computed, shared with waiters and served from the cache'''
+        with self._lock:
+            return dict(self._stats)
+
+    def reset(self):
+        '''Forget the cached results and the statistics'''
+        with self._lock:
+            self._results.clear()
+            self._stats.clear()
+
+
+_flight = SingleFlight()
+
+
+def stats():
+    '''Return the statistics of the coalesced views'''
+    return _flight.stats()
+
+
+def reset():
+    '''Empty the cache of the coalesced views and the statistics'''
+    _flight.reset()
+
+
+def waiting():
+    '''Return how many requests are waiting for another to compute their response'''
+    return _flight.waiting()
+
+
+def get_ttl():
+    '''Return how long responses stay cached, 0 only coalesces concurrent requests'''
+    return getattr(settings, 'COALESCE_CACHE_TTL', DEFAULT_TTL)
+
+
+def request_key(view, handler, request, per_user=True):
+    '''Return what makes two requests to a view identical'''
+    return (
+        f'{type(view).__module__}.{type(view).__qualname__}',
+        handler.__name__,
+        request.get_full_path(),
+        request.accepted_media_type,
+        request.user.pk if per_user else None,
+    )
+
+
+def render(view, request, response):
+    '''Return the content of a response as the request asked for it, None for the browsable API
+
+    The browsable API renders forms for the user and CSRF token of the
+    request, so it is rendered for each request.
+    '''
+    if isinstance(request.accepted_renderer, BrowsableAPIRenderer):
+        return None
+    response.accepted_renderer = request.accepted_renderer
+    response.accepted_media_type = request.accepted_media_type
+    response.renderer_context = view.get_renderer_context()
+    return response.rendered_content
+
+
+def coalesce(per_user=True):
+    '''Decorate a DRF handler so identical concurrent requests share one computation'''
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            def compute():
+                response = handler(view, request, *args, **kwargs)
+                content = render(view, request, response)
+                return response.data, response.status_code, dict(response.items()), content
+
+            data, status, headers, content = _flight.do(
+                request_key(view, handler, request, per_user),
+                compute,
+                ttl=get_ttl(),
+                size=getattr(settings, 'COALESCE_CACHE_SIZE', DEFAULT_SIZE),
+                cacheable=lambda result: 200 <= result[1] < 300,
+            )
+            # A response of its own, DRF sets the renderer and request on it
+            response = Response(data, status=status)
+            if content is not None:
+                response.content = content
+            for name, value in headers.items():
+                response[name] = value
+            return response
+        return wrapper
+    return decorator
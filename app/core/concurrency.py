@@ -0,0 +1,58 @@
+'''
+Conditional requests for versioned models
+
+Responses carry the row version as an ETag. Writes may send it back in
+If-Match and get 412 Precondition Failed if the row has changed since;
+without If-Match the version loaded by the request itself is used, so
+concurrent writes still never silently overwrite each other.
+'''
+from django.utils.http import parse_etags, quote_etag
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from core.models import ConcurrentUpdateError
+
+
+class PreconditionFailed(APIException):
+    '''The resource changed since the client (or this request) read it'''
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = _('The resource has been modified, fetch it again and retry.')
+    default_code = 'precondition_failed'
+
+
+def get_etag(instance):
+    '''Return the ETag of a versioned instance'''
+    return quote_etag(str(instance.version))
+
+
+class ConditionalUpdateMixin:
+    '''Viewset mixin adding ETag, If-Match and 412 responses'''
+    def get_object(self):
+        '''Return the object, checking If-Match on unsafe methods'''
+        instance = super().get_object() # type: ignore
+        if_match = self.request.headers.get('If-Match') # type: ignore
+        if if_match and self.request.method not in ('GET', 'HEAD', 'OPTIONS'): # type: ignore
+            # Compression weakens ETags, the version they carry is the same
+            etags = [etag.removeprefix('W/') for etag in parse_etags(if_match)]
+            if '*' not in etags and get_etag(instance) not in etags:
+                raise PreconditionFailed()
+        self._etag_instance = instance
+        return instance
+
+    def perform_update(self, serializer):
+        '''Save the update, turning a lost race into 412'''
+        try:
+            super().perform_update(serializer) # type: ignore
+        except ConcurrentUpdateError:
+            raise PreconditionFailed()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        '''Send the current version of the object as ETag'''
+        response = super().finalize_response(request, response, *args, **kwargs) # type: ignore
+        instance = getattr(self, '_etag_instance', None)
+        if instance is not None and status.is_success(response.status_code) \
+                and request.method != 'DELETE':
+            response['ETag'] = get_etag(instance)
+        return response
@@ -0,0 +1,169 @@
+'''
+Contracts and the payments made against them
+
+A contract keeps what is left to pay in remaining_balance. apply_payments
+inserts a batch of payments, takes each one off the balance of its
+contract and closes the contracts that reach zero, in the same
+transaction and in a fixed number of queries per batch, so closing
+costs O(payments applied) instead of a scan over every contract.
+
+reconcile is the backstop for payments that bypassed apply_payments. It
+recomputes the balance of the contracts paid since its watermark, the
+highest payment id it has processed on each shard, and closes the ones
+that are paid off. Payment ids are handed out before the transaction
+that inserts them commits, so a payment committed late can fall below
+the watermark; run with --full now and then to recheck every payment.
+'''
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core import money, sharding
+from core.fields import MoneyField
+from core.models import Contract, JobWatermark, Payment
+from core.money import Money
+
+# Constants
+DEFAULT_BATCH_SIZE = 1000
+RECONCILE_JOB = 'reconcile_contracts'
+PAYMENT_PERIODS = {
+    'WEEKLY': timedelta(weeks=1),
+    'MONTHLY': timedelta(days=30),
+}
+DEFAULT_PAYMENT_PERIOD = PAYMENT_PERIODS['MONTHLY']
+
+
+def payment_period(frequency):
+    '''Return the time between two payments of a contract'''
+    return PAYMENT_PERIODS.get(frequency, DEFAULT_PAYMENT_PERIOD)
+
+
+def open_contract(moneyrequest, start=None, rate=0):
+    '''Create the contract of a funded money request, rate being yearly basis points'''
+    start = start or timezone.localdate()
+    amount = Money(moneyrequest.amount)
+    return Contract.objects.create(
+        moneyrequest_id=moneyrequest.pk,
+        borrower_id=moneyrequest.borrower_id,
+        lender_id=moneyrequest.lender_id,
+        amount=amount,
+        frequency=moneyrequest.frequency,
+        term=moneyrequest.term,
+        installment=Money(int(money.round_div(amount, moneyrequest.term))),
+        rate=rate,
+        start_date=start,
+        due_date=start + payment_period(moneyrequest.frequency),
+        remaining_balance=amount,
+    )
+
+
+def close_paid(contracts):
+    '''Close the active contracts of a queryset that are paid off, return their ids'''
+    paid = contracts.filter(status='ACTIVE', remaining_balance__lte=0)
+    ids = list(paid.values_list('id', flat=True))
+    if ids:
+        contracts.filter(id__in=ids).update(status='CLOSED', closed_at=timezone.now())
+    return ids
+
+
+def apply_batch(alias, payments):
+    '''Insert payments on one shard, update their contracts and close the paid off ones'''
+    paid = defaultdict(int)
+    for payment in payments:
+        payment.amount = Money(payment.amount)
+        paid[payment.contract_id] += payment.amount
+    if len(sharding.get_shards()) > 1:
+        # bulk_create skips the pre_save handler that does this
+        for payment, pk in zip(payments, sharding.allocate_ids(Payment, len(payments))):
+            payment.pk = pk
+        sharding.ensure_users(alias, {payment.borrower_id for payment in payments})
+
+    with transaction.atomic(using=alias):
+        Payment.objects.using(alias).bulk_create(payments)
+        contracts = Contract.objects.using(alias).filter(id__in=paid)
+        contracts.update(remaining_balance=F('remaining_balance') - Case(
+            *(When(id=pk, then=Value(total)) for pk, total in paid.items()),
+            output_field=MoneyField(),
+        ))
+        return close_paid(contracts)
+
+
+def apply_payments(payments, batch_size=DEFAULT_BATCH_SIZE):
+    '''Record payments and return the ids of the contracts they paid off
+
+    Payments need contract and amount, borrower defaults to the borrower
+    of the contract.
+    '''
+    by_shard = defaultdict(list)
+    for payment in payments:
+        if payment.borrower_id is None:
+            payment.borrower_id = payment.contract.borrower_id
+        by_shard[sharding.shard_for_user(payment.borrower_id)].append(payment)
+
+    closed = []
+    for alias, shard_payments in by_shard.items():
+        for start in range(0, len(shard_payments), batch_size):
+            closed += apply_batch(alias, shard_payments[start:start + batch_size])
+    return closed
+
+
+def settle(alias, contract_ids):
+    '''Recompute the balance of contracts from their payments and close the paid off ones'''
+    paid = (
+        Payment.objects
+        .filter(contract=OuterRef('pk'))
+        .values('contract')
+        .annotate(total=Sum('amount'))
+        .values('total')
+    )
+    contracts = Contract.objects.using(alias).filter(id__in=contract_ids)
+    with transaction.atomic(using=alias):
+        contracts.update(remaining_balance=F('amount') - Coalesce(
+            Subquery(paid), 0, output_field=MoneyField(),
+        ))
+        return close_paid(contracts)
+
+
+def reconcile_shard(alias, batch_size=DEFAULT_BATCH_SIZE, full=False):
+    '''Settle the contracts paid since the watermark of a shard
+
+    Returns how many contracts were checked and the ids of those closed.
+    '''
+    watermark, _ = JobWatermark.objects.using(sharding.users_database()).get_or_create(
+        job=RECONCILE_JOB, alias=alias,
+    )
+    if full:
+        watermark.value = 0
+    checked, closed = 0, []
+    while True:
+        # Served by the primary key index, whatever the number of contracts
+        rows = list(
+            Payment.objects.using(alias)
+            .filter(id__gt=watermark.value)
+            .order_by('id')
+            .values_list('id', 'contract_id')[:batch_size]
+        )
+        if not rows:
+            break
+        contract_ids = {contract_id for _, contract_id in rows}
+        closed += settle(alias, contract_ids)
+        checked += len(contract_ids)
+        watermark.value = rows[-1][0]
+        watermark.save(update_fields=['value', 'updated_at'])
+        if len(rows) < batch_size:
+            break
+    return checked, closed
+
+
+def reconcile(batch_size=DEFAULT_BATCH_SIZE, full=False):
+    '''Settle the contracts paid since the watermark on every shard'''
+    checked, closed = 0, []
+    for alias in sharding.get_shards():
+        shard_checked, shard_closed = reconcile_shard(alias, batch_size, full)
+        checked += shard_checked
+        closed += shard_closed
+    return checked, closed
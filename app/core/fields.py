@@ -0,0 +1,83 @@
+'''
+Fields storing money as integer cents, see core.money
+'''
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import models
+from rest_framework import serializers
+
+from core.money import Money
+
+
+class MoneyFormField(forms.DecimalField):
+    '''Form field editing a Money value as a decimal amount'''
+    def __init__(self, **kwargs):
+        kwargs.setdefault('decimal_places', 2)
+        super().__init__(**kwargs)
+
+    def prepare_value(self, value):
+        '''Show Money as an amount, not as cents'''
+        if isinstance(value, Money):
+            return value.to_decimal()
+        return super().prepare_value(value)
+
+    def to_python(self, value):
+        '''Return the cleaned amount as Money'''
+        value = super().to_python(value)
+        return None if value is None else Money(value)
+
+
+class MoneyField(models.BigIntegerField):
+    '''Model field holding Money in a BIGINT column of cents
+
+    Plain ints are taken as cents, Decimals, floats and strings as amounts
+    in currency units.
+    '''
+    description = 'Amount of money in cents'
+
+    def from_db_value(self, value, expression, connection):
+        '''Return the stored cents as Money'''
+        return None if value is None else Money(value)
+
+    def to_python(self, value):
+        '''Return value as Money'''
+        if value is None or isinstance(value, Money):
+            return value
+        try:
+            return Money(value)
+        except (ArithmeticError, TypeError, ValueError):
+            raise ValidationError(
+                self.error_messages['invalid'], code='invalid', params={'value': value},
+            )
+
+    def get_prep_value(self, value):
+        '''Return the number of cents to store'''
+        if value is None or hasattr(value, 'resolve_expression'):
+            return value
+        return int(self.to_python(value))
+
+    def value_to_string(self, obj):
+        '''Serialize as an amount, which to_python reads back'''
+        value = self.value_from_object(obj)
+        return '' if value is None else str(Money(value).to_decimal())
+
+    def formfield(self, **kwargs):
+        '''Edit as a decimal amount'''
+        return models.Field.formfield(self, **{'form_class': MoneyFormField, **kwargs})
+
+
+class MoneySerializerField(serializers.DecimalField):
+    '''Serializer field for Money, read and written as a decimal string like "777.77"'''
+    def __init__(self, max_digits=18, decimal_places=2, **kwargs):
+        super().__init__(max_digits, decimal_places, **kwargs)
+
+    def run_validation(self, data=serializers.empty):
+        '''Validate as a decimal amount, min_value and max_value included, then make it Money'''
+        value = super().run_validation(data)
+        return None if value is None else Money(value)
+
+    def to_representation(self, value):
+        '''Return cents as a quantized amount, ints being sums of Money'''
+        if isinstance(value, int):
+            value = Money(value).to_decimal()
+        return super().to_representation(value)
@@ -0,0 +1,85 @@
+'''
+Database probes shared by wait_for_db and the health endpoints
+
+A probe opens the connection if needed and runs SELECT 1, without going
+through the system check framework. Probes with a timeout run on a small
+shared pool of threads, one at most per database: a database that hangs
+holds one thread, however often it is probed, and the server cancels
+the probe's statement once the timeout is up. DATABASES sets a
+connect_timeout for the connection itself.
+'''
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from psycopg import OperationalError as PsycopgOperationalError
+
+from django.db import connections
+from django.db.utils import OperationalError
+
+# Constants
+PROBE_ERRORS = (OperationalError, PsycopgOperationalError)
+PROBE_WORKERS = 8
+
+_executor = ThreadPoolExecutor(max_workers=PROBE_WORKERS, thread_name_prefix='db-probe')
+_running = {}
+_running_lock = threading.Lock()
+
+
+def check_database(alias):
+    '''Run SELECT 1 on a database, raising if it is unavailable'''
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+def limit_statement_time(alias, timeout):
+    '''Have the server cancel statements on alias that run longer than timeout seconds'''
+    connection = connections[alias]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f'SET statement_timeout = {max(1, int(timeout * 1000))}')
+
+
+def _probe(alias, close, timeout=None):
+    '''Return None if the database is up, else the error message'''
+    try:
+        if timeout is not None:
+            limit_statement_time(alias, timeout)
+        check_database(alias)
+        return None
+    except PROBE_ERRORS as error:
+        return str(error) or error.__class__.__name__
+    finally:
+        # Connections are per thread, a worker thread must not leak its own
+        if close:
+            connections[alias].close()
+
+
+def _submit(alias, timeout):
+    '''Return the probe of alias still running, or start a new one'''
+    with _running_lock:
+        future = _running.get(alias)
+        if future is None or future.done():
+            future = _running[alias] = _executor.submit(_probe, alias, True, timeout)
+        return future
+
+
+def probe_databases(aliases=None, timeout=None):
+    '''Probe databases in parallel and return {alias: error or None}
+
+    A database that does not answer within timeout seconds is reported
+    as unavailable, one database as much as several. A database whose
+    previous probe is still running is not probed again, the caller
+    waits for that probe instead. Without a timeout a single database is
+    probed in the calling thread.
+    '''
+    aliases = list(aliases if aliases is not None else connections)
+    if len(aliases) == 1 and timeout is None:
+        return {aliases[0]: _probe(aliases[0], close=False)}
+
+    futures = {alias: _submit(alias, timeout) for alias in aliases}
+    wait(futures.values(), timeout=timeout)
+    return {
+        alias: future.result() if future.done() else 'timed out'
+        for alias, future in futures.items()
+    }
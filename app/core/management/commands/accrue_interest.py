@@ -0,0 +1,46 @@
+'''
+Accrue one day of interest on every active contract
+'''
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import accrual
+
+
+class Command(BaseCommand):
+    '''Django command to run the daily interest accrual batch'''
+    help = 'Accrue one day of interest on every active contract, safe to rerun for a date'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            type=date.fromisoformat,
+            default=None,
+            help='Business date to accrue, YYYY-MM-DD, today by default',
+        )
+        parser.add_argument('--chunk-size', type=int, default=accrual.DEFAULT_CHUNK_SIZE)
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Accrue partitions of contract ids in this many processes',
+        )
+
+    def handle(self, *args, **options):
+        '''Handle the command'''
+        business_date = options['date'] or timezone.localdate()
+        start = time.perf_counter()
+        processed = accrual.accrue(
+            business_date,
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+        )
+        elapsed = time.perf_counter() - start
+        rate = processed / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Accrued {business_date} on {processed} contracts in {elapsed:.2f}s '
+            f'({rate:.0f} contracts/s)'
+        ))
@@ -0,0 +1,31 @@
+'''
+Move closed money requests to the archive table
+'''
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import archive
+
+
+class Command(BaseCommand):
+    '''Django command to archive closed money requests in batches'''
+    help = 'Move money requests closed more than --days ago to the archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=archive.DEFAULT_ARCHIVE_AFTER.days,
+            help='Archive requests closed at least this many days ago',
+        )
+        parser.add_argument('--batch-size', type=int, default=archive.DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        '''Handle the command'''
+        before = timezone.now() - timedelta(days=options['days'])
+        archived = archive.archive_closed(before, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archived} money requests closed before {before:%Y-%m-%d %H:%M}'
+        ))
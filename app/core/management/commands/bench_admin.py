@@ -0,0 +1,97 @@
+'''
+Benchmark admin changelist rendering on large tables
+'''
+import time
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.paginator import Paginator
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import benchdata
+from core.models import Account, MoneyRequest
+
+BATCH_SIZE = 50_000
+
+
+class Command(BaseCommand):
+    '''Django command to time changelist pages against the plain ModelAdmin'''
+    help = 'Time admin changelist pages with the tuned and the default admin classes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=3)
+        benchdata.add_database_argument(parser)
+
+    def populate(self, prefix, rows):
+        '''Create rows bench users, accounts and money requests'''
+        created = 0
+        while created < rows:
+            size = min(BATCH_SIZE, rows - created)
+            users = benchdata.create_users(size, prefix=f'{prefix}{created}-')
+            benchdata.create_accounts(users)
+            benchdata.create_moneyrequests(users, size)
+            created += size
+            self.stdout.write(f'  created {created} of {rows}')
+
+    def time_page(self, model_admin, request, repeat):
+        '''Return the best render time in seconds and the query count'''
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                res = model_admin.changelist_view(request)
+                res.render()
+                timings.append(time.perf_counter() - start)
+            if res.status_code != 200:
+                raise CommandError(f'{request.get_full_path()} returned {res.status_code}')
+        return min(timings), len(queries)
+
+    def handle(self, *args, **options):
+        '''Handle the command'''
+        benchdata.check_database(options['database'])
+        prefix = benchdata.unique_prefix('admin')
+        self.stdout.write(f'Populating {options["rows"]} rows per table...')
+        try:
+            self.populate(prefix, options['rows'])
+            self.compare(prefix, options['repeat'])
+        finally:
+            self.stdout.write('Deleting the bench rows...')
+            benchdata.delete_users(prefix)
+
+    def compare(self, prefix, repeat):
+        '''Time each changelist page with the tuned and the default admin'''
+        # Never saved, so the benchmark creates no account that can log in
+        admin_user = get_user_model()(
+            email=f'admin@{benchdata.BENCH_DOMAIN}', is_staff=True, is_superuser=True,
+        )
+        factory = RequestFactory()
+
+        pages = [
+            ('first page', {}),
+            ('page 50', {'p': 50}),
+            # Users 1, 10-19, 100-199... of the first batch
+            ('search', {'q': f'{prefix}0-1'}),
+        ]
+        for model in (get_user_model(), Account, MoneyRequest):
+            url = reverse(f'admin:core_{model._meta.model_name}_changelist')
+            tuned = admin.site._registry[model]
+            # Same columns and search with Django's default paging and counting
+            plain = type(f'Default{type(tuned).__name__}', (type(tuned),), {
+                'paginator': Paginator,
+                'show_full_result_count': True,
+                'list_select_related': False,
+            })(model, admin.site)
+            self.stdout.write(model._meta.verbose_name_plural)
+            for label, model_admin in (('tuned', tuned), ('default', plain)):
+                for name, params in pages:
+                    request = factory.get(url, params)
+                    request.user = admin_user
+                    seconds, queries = self.time_page(model_admin, request, repeat)
+                    self.stdout.write(
+                        f'  {label:<8} {name:<12} {seconds * 1000:9.1f} ms {queries:4} queries'
+                    )
@@ -0,0 +1,135 @@
+'''
+Measure the money request table before and after archiving closed requests
+'''
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.utils import OperationalError
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core import archive, benchdata, rollups
+from core.models import MoneyRequest
+
+BATCH_SIZE = 50_000
+
+
+def relation_sizes(table):
+    '''Return {name: bytes} for a table and each of its indexes'''
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT %s, pg_relation_size(%s::regclass) UNION ALL '
+                'SELECT indexrelname, pg_relation_size(indexrelid) '
+                'FROM pg_stat_user_indexes WHERE relname = %s',
+                [table, table, table],
+            )
+        elif connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    'SELECT name, SUM(pgsize) FROM dbstat WHERE name IN '
+                    '(SELECT name FROM sqlite_master WHERE tbl_name = %s) GROUP BY name',
+                    [table],
+                )
+            except OperationalError:
+                # SQLite built without the dbstat virtual table
+                return {}
+        else:
+            return {}
+        return dict(cursor.fetchall())
+
+
+class Command(BaseCommand):
+    '''Django command to compare table size and list latency around archival'''
+    help = 'Fill money requests, archive the closed ones and compare sizes and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--borrowers', type=int, default=1000)
+        parser.add_argument('--closed', type=float, default=0.8, help='Share of closed requests')
+        parser.add_argument('--sample', type=int, default=20, help='Borrowers to time lists for')
+        parser.add_argument('--no-vacuum', action='store_true', help='Skip compacting afterwards')
+        benchdata.add_database_argument(parser)
+
+    def populate(self, prefix, rows, borrowers, closed):
+        '''Create borrowers and money requests, the closed ones long ago'''
+        users = benchdata.create_users(borrowers, prefix=prefix)
+        closed_at = timezone.now() - timedelta(days=365)
+        closed_rows = int(rows * closed)
+        for start in range(0, rows, BATCH_SIZE):
+            size = min(BATCH_SIZE, rows - start)
+            n_closed = max(0, min(size, closed_rows - start))
+            if n_closed:
+                benchdata.create_moneyrequests(
+                    users, n_closed, status='CLOSED', closed_at=closed_at,
+                )
+            if size - n_closed:
+                benchdata.create_moneyrequests(users, size - n_closed)
+        # Bulk inserts skip the rollup signals
+        rollups.rebuild_rollups()
+        return users
+
+    def measure(self, users, sample):
+        '''Return relation sizes and the median list latency in seconds'''
+        client = APIClient()
+        url = reverse('moneyrequest:moneyrequest-list')
+        timings = []
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for user in users[:sample]:
+                client.force_authenticate(user)
+                start = time.perf_counter()
+                res = client.get(url)
+                timings.append(time.perf_counter() - start)
+                if res.status_code != 200:
+                    raise CommandError(f'{url} returned {res.status_code}')
+        return relation_sizes(MoneyRequest._meta.db_table), statistics.median(timings)
+
+    def compact(self):
+        '''Give the space freed by the deleted rows back'''
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'VACUUM FULL ANALYZE {MoneyRequest._meta.db_table}')
+            elif connection.vendor == 'sqlite':
+                cursor.execute('VACUUM')
+
+    def handle(self, *args, **options):
+        '''Handle the command'''
+        benchdata.check_database(options['database'])
+        prefix = benchdata.unique_prefix('archive')
+        self.stdout.write(f'Populating {options["rows"]} money requests...')
+        try:
+            self.run(prefix, options)
+        finally:
+            self.stdout.write('Deleting the bench rows...')
+            benchdata.delete_users(prefix)
+
+    def run(self, prefix, options):
+        '''Measure, archive and measure again'''
+        users = self.populate(prefix, options['rows'], options['borrowers'], options['closed'])
+        sizes_before, latency_before = self.measure(users, options['sample'])
+
+        start = time.perf_counter()
+        archived = archive.archive_closed(before=timezone.now())
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'Archived {archived} rows in {elapsed:.1f} s ({archived / elapsed:.0f} rows/s)'
+        )
+        if not options['no_vacuum']:
+            self.compact()
+        sizes_after, latency_after = self.measure(users, options['sample'])
+
+        self.stdout.write(f'{"relation":<40} {"before":>12} {"after":>12}')
+        for name in sorted(set(sizes_before) | set(sizes_after)):
+            self.stdout.write(
+                f'{name:<40} {sizes_before.get(name, 0) / 2**20:10.1f}MB '
+                f'{sizes_after.get(name, 0) / 2**20:10.1f}MB'
+            )
+        self.stdout.write(
+            f'{"list latency (median)":<40} {latency_before * 1000:10.1f}ms '
+            f'{latency_after * 1000:10.1f}ms'
+        )
@@ -0,0 +1,103 @@
+'''
+Measure the latency the audit trail adds to audited writes
+'''
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import audit, benchdata
+from core.models import Account, AuditEvent
+
+
+class Command(BaseCommand):
+    '''Django command to compare write latency with auditing off, sync and in the background'''
+    help = 'Compare p50 and p99 latency of audited API writes for each AUDIT_MODE'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--warmup', type=int, default=100)
+        parser.add_argument(
+            '--rounds', type=int, default=5,
+            help='Modes take turns this many times, so that drift hits them all alike',
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0.0,
+            help='Milliseconds between requests, idle time a real server has between them',
+        )
+        benchdata.add_database_argument(parser)
+
+    def run(self, client, urls, count, pause=0.0):
+        '''Return the seconds each of count PATCH requests took, cycling through urls'''
+        timings = []
+        for i in range(count):
+            time.sleep(pause)
+            url, data = urls[i % len(urls)]
+            start = time.perf_counter()
+            res = client.patch(url, data(i))
+            timings.append(time.perf_counter() - start)
+            if res.status_code != 200:
+                raise CommandError(f'{url} returned {res.status_code}')
+        return timings
+
+    def handle(self, *args, **options):
+        '''Handle the command'''
+        benchdata.check_database(options['database'])
+        prefix = benchdata.unique_prefix('audit')
+        try:
+            self.compare(prefix, options)
+        finally:
+            audit.get_writer().stop()
+            AuditEvent.objects.filter(actor__email__startswith=prefix).delete()
+            benchdata.delete_users(prefix)
+
+    def compare(self, prefix, options):
+        '''Time the audited writes of one bench user in each mode'''
+        user = benchdata.create_users(1, prefix=prefix)[0]
+        account = Account.objects.create(user=user, type='LENDER')
+        moneyrequest = benchdata.create_moneyrequests([user], 1)[0]
+        client = APIClient()
+        client.force_authenticate(user)
+        urls = [
+            (reverse('account:account-detail', args=[account.id]), lambda i: {'income': Decimal(i)}),
+            (reverse('user:profile'), lambda i: {'name': f'Name {i}'}),
+            (
+                reverse('moneyrequest:moneyrequest-detail', args=[moneyrequest.id]),
+                lambda i: {'amount': Decimal(i % 1000 + 1)},
+            ),
+        ]
+        count = options['requests']
+
+        self.stdout.write(
+            f'{count} PATCH requests over account, profile and money request, '
+            f'{options["pause"]} ms apart'
+        )
+        modes = ('off', 'sync', 'background')
+        timings = {mode: [] for mode in modes}
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            self.run(client, urls, options['warmup'])
+            for _ in range(options['rounds']):
+                for mode in modes:
+                    with override_settings(AUDIT_MODE=mode):
+                        timings[mode] += self.run(
+                            client, urls, count // options['rounds'], options['pause'] / 1000,
+                        )
+                # The next mode should not pay for writing this one's events
+                audit.get_writer().stop()
+
+        baseline = None
+        for mode in modes:
+            mode_timings = sorted(timings[mode])
+            p50 = statistics.median(mode_timings) * 1000
+            p99 = mode_timings[int(len(mode_timings) * 0.99) - 1] * 1000
+            baseline = baseline or p99
+            self.stdout.write(
+                f'{mode:<12} p50 {p50:7.2f} ms p99 {p99:7.2f} ms ({p99 - baseline:+.2f} ms p99)'
+            )
+
+        written = AuditEvent.objects.filter(actor=user).count()
+        self.stdout.write(f'{written} audit events written')
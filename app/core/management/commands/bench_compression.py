@@ -0,0 +1,57 @@
+'''
+Benchmark response compression on a money request list
+'''
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from core.middleware import available_compressors
+from core.models import MoneyRequest
+from core.renderers import ORJSONRenderer
+from moneyrequest.serializers import MoneyRequestDetailSerializer
+
+FREQUENCIES = ['WEEKLY', 'MONTHLY']
+
+
+class Command(BaseCommand):
+    '''Django command to compare compression CPU cost against bytes saved'''
+    help = 'Compare CPU cost and bytes saved of the response compressors'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', nargs='+', type=int, default=[10, 100, 1000, 10_000])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        '''Handle the command'''
+        renderer = ORJSONRenderer()
+        for rows in options['rows']:
+            requests = [
+                MoneyRequest(
+                    id=i,
+                    borrower_id=i % 97 + 1,
+                    title=f'Money request {i}',
+                    description=f'Paying for item number {i * 7919 % 1000}',
+                    amount=Decimal(i * 7919 % 10_000) + Decimal('0.50'),
+                    frequency=FREQUENCIES[i % 2],
+                    term=i % 52 + 1,
+                )
+                for i in range(1, rows + 1)
+            ]
+            payload = renderer.render(MoneyRequestDetailSerializer(requests, many=True).data)
+            self.stdout.write(f'{rows} money requests, {len(payload)} bytes')
+
+            for compressor in available_compressors():
+                timings = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    obj = compressor()
+                    compressed = obj.compress(payload) + obj.finish()
+                    timings.append(time.perf_counter() - start)
+                best = min(timings)
+                self.stdout.write(
+                    f'  {compressor.encoding:<5} {best * 1000:8.3f} ms '
+                    f'{len(compressed):>9} bytes '
+                    f'{1 - len(compressed) / len(payload):6.1%} saved '
+                    f'{len(payload) / best / 1e6:8.1f} MB/s'
+                )
@@ -0,0 +1,80 @@
+'''
+Compare the home endpoint with the three calls it replaces
+'''
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import benchdata
+
+
+class Command(BaseCommand):
+    '''Django command to time the first screen loaded both ways'''
+    help = 'Compare GET /api/home/ with the profile, accounts and money request calls'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--moneyrequests', type=int, default=200)
+        parser.add_argument('--accounts', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument(
+            '--rtt', type=float, default=0.0,
+            help='Network round trip in ms added to every call',
+        )
+        benchdata.add_database_argument(parser)
+
+    def run_flow(self, client, urls, rtt):
+        '''Return the seconds and queries it takes to GET urls one after another'''
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            for url in urls:
+                res = client.get(url)
+                if res.status_code != 200:
+                    raise CommandError(f'{url} returned {res.status_code}')
+        return time.perf_counter() - start + rtt * len(urls), len(queries)
+
+    def handle(self, *args, **options):
+        '''Handle the command'''
+        benchdata.check_database(options['database'])
+        prefix = benchdata.unique_prefix('home')
+        try:
+            self.compare(prefix, options)
+        finally:
+            benchdata.delete_users(prefix)
+
+    def compare(self, prefix, options):
+        '''Time both flows for one bench user'''
+        user = benchdata.create_users(1, prefix=prefix)[0]
+        benchdata.create_accounts([user] * options['accounts'])
+        benchdata.create_moneyrequests([user], options['moneyrequests'])
+        token = Token.objects.create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        rtt = options['rtt'] / 1000
+
+        flows = [
+            ('three calls', [
+                reverse('user:profile'),
+                reverse('account:account-list'),
+                reverse('moneyrequest:moneyrequest-list'),
+            ]),
+            ('home', [reverse('home:home')]),
+        ]
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            self.stdout.write(
+                f'{options["accounts"]} accounts, {options["moneyrequests"]} money requests, '
+                f'median of {options["repeat"]}, {options["rtt"]} ms round trip'
+            )
+            for name, urls in flows:
+                # Warm the user cache the way a returning client would
+                self.run_flow(client, urls, rtt)
+                runs = [self.run_flow(client, urls, rtt) for _ in range(options['repeat'])]
+                self.stdout.write(
+                    f'{name:<12} {statistics.median(t for t, _ in runs) * 1000:8.2f} ms '
+                    f'{runs[-1][1]:>3} queries'
+                )
@@ -0,0 +1,69 @@
+'''
+Benchmark money arithmetic on Decimal amounts against integer cents
+'''
+import random
+import time
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+
+from django.core.management.base import BaseCommand
+
+from core import money
+from core.money import CENT, Money
+
+
+class Command(BaseCommand):
+    '''Django command to compare summing and applying a rate to amounts'''
+    help = 'Compare Decimal, Money and NumPy int64 cents on sums and interest'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def best(self, function, repeat):
+        '''Return the result and the best time of function in ms'''
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = function()
+            timings.append(time.perf_counter() - start)
+        return result, min(timings) * 1000
+
+    def handle(self, *args, **options):
+        '''Handle the command'''
+        rows = options['rows']
+        repeat = options['repeat']
+        rng = random.Random(0)
+        cents = [rng.randrange(1, 10_000_000) for _ in range(rows)]
+        decimals = [Money(value).to_decimal() for value in cents]
+        monies = [Money(value) for value in cents]
+        array = np.array(cents, dtype=np.int64)
+        # 1.25% as a Decimal fraction and in basis points
+        rate, basis_points = Decimal('0.0125'), 125
+
+        cases = [
+            ('sum', [
+                ('Decimal', lambda: sum(decimals, Decimal(0))),
+                ('Money', lambda: sum(monies)),
+                ('int64 array', lambda: int(array.sum())),
+            ]),
+            ('interest', [
+                ('Decimal', lambda: [
+                    (amount * rate).quantize(CENT, ROUND_HALF_UP) for amount in decimals
+                ]),
+                ('int64 array', lambda: money.apply_rate(array, basis_points)),
+            ]),
+        ]
+        self.stdout.write(f'{rows} amounts, best of {repeat}')
+        for operation, variants in cases:
+            results = []
+            for name, function in variants:
+                result, elapsed = self.best(function, repeat)
+                results.append(result)
+                self.stdout.write(f'{operation:<9} {name:<12} {elapsed:10.2f} ms')
+            if operation == 'sum':
+                same = len({Money(result) for result in results}) == 1
+            else:
+                same = money.to_decimals(results[1]) == results[0]
+            self.stdout.write(f'{operation:<9} results match: {same}')
@@ -0,0 +1,57 @@
+'''
+Benchmark the API renderers on a money request list
+'''
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from rest_framework.renderers import JSONRenderer
+
+from core.models import MoneyRequest
+from core.renderers import ORJSONRenderer, MessagePackRenderer
+from moneyrequest.serializers import MoneyRequestDetailSerializer
+
+
+class Command(BaseCommand):
+    '''Django command to compare render time and payload size per renderer'''
+    help = 'Compare render time and payload size of the API renderers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        '''Handle the command'''
+        rows = options['rows']
+        repeat = options['repeat']
+        requests = [
+            MoneyRequest(
+                id=i,
+                borrower_id=i % 97 + 1,
+                lender_id=None,
+                title=f'Money request {i}',
+                description='Short description of what the money is for',
+                amount=Decimal(i % 10_000) + Decimal('0.99'),
+                frequency='WEEKLY',
+                term=i % 52 + 1,
+            )
+            for i in range(1, rows + 1)
+        ]
+        data = MoneyRequestDetailSerializer(requests, many=True).data
+
+        renderers = [
+            ('json (default)', JSONRenderer()),
+            ('orjson', ORJSONRenderer()),
+            ('msgpack', MessagePackRenderer()),
+        ]
+        self.stdout.write(f'{rows} money requests, best of {repeat}')
+        for name, renderer in renderers:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                payload = renderer.render(data)
+                timings.append(time.perf_counter() - start)
+            self.stdout.write(
+                f'{name:<16} {min(timings) * 1000:8.2f} ms {len(payload):>10} bytes'
+            )
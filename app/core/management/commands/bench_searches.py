@@ -0,0 +1,83 @@
+'''
+Benchmark matching money requests against saved searches
+'''
+import time
+
+import numpy as np
+
+from django.core.management.base import BaseCommand
+
+from core import searches
+
+
+class Command(BaseCommand):
+    '''Django command to compare the search index with scanning every saved search'''
+    help = 'Time matching money requests against 100k saved searches, indexed and by full scan'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--searches', type=int, default=100_000)
+        parser.add_argument('--requests', type=int, default=10_000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def scan(self, index, amount, term, code):
+        '''Return the positions of the matching searches, checking every one'''
+        arrays = index.searches
+        return np.flatnonzero(
+            (arrays['min_amount'] <= amount) & (arrays['max_amount'] >= amount)
+            & (arrays['min_term'] <= term) & (arrays['max_term'] >= term)
+            & ((arrays['frequency'] == searches.ANY_FREQUENCY) | (arrays['frequency'] == code))
+        )
+
+    def handle(self, *args, **options):
+        '''Handle the command'''
+        rng = np.random.default_rng(options['seed'])
+        count = options['searches']
+        # Amounts spread evenly over magnitudes from 100.00 to 50,000.00, each
+        # search spanning up to twice its lower bound, some open ended
+        def amounts(size):
+            return np.exp(rng.uniform(np.log(10_000), np.log(5_000_000), size)).astype(np.int64)
+
+        low = amounts(count)
+        high = low * rng.uniform(1.1, 2, count)
+        rows = [
+            (
+                pk, pk % 5000, f'search {pk}',
+                None if rng.random() < 0.05 else int(lo),
+                None if rng.random() < 0.05 else int(hi),
+                int(rng.integers(1, 30)), int(rng.integers(30, 105)),
+                ['', 'WEEKLY', 'MONTHLY'][pk % 3],
+            )
+            for pk, lo, hi in zip(range(1, count + 1), low, high)
+        ]
+        requests = list(zip(
+            amounts(options['requests']).tolist(),
+            rng.integers(1, 105, options['requests']).tolist(),
+            rng.choice(['WEEKLY', 'MONTHLY'], options['requests']).tolist(),
+        ))
+
+        start = time.perf_counter()
+        index = searches.SearchIndex(*searches.to_arrays(rows))
+        build = time.perf_counter() - start
+        self.stdout.write(
+            f'{count} saved searches, index built in {build:.2f}s '
+            f'({len(index.members)} entries, {index.size} leaves)'
+        )
+
+        start = time.perf_counter()
+        indexed = [index.match(amount, term, frequency) for amount, term, frequency in requests]
+        indexed_time = time.perf_counter() - start
+        start = time.perf_counter()
+        scanned = [
+            self.scan(index, amount, term, index.frequencies.get(frequency, -1))
+            for amount, term, frequency in requests
+        ]
+        scan_time = time.perf_counter() - start
+
+        same = all(np.array_equal(np.sort(a), b) for a, b in zip(indexed, scanned))
+        matches = sum(len(found) for found in indexed) / len(requests)
+        for name, elapsed in (('index', indexed_time), ('full scan', scan_time)):
+            self.stdout.write(
+                f'{name:<10} {elapsed / len(requests) * 1e6:9.1f} us per money request '
+                f'({len(requests) / elapsed:,.0f}/s)'
+            )
+        self.stdout.write(f'{matches:.0f} matching searches per money request, same matches: {same}')
@@ -0,0 +1,17 @@
+'''
+Generate the OpenAPI schema artifacts served at /api/schema/
+'''
+from django.core.management.base import BaseCommand
+
+from core import schema
+
+
+class Command(BaseCommand):
+    '''Django command to build the OpenAPI schema artifacts'''
+    help = 'Generate the OpenAPI schema files served at /api/schema/'
+
+    def handle(self, *args, **options):
+        '''Handle the command'''
+        for path in schema.build_artifacts():
+            self.stdout.write(f'Wrote {path}')
+        self.stdout.write(self.style.SUCCESS('Schema built'))
@@ -0,0 +1,38 @@
+'''
+Recompute the portfolio rollups from scratch and compare with the stored ones
+'''
+from django.core.management.base import BaseCommand, CommandError
+
+from core import rollups
+
+
+class Command(BaseCommand):
+    '''Django command to check (and optionally fix) the portfolio rollups'''
+    help = 'Recompute the portfolio rollups and report any differences'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Replace the stored rollups with the recomputed ones',
+        )
+
+    def handle(self, *args, **options):
+        '''Handle the command'''
+        differences = rollups.diff_rollups()
+        found = 0
+        for name, rows in differences.items():
+            for key, stored, computed in rows:
+                found += 1
+                self.stdout.write(f'{name} {key}: stored {stored} != computed {computed}')
+
+        if not found:
+            self.stdout.write(self.style.SUCCESS('Rollups are consistent'))
+            return
+
+        if options['fix']:
+            rollups.rebuild_rollups()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt rollups, {found} buckets differed'))
+            return
+
+        raise CommandError(f'{found} rollup buckets differ, run with --fix to rebuild')
@@ -0,0 +1,48 @@
+'''
+Move the rows a user owns to another shard
+'''
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import sharding
+
+
+class Command(BaseCommand):
+    '''Django command to rebalance a user onto another shard'''
+    help = (
+        'Copy the accounts and money requests of a user to a shard, switch the user over '
+        'and delete the old rows once the other processes have dropped their shard map. '
+        'Run it again to finish a move that failed'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('user', help='Email or id of the user')
+        parser.add_argument('shard', help='Alias of the target shard')
+        parser.add_argument(
+            '--grace', type=float,
+            default=getattr(settings, 'SHARD_MAP_TTL', sharding.DEFAULT_MAP_TTL),
+            help='Seconds to wait before deleting the old rows, SHARD_MAP_TTL by default',
+        )
+
+    def handle(self, *args, **options):
+        '''Handle the command'''
+        if options['shard'] not in sharding.get_shards():
+            raise CommandError(
+                f'Unknown shard {options["shard"]}, expected one of {", ".join(sharding.get_shards())}'
+            )
+        users = get_user_model().objects
+        lookup = {'pk': options['user']} if options['user'].isdigit() else {'email': options['user']}
+        user = users.filter(**lookup).first()
+        if user is None:
+            raise CommandError(f'No user {options["user"]}')
+
+        source = sharding.placement(user.pk)[0]
+        moved = sharding.move_user(user.pk, options['shard'], options['grace'])
+        if not moved:
+            self.stdout.write(f'{user.email} is already on {source}')
+            return
+        counts = ', '.join(f'{count} {name}' for name, count in moved.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {user.email} from {source} to {options["shard"]}: {counts}'
+        ))
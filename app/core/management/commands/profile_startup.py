@@ -0,0 +1,103 @@
+'''
+Profile the cold start of the WSGI or ASGI application
+'''
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Django imports the URLconf on the first request, count it as startup
+STARTUP_SCRIPT = '''
+import time
+start = time.perf_counter()
+from app.{entry} import application
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(time.perf_counter() - start)
+'''
+
+
+def parse_importtime(output):
+    '''Return (module, self microseconds) for each line of -X importtime output'''
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        modules.append((parts[2].strip(), int(parts[0])))
+    return modules
+
+
+def group_by_app(modules, apps):
+    '''Sum self import time per installed app, by longest module prefix
+
+    Modules outside the installed apps are grouped by top level package.
+    '''
+    prefixes = sorted(apps, key=len, reverse=True)
+    totals = defaultdict(int)
+    for module, micros in modules:
+        for prefix in prefixes:
+            if module == prefix or module.startswith(prefix + '.'):
+                totals[prefix] += micros
+                break
+        else:
+            totals[module.split('.')[0]] += micros
+    return totals
+
+
+class Command(BaseCommand):
+    '''Django command to report import time per installed app'''
+    help = 'Measure cold start time of the application and import time per app'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--asgi', action='store_true', help='Profile the ASGI application')
+        parser.add_argument('--runs', type=int, default=3)
+
+    def run_once(self, entry, importtime=False):
+        '''Start the application in a fresh interpreter'''
+        args = [sys.executable]
+        if importtime:
+            args += ['-X', 'importtime']
+        args += ['-c', STARTUP_SCRIPT.format(entry=entry)]
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        result = subprocess.run(
+            args,
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        if result.returncode != 0:
+            raise CommandError(result.stderr)
+        return float(result.stdout.strip().splitlines()[-1]), result.stderr
+
+    def handle(self, *args, **options):
+        '''Handle the command'''
+        entry = 'asgi' if options['asgi'] else 'wsgi'
+        timings = [self.run_once(entry)[0] for _ in range(options['runs'])]
+        _, importtime = self.run_once(entry, importtime=True)
+
+        totals = group_by_app(parse_importtime(importtime), settings.INSTALLED_APPS)
+        self.stdout.write(f'Import time per installed app ({entry}, self time):')
+        for app in settings.INSTALLED_APPS:
+            self.stdout.write(f'  {app:<40} {totals.pop(app, 0) / 1000:8.1f} ms')
+        self.stdout.write('Slowest other packages:')
+        for name, micros in sorted(totals.items(), key=lambda item: -item[1])[:10]:
+            self.stdout.write(f'  {name:<40} {micros / 1000:8.1f} ms')
+
+        cold_start = statistics.median(timings) * 1000
+        target = getattr(settings, 'STARTUP_TIME_TARGET_MS', None)
+        line = f'Cold start of app.{entry}.application: {cold_start:.1f} ms (median of {len(timings)})'
+        if target is None:
+            self.stdout.write(line)
+        elif cold_start <= target:
+            self.stdout.write(self.style.SUCCESS(f'{line}, within the {target} ms target'))
+        else:
+            self.stdout.write(self.style.ERROR(f'{line}, over the {target} ms target'))
@@ -0,0 +1,26 @@
+'''
+Settle the contracts paid since the last run and close the paid off ones
+'''
+from django.core.management.base import BaseCommand
+
+from core import contracts
+
+
+class Command(BaseCommand):
+    '''Django command to reconcile contract balances from their payments'''
+    help = 'Recompute the balance of contracts paid since the last run and close the paid off ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=contracts.DEFAULT_BATCH_SIZE)
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Start over from the first payment instead of the watermark',
+        )
+
+    def handle(self, *args, **options):
+        '''Handle the command'''
+        checked, closed = contracts.reconcile(options['batch_size'], options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} contracts, closed {len(closed)}'
+        ))
@@ -0,0 +1,25 @@
+'''
+Store the audit events spilled to the fallback file
+'''
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import audit
+
+
+class Command(BaseCommand):
+    '''Django command to load the audit fallback file into AuditEvent'''
+    help = 'Store the audit events that could not be queued or written, safe to rerun'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=getattr(settings, 'AUDIT_FALLBACK_PATH', audit.DEFAULT_FALLBACK_PATH),
+            help='Fallback file to replay, AUDIT_FALLBACK_PATH by default',
+        )
+        parser.add_argument('--batch-size', type=int, default=audit.DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        '''Handle the command'''
+        replayed = audit.replay(options['path'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Replayed {replayed} audit events'))
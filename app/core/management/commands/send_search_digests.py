@@ -0,0 +1,25 @@
+'''
+Email lenders the new money requests their saved searches match
+'''
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import searches
+
+
+class Command(BaseCommand):
+    '''Django command to match new money requests against saved searches and send digests'''
+    help = 'Match the money requests created since the last run and email each lender a digest'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=searches.DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        '''Handle the command'''
+        start = time.perf_counter()
+        checked, sent = searches.send_digests(options['batch_size'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} money requests, sent {sent} digests in {elapsed:.2f}s'
+        ))
@@ -1,25 +1,70 @@
 '''
 Wait for db to be available before starting the server
 '''
+import random
 import time
 
-from psycopg import OperationalError as PsycopgOperationalError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core import health
+
+# Constants
+BASE_DELAY = 0.05
+MAX_DELAY = 5.0
+DEFAULT_TIMEOUT = 60.0
+
+
+def backoff(attempt, base=BASE_DELAY, cap=MAX_DELAY):
+    '''Return the delay before the next attempt, exponential with full jitter'''
+    return random.uniform(0, min(cap, base * 2 ** attempt))
 
-from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
 
 class Command(BaseCommand):
     '''Django command to pause execution until database is available'''
+    help = 'Wait until every database accepts queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            action='append',
+            dest='databases',
+            help='Database alias to wait for, all of them by default',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=DEFAULT_TIMEOUT,
+            help='Give up after this many seconds, 0 waits forever',
+        )
+
     def handle(self, *args, **options):
         '''Handle the command'''
         self.stdout.write('Waiting for database...')
-        db_up = False
-        while db_up is False:
-            try:
-                self.check(databases=['default']) # type: ignore
-                db_up = True
-            except (OperationalError, PsycopgOperationalError):
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
-
-        self.stdout.write(self.style.SUCCESS('Database available!'))
\ No newline at end of file
+        pending = options['databases'] or list(connections)
+        timeout = options['timeout']
+        deadline = time.monotonic() + timeout if timeout else None
+
+        attempt = 0
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            errors = health.probe_databases(pending, timeout=remaining)
+            pending = [alias for alias, error in errors.items() if error]
+            if not pending:
+                break
+
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise CommandError(
+                    f'Database unavailable after {timeout:g} seconds: {", ".join(pending)}'
+                )
+            delay = backoff(attempt)
+            if remaining is not None:
+                delay = min(delay, remaining)
+            self.stdout.write(
+                f'Database unavailable ({", ".join(pending)}), waiting {delay * 1000:.0f} ms...'
+            )
+            time.sleep(delay)
+            attempt += 1
+
+        self.stdout.write(self.style.SUCCESS('Database available!'))
@@ -0,0 +1,278 @@
+'''
+Middleware for the API
+'''
+import random
+import re
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+
+from core import profiling, usercache
+from core.authentication import CachedTokenAuthentication
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+# Constants
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_CONTENT_TYPES = [
+    'application/json',
+    'application/vnd.oai.openapi',
+    'application/xml',
+    'text/plain',
+    'text/csv',
+]
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+PROFILE_HEADER = 'X-Profile'
+
+
+class GzipCompressor:
+    '''Incremental gzip compressor'''
+    encoding = 'gzip'
+
+    def __init__(self):
+        self.obj = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        '''Compress a chunk and flush it so the client can decode it now'''
+        return self.obj.compress(data) + self.obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        '''Return the end of the stream'''
+        return self.obj.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor:
+    '''Incremental brotli compressor'''
+    encoding = 'br'
+
+    def __init__(self):
+        self.obj = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data):
+        '''Compress a chunk and flush it so the client can decode it now'''
+        return self.obj.process(data) + self.obj.flush()
+
+    def finish(self):
+        '''Return the end of the stream'''
+        return self.obj.finish()
+
+
+class ZstdCompressor:
+    '''Incremental zstd compressor'''
+    encoding = 'zstd'
+
+    def __init__(self):
+        self.obj = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data):
+        '''Compress a chunk and flush it so the client can decode it now'''
+        return self.obj.compress(data) + self.obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        '''Return the end of the stream'''
+        return self.obj.flush()
+
+
+def available_compressors():
+    '''Return the compressors that can be used, in order of preference'''
+    compressors = []
+    if zstandard is not None:
+        compressors.append(ZstdCompressor)
+    if brotli is not None:
+        compressors.append(BrotliCompressor)
+    compressors.append(GzipCompressor)
+    return compressors
+
+
+def parse_accept_encoding(header):
+    '''Return the encodings the client accepts and those it refuses with q=0'''
+    accepted, refused = set(), set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        match = re.search(r'q=([0-9.]+)', params)
+        if match and float(match.group(1)) == 0:
+            refused.add(coding)
+        else:
+            accepted.add(coding)
+    return accepted, refused
+
+
+def accepted_encodings(header):
+    '''Return the encodings the client accepts, ignoring those with q=0'''
+    return parse_accept_encoding(header)[0]
+
+
+def choose_compressor(header):
+    '''Return the preferred compressor the client accepts, or None
+
+    "*" stands for any encoding not listed, so it never brings back one
+    the client refused with q=0.
+    '''
+    accepted, refused = parse_accept_encoding(header)
+    for compressor in available_compressors():
+        if compressor.encoding in refused:
+            continue
+        if compressor.encoding in accepted or '*' in accepted:
+            return compressor
+    return None
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    '''Compress responses with zstd, brotli or gzip
+
+    Only responses with a content type in COMPRESSION_CONTENT_TYPES and, when
+    the size is known, at least COMPRESSION_MIN_SIZE bytes are compressed.
+    HTML is not in the defaults: the admin and browsable API pages carry a
+    CSRF token next to user input, which compression would expose to BREACH.
+    Streaming responses are compressed chunk by chunk and flushed as they
+    go so they keep streaming.
+    '''
+    def process_response(self, request, response):
+        '''Compress the response if the client and content allow it'''
+        if response.has_header('Content-Encoding') or response.status_code in (204, 206, 304):
+            return response
+        if not self.compressible_type(response.get('Content-Type', '')):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressor = choose_compressor(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if compressor is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self.compress_async(
+                    compressor(), response.streaming_content,
+                )
+            else:
+                response.streaming_content = self.compress_stream(
+                    compressor(), response.streaming_content,
+                )
+            del response['Content-Length']
+        else:
+            min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', DEFAULT_MIN_SIZE)
+            if len(response.content) < min_size:
+                return response
+            obj = compressor()
+            compressed = obj.compress(response.content) + obj.finish()
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = compressor.encoding
+
+        return response
+
+    def compressible_type(self, content_type):
+        '''Return True if the content type is in the allowlist'''
+        content_type = content_type.split(';')[0].strip().lower()
+        allowed = getattr(settings, 'COMPRESSION_CONTENT_TYPES', DEFAULT_CONTENT_TYPES)
+        return any(content_type.startswith(prefix) for prefix in allowed)
+
+    @staticmethod
+    def compress_stream(obj, chunks):
+        '''Compress a chunk iterator'''
+        for chunk in chunks:
+            data = obj.compress(chunk)
+            if data:
+                yield data
+        yield obj.finish()
+
+    @staticmethod
+    async def compress_async(obj, chunks):
+        '''Compress an async chunk iterator'''
+        async for chunk in chunks:
+            data = obj.compress(chunk)
+            if data:
+                yield data
+        yield obj.finish()
+
+
+class ProfilingMiddleware:
+    '''Profile requests sampled at PROFILING_SAMPLE_RATE or asked for by staff
+
+    Staff ask for a profile with an "X-Profile: sample" or
+    "X-Profile: cprofile" header, sampled requests always use the stack
+    sampler. Profiled responses carry an X-Profile-Id header, profiles are
+    listed at /admin/profiles/.
+    '''
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = self.get_mode(request)
+        if mode is None:
+            return self.get_response(request)
+
+        profile = profiling.RequestProfile(mode)
+        request._profile = profile
+        with profile.capture():
+            response = self.get_response(request)
+        record = profile.finish(request, response)
+        response['X-Profile-Id'] = str(record['id'])
+        return response
+
+    def get_mode(self, request):
+        '''Return the profiling mode for the request, None to not profile'''
+        requested = request.headers.get(PROFILE_HEADER, '').strip().lower()
+        if requested and self.is_staff(request):
+            return requested if requested in profiling.MODES else 'sample'
+        rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0)
+        if rate and random.random() < rate:
+            return 'sample'
+        return None
+
+    def is_staff(self, request):
+        '''Return True if the session or API token belongs to staff'''
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            return True
+        try:
+            authenticated = CachedTokenAuthentication().authenticate(Request(request))
+        except AuthenticationFailed:
+            return False
+        return authenticated is not None and authenticated[0].is_staff
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        '''Mark the start of the view'''
+        profile = getattr(request, '_profile', None)
+        if profile is not None:
+            profile.mark('view_start')
+
+    def process_template_response(self, request, response):
+        '''Mark the end of the view and time the rendering'''
+        profile = getattr(request, '_profile', None)
+        if profile is not None:
+            profile.mark('view_end')
+            profile.mark('render_start')
+            response.add_post_render_callback(lambda response: profile.mark('render_end'))
+        return response
+
+
+class UserCacheMiddleware:
+    '''Give each request its own identity map in core.usercache'''
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with usercache.request_scope():
+            return self.get_response(request)
@@ -0,0 +1,45 @@
+# Generated by Django 5.0.6 on 2026-10-19 03:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_alter_account_balance'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='account',
+            index=models.Index(fields=['user', '-id'], name='account_user_id_desc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moneyrequest',
+            index=models.Index(fields=['borrower', '-id'], name='moneyreq_borrower_id_desc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moneyrequest',
+            index=models.Index(condition=models.Q(('lender__isnull', True)), fields=['term', 'amount'], name='moneyreq_open_term_amount_idx'),
+        ),
+        migrations.AlterField(
+            model_name='account',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='moneyrequest',
+            name='borrower',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='borrower', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='moneyrequest',
+            constraint=models.CheckConstraint(check=models.Q(('amount__gt', 0)), name='moneyrequest_amount_positive'),
+        ),
+        migrations.AddConstraint(
+            model_name='moneyrequest',
+            constraint=models.CheckConstraint(check=models.Q(('term__gt', 0)), name='moneyrequest_term_positive'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.0.6 on 2026-10-19 03:56
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_rollups(apps, schema_editor):
+    '''Compute the rollups for the rows that already exist'''
+    MoneyRequest = apps.get_model('core', 'MoneyRequest')
+    MoneyRequestRollup = apps.get_model('core', 'MoneyRequestRollup')
+    Account = apps.get_model('core', 'Account')
+    AccountRollup = apps.get_model('core', 'AccountRollup')
+    funded = Q(lender__isnull=False)
+
+    MoneyRequestRollup.objects.bulk_create([
+        MoneyRequestRollup(
+            term=row['term'],
+            frequency=row['frequency'],
+            count=row['count'],
+            funded_count=row['funded_count'],
+            total_amount=row['total_amount'] or Decimal(0),
+            outstanding_principal=row['outstanding_principal'] or Decimal(0),
+        )
+        for row in MoneyRequest.objects.values('term', 'frequency').annotate(
+            count=Count('id'),
+            funded_count=Count('id', filter=funded),
+            total_amount=Sum('amount'),
+            outstanding_principal=Sum('amount', filter=funded),
+        )
+    ])
+    AccountRollup.objects.bulk_create([
+        AccountRollup(
+            type=row['type'],
+            count=row['count'],
+            total_balance=row['total_balance'] or Decimal(0),
+        )
+        for row in Account.objects.values('type').annotate(
+            count=Count('id'),
+            total_balance=Sum('balance'),
+        )
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_indexes_and_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('BORROWER', 'Borrower'), ('LENDER', 'Lender')], max_length=255, unique=True)),
+                ('count', models.BigIntegerField(default=0)),
+                ('total_balance', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=18)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MoneyRequestRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.IntegerField()),
+                ('frequency', models.CharField(max_length=255)),
+                ('count', models.BigIntegerField(default=0)),
+                ('funded_count', models.BigIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=18)),
+                ('outstanding_principal', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=18)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='moneyrequestrollup',
+            constraint=models.UniqueConstraint(fields=('term', 'frequency'), name='moneyrequestrollup_bucket_unique'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
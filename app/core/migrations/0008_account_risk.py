@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-19 03:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='income',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='account',
+            name='risk_appetite',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='account',
+            name='risk_level',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-19 03:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_account_risk'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='moneyrequest',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
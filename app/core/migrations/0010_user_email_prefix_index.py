@@ -0,0 +1,38 @@
+# Generated by Django 5.0.6 on 2026-10-19 05:12
+
+from django.db import migrations
+
+INDEX_NAME = 'core_user_email_upper_prefix_idx'
+
+
+def create_index(apps, schema_editor):
+    '''Index UPPER(email) for the admin's case-insensitive prefix search
+
+    varchar_pattern_ops lets PostgreSQL use the index for LIKE 'x%'
+    whatever the database collation, and it has no equivalent elsewhere.
+    '''
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = apps.get_model('core', 'User')._meta.db_table
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} '
+        f'ON {schema_editor.quote_name(table)} (UPPER(email) varchar_pattern_ops)'
+    )
+
+
+def drop_index(apps, schema_editor):
+    '''Drop the prefix search index'''
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
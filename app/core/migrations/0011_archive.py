@@ -0,0 +1,61 @@
+# Generated by Django 5.0.6 on 2026-10-19 04:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_funded(apps, schema_editor):
+    '''Money requests with a lender are funded'''
+    MoneyRequest = apps.get_model('core', 'MoneyRequest')
+    MoneyRequest.objects.filter(lender__isnull=False).update(status='FUNDED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_user_email_prefix_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMoneyRequest',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('frequency', models.CharField(max_length=255)),
+                ('term', models.IntegerField()),
+                ('status', models.CharField(choices=[('OPEN', 'Open'), ('FUNDED', 'Funded'), ('CLOSED', 'Closed')], max_length=16)),
+                ('closed_at', models.DateTimeField(blank=True, null=True)),
+                ('version', models.PositiveIntegerField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='moneyrequest',
+            name='closed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='moneyrequest',
+            name='status',
+            field=models.CharField(choices=[('OPEN', 'Open'), ('FUNDED', 'Funded'), ('CLOSED', 'Closed')], default='OPEN', max_length=16),
+        ),
+        migrations.RunPython(mark_funded, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='moneyrequest',
+            index=models.Index(condition=models.Q(('status', 'CLOSED')), fields=['closed_at'], name='moneyreq_closed_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedmoneyrequest',
+            name='borrower',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_borrower', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedmoneyrequest',
+            name='lender',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_lender', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
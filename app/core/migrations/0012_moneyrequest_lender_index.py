@@ -0,0 +1,25 @@
+# Generated by Django 5.0.6 on 2026-10-19 04:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_archive'),
+    ]
+
+    operations = [
+        # Build the composite index before dropping the one it replaces
+        migrations.AddIndex(
+            model_name='moneyrequest',
+            index=models.Index(fields=['lender', '-id'], name='moneyreq_lender_id_desc_idx'),
+        ),
+        migrations.AlterField(
+            model_name='moneyrequest',
+            name='lender',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lender', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
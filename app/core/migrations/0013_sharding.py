@@ -0,0 +1,29 @@
+# Generated by Django 5.0.6 on 2026-10-19 04:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_moneyrequest_lender_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdBlock',
+            fields=[
+                ('model', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('next_id', models.BigIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserShard',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('alias', models.CharField(max_length=64)),
+            ],
+        ),
+    ]
@@ -0,0 +1,105 @@
+# Hand written: amounts move from DECIMAL columns to BIGINT cents
+
+from decimal import Decimal
+
+import core.fields
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Cast, Round
+
+CENT = Decimal('0.01')
+# (model, field, default, max_digits) of every amount column
+MONEY_COLUMNS = [
+    ('account', 'balance', 0, 10),
+    ('moneyrequest', 'amount', None, 10),
+    ('archivedmoneyrequest', 'amount', None, 10),
+    ('moneyrequestrollup', 'total_amount', 0, 18),
+    ('moneyrequestrollup', 'outstanding_principal', 0, 18),
+    ('accountrollup', 'total_balance', 0, 18),
+]
+
+
+def to_cents(apps, schema_editor):
+    '''Copy each amount into its cents column'''
+    alias = schema_editor.connection.alias
+    for model_name, name, default, max_digits in MONEY_COLUMNS:
+        model = apps.get_model('core', model_name)
+        model._base_manager.using(alias).update(**{
+            f'{name}_cents': Cast(Round(F(name) * 100), models.BigIntegerField()),
+        })
+
+
+def from_cents(apps, schema_editor):
+    '''Copy each cents column back into its amount'''
+    # Cents carry two more digits than the amount, scale them down after the cast
+    alias = schema_editor.connection.alias
+    for model_name, name, default, max_digits in MONEY_COLUMNS:
+        model = apps.get_model('core', model_name)
+        model._base_manager.using(alias).update(**{
+            name: Cast(F(f'{name}_cents'), models.DecimalField(max_digits=max_digits + 2, decimal_places=0)) * CENT,
+        })
+
+
+def add_cents_columns():
+    # The amount columns become nullable so that unapplying can add them
+    # back to tables that have rows
+    operations = []
+    for model_name, name, default, max_digits in MONEY_COLUMNS:
+        operations += [
+            migrations.AlterField(
+                model_name=model_name,
+                name=name,
+                field=models.DecimalField(decimal_places=2, max_digits=max_digits, null=True),
+            ),
+            migrations.AddField(
+                model_name=model_name,
+                name=f'{name}_cents',
+                field=models.BigIntegerField(null=True),
+            ),
+        ]
+    return operations
+
+
+def replace_columns():
+    operations = []
+    for model_name, name, default, max_digits in MONEY_COLUMNS:
+        options = {} if default is None else {'default': default}
+        operations += [
+            migrations.RemoveField(model_name=model_name, name=name),
+            migrations.RenameField(model_name=model_name, old_name=f'{name}_cents', new_name=name),
+            migrations.AlterField(
+                model_name=model_name,
+                name=name,
+                field=core.fields.MoneyField(**options),
+            ),
+        ]
+    return operations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_sharding'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='moneyrequest',
+            name='moneyrequest_amount_positive',
+        ),
+        migrations.RemoveIndex(
+            model_name='moneyrequest',
+            name='moneyreq_open_term_amount_idx',
+        ),
+        *add_cents_columns(),
+        migrations.RunPython(to_cents, from_cents),
+        *replace_columns(),
+        migrations.AddIndex(
+            model_name='moneyrequest',
+            index=models.Index(condition=models.Q(('lender__isnull', True)), fields=['term', 'amount'], name='moneyreq_open_term_amount_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='moneyrequest',
+            constraint=models.CheckConstraint(check=models.Q(('amount__gt', 0)), name='moneyrequest_amount_positive'),
+        ),
+    ]
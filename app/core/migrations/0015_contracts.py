@@ -0,0 +1,70 @@
+# Generated by Django 5.0.6 on 2026-10-19 05:00
+
+import core.fields
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_money_cents'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job', models.CharField(max_length=100)),
+                ('alias', models.CharField(max_length=64)),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Payment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', core.fields.MoneyField()),
+                ('paid_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Contract',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', core.fields.MoneyField()),
+                ('frequency', models.CharField(max_length=255)),
+                ('term', models.IntegerField()),
+                ('installment', core.fields.MoneyField()),
+                ('due_date', models.DateField()),
+                ('status', models.CharField(choices=[('ACTIVE', 'Active'), ('CLOSED', 'Closed')], default='ACTIVE', max_length=16)),
+                ('remaining_balance', core.fields.MoneyField()),
+                ('closed_at', models.DateTimeField(blank=True, null=True)),
+                ('borrower', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='borrowed_contracts', to=settings.AUTH_USER_MODEL)),
+                ('lender', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lent_contracts', to=settings.AUTH_USER_MODEL)),
+                ('moneyrequest', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='contract', to='core.moneyrequest')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='jobwatermark',
+            constraint=models.UniqueConstraint(fields=('job', 'alias'), name='jobwatermark_job_alias_unique'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='borrower',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='contract',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='core.contract'),
+        ),
+        migrations.AddConstraint(
+            model_name='payment',
+            constraint=models.CheckConstraint(check=models.Q(('amount__gt', 0)), name='payment_amount_positive'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.0.6 on 2026-10-19 05:08
+
+import core.fields
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_contracts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InterestAccrual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('business_date', models.DateField()),
+                ('balance', core.fields.MoneyField()),
+                ('rate', models.PositiveIntegerField()),
+                ('amount', core.fields.MoneyField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='rate',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='start_date',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(condition=models.Q(('status', 'ACTIVE')), fields=['id'], name='contract_active_id_idx'),
+        ),
+        migrations.AddField(
+            model_name='interestaccrual',
+            name='borrower',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='accruals', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='interestaccrual',
+            name='contract',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='accruals', to='core.contract'),
+        ),
+        migrations.AddConstraint(
+            model_name='interestaccrual',
+            constraint=models.UniqueConstraint(fields=('contract', 'business_date'), name='interestaccrual_contract_date_unique'),
+        ),
+    ]
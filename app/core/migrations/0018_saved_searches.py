@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-19 05:30
+
+import core.fields
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_audit_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedSearch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('min_amount', core.fields.MoneyField(blank=True, null=True)),
+                ('max_amount', core.fields.MoneyField(blank=True, null=True)),
+                ('min_term', models.PositiveIntegerField(blank=True, null=True)),
+                ('max_term', models.PositiveIntegerField(blank=True, null=True)),
+                ('frequency', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='saved_searches', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', '-id'], name='savedsearch_owner_id_desc_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-19 05:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_saved_searches'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usershard',
+            name='moving',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,6 +1,13 @@
-from django.db import models
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, router, transaction
+from django.db.utils import DatabaseError
+from django.utils import timezone
+
+from core import usercache
+from core.fields import MoneyField
+from core.money import Money
 
-from decimal import Decimal
 
 from django.contrib.auth.models import (
     AbstractBaseUser,
@@ -13,9 +20,183 @@ ACCOUNT_TYPES = [
     ('BORROWER', 'Borrower'),
     ('LENDER', 'Lender'),
 ]
+MONEYREQUEST_STATUSES = [
+    ('OPEN', 'Open'),
+    ('FUNDED', 'Funded'),
+    ('CLOSED', 'Closed'),
+]
+CONTRACT_STATUSES = [
+    ('ACTIVE', 'Active'),
+    ('CLOSED', 'Closed'),
+]
+AUDIT_ACTIONS = [
+    ('CREATE', 'Create'),
+    ('UPDATE', 'Update'),
+    ('DELETE', 'Delete'),
+]
+MIN_RISK_LEVEL = 1
+MAX_RISK_LEVEL = 5
 
 
 # Create your models here.
+class ConcurrentUpdateError(DatabaseError):
+    '''Raised when a row changed since it was loaded'''
+
+
+class TrackedFieldsMixin:
+    '''Remember the column values as loaded from or saved to the database'''
+    # Fields whose old values signal handlers need, see core.signals
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        '''Create an instance from a database row and snapshot its values'''
+        instance = super().from_db(db, field_names, values) # type: ignore
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def _current_value(self, attname):
+        '''Return the value of attname as the database would store it'''
+        return self._meta.get_field(attname).to_python(getattr(self, attname)) # type: ignore
+
+    def get_tracked_state(self):
+        '''Return the current values of the tracked fields'''
+        return {name: self._current_value(name) for name in self.tracked_fields}
+
+    def get_loaded_state(self):
+        '''Return the tracked values as last loaded or saved, or None if unknown'''
+        loaded = getattr(self, '_loaded_values', {})
+        if any(name not in loaded for name in self.tracked_fields):
+            return None
+        return {name: loaded[name] for name in self.tracked_fields}
+
+    def get_changed_fields(self):
+        '''Return the names of the fields changed since load, or None if unknown'''
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        changed = []
+        for field in self._meta.concrete_fields: # type: ignore
+            if field.primary_key or field.attname not in self.__dict__:
+                continue
+            if field.attname not in loaded or loaded[field.attname] != self._current_value(field.attname):
+                changed.append(field.name)
+        return changed
+
+    def reset_loaded_state(self, fields=None):
+        '''Mark the current values as the ones stored in the database'''
+        loaded = getattr(self, '_loaded_values', {})
+        for field in self._meta.concrete_fields: # type: ignore
+            if field.attname not in self.__dict__:
+                continue
+            if fields is None or field.name in fields or field.attname in fields:
+                loaded[field.attname] = self._current_value(field.attname)
+        self._loaded_values = loaded
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        '''Reload from the database and take a new snapshot'''
+        super().refresh_from_db(using=using, fields=fields, **kwargs) # type: ignore
+        self.reset_loaded_state(fields)
+
+    def save(self, *args, **kwargs):
+        '''Save and take a new snapshot'''
+        super().save(*args, **kwargs) # type: ignore
+        self.reset_loaded_state(kwargs.get('update_fields'))
+
+
+class VersionedMixin(TrackedFieldsMixin):
+    '''Optimistic concurrency control with a version column
+
+    Updates write only the changed columns, with
+    UPDATE ... SET version = n + 1 WHERE id = ... AND version = n, and raise
+    ConcurrentUpdateError if another writer got there first. The row is
+    not locked. The save runs in its own atomic block so that a conflict
+    leaves an enclosing transaction usable, and so that signal handlers'
+    writes to the same database commit together with the row. The
+    rollups live on 'default': for a row on another shard they commit
+    in a transaction of their own, see core.rollups.
+    '''
+    def save(self, *args, **kwargs):
+        '''Save only the changed fields, conditional on the loaded version'''
+        using = kwargs['using'] = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        if self._state.adding or kwargs.get('force_insert'): # type: ignore
+            with transaction.atomic(using=using):
+                return super().save(*args, **kwargs)
+
+        update_fields = kwargs.pop('update_fields', None)
+        if update_fields is None:
+            update_fields = self.get_changed_fields()
+            if update_fields is None:
+                update_fields = [
+                    f.name for f in self._meta.concrete_fields if not f.primary_key # type: ignore
+                ]
+        update_fields = [name for name in update_fields if name != 'version']
+        if not update_fields:
+            return None
+
+        self._expected_version = self.version # type: ignore
+        self.version += 1 # type: ignore
+        try:
+            with transaction.atomic(using=using):
+                return super().save(*args, update_fields=update_fields + ['version'], **kwargs)
+        except Exception:
+            self.version = self._expected_version # type: ignore
+            raise
+        finally:
+            self._expected_version = None
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        '''Only update the row if it still has the version that was loaded'''
+        expected = getattr(self, '_expected_version', None)
+        if expected is None:
+            # An unsaved instance with a primary key, save() tries UPDATE first
+            return super()._do_update( # type: ignore
+                base_qs, using, pk_val, values, update_fields, forced_update,
+            )
+        base_qs = base_qs.filter(version=expected)
+        updated = super()._do_update( # type: ignore
+            base_qs, using, pk_val, values, update_fields, forced_update,
+        )
+        if not updated:
+            raise ConcurrentUpdateError(
+                f'{self._meta.object_name} {pk_val} was changed by another request' # type: ignore
+            )
+        return updated
+
+
+class ShardedRowMixin:
+    '''Row stored on the shard of its owner, see core.sharding
+
+    With several shards the save runs in a transaction on that shard,
+    inside which the pre_save handler locks the owner, so that a move
+    copies the row or the save sees the move.
+    '''
+    def save(self, *args, **kwargs):
+        '''Save inside a transaction on the routed shard'''
+        if len(getattr(settings, 'SHARDS', ['default'])) == 1:
+            return super().save(*args, **kwargs) # type: ignore
+        using = kwargs['using'] = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            return super().save(*args, **kwargs) # type: ignore
+
+
+class InstanceRoutedQuerySet(models.QuerySet):
+    '''QuerySet whose create() lets the router see the new row
+
+    QuerySet.create() saves to the database routed for the model alone,
+    this one asks with the instance as a hint, which core.routers needs
+    to send a row to the shard of its owner.
+    '''
+    def create(self, **kwargs):
+        '''Create an object, routed by its field values unless using() was called'''
+        if self._db is not None:
+            return super().create(**kwargs)
+        obj = self.model(**kwargs)
+        self._for_write = True
+        obj.save(force_insert=True, using=router.db_for_write(self.model, instance=obj))
+        return obj
+
+
 class UserManager(BaseUserManager):
     '''Manager for the user model'''
     def create_user(self, email, password=None, **kwargs):
@@ -48,34 +229,355 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     USERNAME_FIELD = 'email'
 
-class Account(models.Model):
+class Account(VersionedMixin, ShardedRowMixin, models.Model):
     '''Model for a user account'''
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    tracked_fields = ('type', 'balance')
+
+    # Indexed by the composite index below, which also serves the list order
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     type = models.CharField(max_length=255, choices=ACCOUNT_TYPES, default='BORROWER')
-    balance = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal(0.00))
+    balance = MoneyField(default=0)
+    # Borrower specific, scored by account.risk from 1 (lowest) to 5
+    income = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+    risk_level = models.PositiveSmallIntegerField(blank=True, null=True)
+    # Lender specific, from 1 (most cautious) to 5
+    risk_appetite = models.PositiveSmallIntegerField(blank=True, null=True)
+    version = models.PositiveIntegerField(default=1)
+
+    objects = InstanceRoutedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # AccountViewSet lists by user ordered by -id
+            models.Index(fields=['user', '-id'], name='account_user_id_desc_idx'),
+        ]
 
     def __str__(self):
-        return self.user.email
+        # A user loaded with select_related is used as is, otherwise the
+        # user cache saves listing accounts a query per user
+        if Account.user.is_cached(self):
+            return self.user.email
+        user = usercache.get_user(self.user_id) if self.user_id is not None else None
+        if user is None:
+            # Not saved yet, or the user is gone
+            return super().__str__()
+        return user.email
 
-class MoneyRequest(models.Model):
+class MoneyRequest(VersionedMixin, ShardedRowMixin, models.Model):
     '''Model for a money request'''
+    tracked_fields = ('term', 'frequency', 'amount', 'lender_id', 'status')
+
+    # Indexed by the composite index below, which also serves the list order
     borrower = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='borrower',
+        db_index=False,
     )
+    # Indexed by the (lender, -id) index below, which also serves the
+    # lender dashboard's order
     lender = models.ForeignKey(
         User,
         blank=True,
         null=True,
         on_delete=models.CASCADE,
         related_name='lender',
+        db_index=False,
     )
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
-    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    amount = MoneyField()
+    frequency = models.CharField(max_length=255)
+    term = models.IntegerField()
+    status = models.CharField(max_length=16, choices=MONEYREQUEST_STATUSES, default='OPEN')
+    # Closed requests are moved to ArchivedMoneyRequest by archive_moneyrequests
+    closed_at = models.DateTimeField(blank=True, null=True)
+    version = models.PositiveIntegerField(default=1)
+
+    objects = InstanceRoutedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # MoneyRequestViewSet lists by borrower ordered by -id
+            models.Index(fields=['borrower', '-id'], name='moneyreq_borrower_id_desc_idx'),
+            # The lender dashboard lists by lender ordered by -id
+            models.Index(fields=['lender', '-id'], name='moneyreq_lender_id_desc_idx'),
+            # The marketplace filters open (unfunded) requests by term and an
+            # amount range, so the equality column goes first
+            models.Index(
+                fields=['term', 'amount'],
+                name='moneyreq_open_term_amount_idx',
+                condition=models.Q(lender__isnull=True),
+            ),
+            # archive_moneyrequests picks closed requests by closing time
+            models.Index(
+                fields=['closed_at'],
+                name='moneyreq_closed_at_idx',
+                condition=models.Q(status='CLOSED'),
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(amount__gt=0),
+                name='moneyrequest_amount_positive',
+            ),
+            models.CheckConstraint(
+                check=models.Q(term__gt=0),
+                name='moneyrequest_term_positive',
+            ),
+        ]
+
+    def __str__(self):
+        return self.title
+
+    def close(self):
+        '''Mark the money request as closed, ready to be archived'''
+        self.status = 'CLOSED'
+        self.closed_at = timezone.now()
+        self.save()
+
+
+class ArchivedMoneyRequest(ShardedRowMixin, models.Model):
+    '''Closed money request moved out of the MoneyRequest table
+
+    Rows keep the id they had as a MoneyRequest, so the detail endpoint can
+    still find them. Only the primary key and foreign keys are indexed.
+    '''
+    id = models.BigIntegerField(primary_key=True)
+    borrower = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_borrower',
+    )
+    lender = models.ForeignKey(
+        User,
+        blank=True,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='archived_lender',
+    )
+    title = models.CharField(max_length=255)
+    description = models.TextField(blank=True, null=True)
+    amount = MoneyField()
+    frequency = models.CharField(max_length=255)
+    term = models.IntegerField()
+    status = models.CharField(max_length=16, choices=MONEYREQUEST_STATUSES)
+    closed_at = models.DateTimeField(blank=True, null=True)
+    version = models.PositiveIntegerField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.title
+
+
+class Contract(ShardedRowMixin, models.Model):
+    '''Agreement between the borrower and the lender of a funded money request
+
+    remaining_balance is a counter kept by core.contracts, a contract
+    closes when it reaches zero.
+    '''
+    # Archived money requests keep their id, so the reference is not a
+    # database constraint and survives archiving
+    moneyrequest = models.OneToOneField(
+        MoneyRequest,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='contract',
+    )
+    borrower = models.ForeignKey(User, on_delete=models.CASCADE, related_name='borrowed_contracts')
+    lender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='lent_contracts')
+    amount = MoneyField()
     frequency = models.CharField(max_length=255)
     term = models.IntegerField()
+    installment = MoneyField()
+    # Yearly interest rate in basis points, accrued daily by core.accrual
+    rate = models.PositiveIntegerField(default=0)
+    start_date = models.DateField(default=timezone.localdate)
+    due_date = models.DateField()
+    status = models.CharField(max_length=16, choices=CONTRACT_STATUSES, default='ACTIVE')
+    remaining_balance = MoneyField()
+    closed_at = models.DateTimeField(blank=True, null=True)
+
+    objects = InstanceRoutedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # accrue_interest walks active contracts in id order
+            models.Index(
+                fields=['id'],
+                name='contract_active_id_idx',
+                condition=models.Q(status='ACTIVE'),
+            ),
+        ]
+
+    def __str__(self):
+        return f'Contract {self.pk}'
+
+
+class Payment(ShardedRowMixin, models.Model):
+    '''Payment made against a contract, see core.contracts.apply_payments'''
+    contract = models.ForeignKey(Contract, on_delete=models.CASCADE, related_name='payments')
+    # The borrower of the contract, who owns the row on the shards
+    borrower = models.ForeignKey(User, on_delete=models.CASCADE, related_name='payments')
+    amount = MoneyField()
+    paid_at = models.DateTimeField(default=timezone.now)
+
+    objects = InstanceRoutedQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(amount__gt=0),
+                name='payment_amount_positive',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{Money(self.amount).to_decimal()} on contract {self.contract_id}' # type: ignore
+
+
+class InterestAccrual(ShardedRowMixin, models.Model):
+    '''Interest accrued on a contract for one business date, see core.accrual'''
+    contract = models.ForeignKey(Contract, on_delete=models.CASCADE, related_name='accruals')
+    # The borrower of the contract, who owns the row on the shards
+    borrower = models.ForeignKey(User, on_delete=models.CASCADE, related_name='accruals')
+    business_date = models.DateField()
+    # Balance and rate the amount was computed from
+    balance = MoneyField()
+    rate = models.PositiveIntegerField()
+    amount = MoneyField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = InstanceRoutedQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Makes accruing a date twice a no-op
+            models.UniqueConstraint(
+                fields=['contract', 'business_date'],
+                name='interestaccrual_contract_date_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.contract_id} {self.business_date}' # type: ignore
+
+
+class MoneyRequestRollup(models.Model):
+    '''Running totals of money requests per term and frequency'''
+    term = models.IntegerField()
+    frequency = models.CharField(max_length=255)
+    count = models.BigIntegerField(default=0)
+    funded_count = models.BigIntegerField(default=0)
+    total_amount = MoneyField(default=0)
+    outstanding_principal = MoneyField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['term', 'frequency'],
+                name='moneyrequestrollup_bucket_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.term} {self.frequency}'
+
+
+class AccountRollup(models.Model):
+    '''Running totals of account balances per account type'''
+    type = models.CharField(max_length=255, choices=ACCOUNT_TYPES, unique=True)
+    count = models.BigIntegerField(default=0)
+    total_balance = MoneyField(default=0)
+
+    def __str__(self):
+        return self.type
+
+
+class UserShard(models.Model):
+    '''Database alias holding the rows a user owns, see core.sharding'''
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+    alias = models.CharField(max_length=64)
+    # Set while the rows are copied to another shard, writes are refused
+    moving = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f'{self.user_id} {self.alias}' # type: ignore
+
+
+class IdBlock(models.Model):
+    '''Next free primary key of a sharded model, handed out in blocks'''
+    model = models.CharField(max_length=100, primary_key=True)
+    next_id = models.BigIntegerField()
+
+    def __str__(self):
+        return self.model
+
+
+class JobWatermark(models.Model):
+    '''How far a batch job has got on one database, e.g. the last id it processed'''
+    job = models.CharField(max_length=100)
+    alias = models.CharField(max_length=64)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'alias'], name='jobwatermark_job_alias_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.job} {self.alias} {self.value}'
+
+
+class AuditEvent(models.Model):
+    '''A change made through the API, written in batches by core.audit'''
+    # Set when the change is made, makes writing an event twice a no-op
+    event_id = models.UUIDField(unique=True)
+    actor = models.ForeignKey(
+        User,
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='audit_events',
+    )
+    model = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=16, choices=AUDIT_ACTIONS)
+    # {field: [old, new]}, amounts in cents
+    changes = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # The history of one object, latest first
+            models.Index(fields=['model', 'object_id', '-id'], name='auditevent_object_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.action} {self.model} {self.object_id}'
+
+
+class SavedSearch(models.Model):
+    '''Money requests a lender wants to hear about, matched by core.searches
+
+    A missing bound or a blank frequency matches anything.
+    '''
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saved_searches', db_index=False)
+    name = models.CharField(max_length=255)
+    min_amount = MoneyField(blank=True, null=True)
+    max_amount = MoneyField(blank=True, null=True)
+    min_term = models.PositiveIntegerField(blank=True, null=True)
+    max_term = models.PositiveIntegerField(blank=True, null=True)
+    frequency = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # SavedSearchViewSet lists by owner ordered by -id
+            models.Index(fields=['owner', '-id'], name='savedsearch_owner_id_desc_idx'),
+        ]
 
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return self.name
@@ -0,0 +1,82 @@
+'''
+Money as a whole number of cents
+
+Money is an int holding cents, so sums, differences and comparisons are
+plain integer operations and columns of amounts load straight into NumPy
+int64 arrays. Money(77777) is 777.77; anything that is not an int, e.g.
+Money('777.77') or Money(Decimal('777.77')), is read as an amount in
+currency units and rounded half up to the cent. Arithmetic is int's own
+and returns plain ints of cents, wrap a result in Money() to display it.
+
+str() and format() give the number of cents, like any int, because
+database drivers dump ints that way. Use to_decimal() to display an
+amount. The vectorized helpers below take and return int64 arrays of
+cents and round half away from zero, like Decimal's ROUND_HALF_UP.
+'''
+from decimal import ROUND_HALF_UP, Decimal
+
+# Constants
+CENT = Decimal('0.01')
+CENTS_PER_UNIT = 100
+
+
+class Money(int):
+    '''An amount of money in cents'''
+    __slots__ = ()
+
+    def __new__(cls, value=0):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return super().__new__(cls, value)
+        amount = value if isinstance(value, Decimal) else Decimal(str(value))
+        return super().__new__(cls, int(amount.quantize(CENT, ROUND_HALF_UP).scaleb(2)))
+
+    def to_decimal(self):
+        '''Return the amount in currency units, with two decimal places'''
+        return Decimal(int(self)).scaleb(-2)
+
+    def __repr__(self):
+        return f"Money('{self.to_decimal()}')"
+
+    # int's own str(), object.__str__ would use the repr above
+    __str__ = int.__repr__
+
+
+def to_cents(values):
+    '''Return an int64 array of cents from Money, ints of cents or Decimals'''
+    # Imported here so NumPy is not loaded at startup, models import Money
+    import numpy as np
+    return np.fromiter((Money(value) for value in values), dtype=np.int64)
+
+
+def round_div(numerator, denominator):
+    '''Divide int arrays, rounding half away from zero'''
+    import numpy as np
+    numerator = np.asarray(numerator, dtype=np.int64)
+    sign = np.where(numerator < 0, -1, 1)
+    return sign * ((2 * np.abs(numerator) + denominator) // (2 * denominator))
+
+
+def apply_rate(cents, rate, scale=10_000):
+    '''Return cents * rate / scale, rates being integers such as basis points'''
+    import numpy as np
+    return round_div(np.asarray(cents, dtype=np.int64) * np.asarray(rate, dtype=np.int64), scale)
+
+
+def allocate(total, weights):
+    '''Split total cents in proportion to weights, the parts adding up to total
+
+    Each part is rounded down and the cents left over go, one each, to the
+    parts with the largest remainders.
+    '''
+    import numpy as np
+    weights = np.asarray(weights, dtype=np.int64)
+    shares = total * weights
+    parts, remainders = np.divmod(shares, weights.sum())
+    leftover = int(total - parts.sum())
+    parts[np.argsort(-remainders, kind='stable')[:leftover]] += 1
+    return parts
+
+
+def to_decimals(cents):
+    '''Return a list of Decimal amounts from an array of cents'''
+    return [Money(int(value)).to_decimal() for value in cents]
@@ -0,0 +1,215 @@
+'''
+Per request profiling
+
+A profiled request records where its time went:
+- database: time spent executing queries, rows the driver fetches
+  lazily afterwards count towards whoever reads them
+- view: the view's own time without queries, mostly serializers in DRF
+- render: time spent rendering the response
+- other: middleware and the rest
+Its profile also holds either stack samples, taken every
+PROFILING_SAMPLE_INTERVAL seconds from a background thread and exportable
+as collapsed stacks for flamegraph tools, or full cProfile statistics.
+The sampler needs the GIL to take a sample, so CPU bound code is sampled
+about once per sys.getswitchinterval() (5 ms by default) at most.
+The last PROFILING_BUFFER_SIZE profiles are kept in memory, per process.
+'''
+import cProfile
+import io
+import itertools
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+# Constants
+DEFAULT_BUFFER_SIZE = 50
+DEFAULT_SAMPLE_INTERVAL = 0.005
+MODES = ('sample', 'cprofile')
+# Innermost matching frame decides where a stack sample is counted
+CATEGORY_PREFIXES = [
+    ('database', ('django.db.backends', 'psycopg', 'sqlite3')),
+    ('render', ('rest_framework.renderers', 'core.renderers', 'django.template')),
+    ('serializer', ('rest_framework.serializers', 'rest_framework.fields', 'rest_framework.relations')),
+]
+
+_ids = itertools.count(1)
+_lock = threading.Lock()
+_profiles = deque(maxlen=getattr(settings, 'PROFILING_BUFFER_SIZE', DEFAULT_BUFFER_SIZE))
+
+
+def frame_name(frame):
+    '''Return module:function for a frame'''
+    return f'{frame.f_globals.get("__name__", "?")}:{frame.f_code.co_name}'
+
+
+def categorize(frame):
+    '''Return the category of the innermost frame that has one'''
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        for category, prefixes in CATEGORY_PREFIXES:
+            if module.startswith(prefixes):
+                return category
+        frame = frame.f_back
+    return 'other'
+
+
+def collapse(frame):
+    '''Return the stack of a frame as root;...;leaf'''
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    '''Sample the stack of one thread from a background thread'''
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.categories = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def _run(self):
+        '''Take samples until stopped'''
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.stacks[collapse(frame)] += 1
+            self.categories[categorize(frame)] += 1
+
+    def start(self):
+        '''Start sampling'''
+        self._thread.start()
+
+    def stop(self):
+        '''Stop sampling and wait for the sampler thread'''
+        self._stop.set()
+        self._thread.join()
+
+
+class RequestProfile:
+    '''Profile of one request while it is being handled'''
+    def __init__(self, mode):
+        self.mode = mode
+        self.db_time = 0.0
+        self.queries = 0
+        self.marks = {}
+        self.sampler = None
+        self.profiler = None
+
+    def mark(self, name):
+        '''Record the time and the database time so far at a point'''
+        self.marks[name] = (time.perf_counter(), self.db_time)
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        '''Time queries, see connection.execute_wrapper'''
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+    def capture(self):
+        '''Return a context manager profiling the code it wraps'''
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self.db_wrapper))
+        if self.mode == 'cprofile':
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+            stack.callback(self.profiler.disable)
+        else:
+            interval = getattr(settings, 'PROFILING_SAMPLE_INTERVAL', DEFAULT_SAMPLE_INTERVAL)
+            self.sampler = StackSampler(threading.get_ident(), interval)
+            self.sampler.start()
+            stack.callback(self.sampler.stop)
+        self.mark('start')
+        stack.callback(self.mark, 'end')
+        return stack
+
+    def _span(self, start, end):
+        '''Return (seconds, database seconds) between two marks'''
+        if start not in self.marks or end not in self.marks:
+            return 0.0, 0.0
+        (t0, db0), (t1, db1) = self.marks[start], self.marks[end]
+        return t1 - t0, db1 - db0
+
+    def breakdown(self):
+        '''Return the time spent in each part of the request, in milliseconds'''
+        total, db = self._span('start', 'end')
+        view_end = 'view_end' if 'view_end' in self.marks else 'end'
+        view, view_db = self._span('view_start', view_end)
+        render, render_db = self._span('render_start', 'render_end')
+        parts = {
+            'database': db,
+            'view': view - view_db,
+            'render': render - render_db,
+        }
+        parts['other'] = total - sum(parts.values())
+        return {'total': total * 1000, **{name: value * 1000 for name, value in parts.items()}}
+
+    def stats_text(self, limit=40):
+        '''Return the cProfile statistics, slowest cumulative first'''
+        if self.profiler is None:
+            return ''
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+
+    def finish(self, request, response):
+        '''Store the profile and return its record'''
+        user = getattr(request, 'user', None)
+        record = {
+            'id': next(_ids),
+            'time': timezone.now(),
+            'mode': self.mode,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'user': str(user) if user is not None and user.is_authenticated else '',
+            'queries': self.queries,
+            'breakdown': self.breakdown(),
+            'categories': dict(self.sampler.categories) if self.sampler else {},
+            'stacks': dict(self.sampler.stacks) if self.sampler else {},
+            'stats': self.stats_text(),
+        }
+        with _lock:
+            _profiles.append(record)
+        return record
+
+
+def get_profiles():
+    '''Return the stored profiles, newest first'''
+    with _lock:
+        return list(reversed(_profiles))
+
+
+def get_profile(profile_id):
+    '''Return a stored profile by id, or None'''
+    return next((record for record in get_profiles() if record['id'] == profile_id), None)
+
+
+def clear_profiles():
+    '''Forget the stored profiles'''
+    with _lock:
+        _profiles.clear()
+
+
+def collapsed_stacks(record):
+    '''Return the samples of a profile as collapsed stack text'''
+    return ''.join(
+        f'{stack} {count}\n'
+        for stack, count in sorted(record['stacks'].items(), key=lambda item: -item[1])
+    )
@@ -0,0 +1,56 @@
+'''
+Fast renderers for API responses
+
+ORJSONRenderer is a drop-in replacement for DRF's JSONRenderer and
+MessagePackRenderer is selected with "Accept: application/msgpack" or
+"?format=msgpack". Both render Decimal values as strings so that amounts
+and balances keep their exact value.
+'''
+from decimal import Decimal
+
+import msgpack
+import orjson
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_encoder = JSONEncoder()
+
+
+def default(obj):
+    '''Encode the types orjson and msgpack do not handle natively'''
+    if isinstance(obj, Decimal):
+        return str(obj)
+    return _encoder.default(obj)
+
+
+class ORJSONRenderer(BaseRenderer):
+    '''Render data to JSON with orjson'''
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        '''Render data into JSON bytes'''
+        if data is None:
+            return b''
+
+        option = orjson.OPT_NON_STR_KEYS
+        if accepted_media_type and 'indent=' in accepted_media_type:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=default, option=option)
+
+
+class MessagePackRenderer(BaseRenderer):
+    '''Render data to MessagePack'''
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        '''Render data into MessagePack bytes'''
+        if data is None:
+            return b''
+
+        return msgpack.packb(data, default=default, use_bin_type=True)
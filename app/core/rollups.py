@@ -0,0 +1,203 @@
+'''
+Incrementally maintained portfolio rollups
+
+Every save or delete of a MoneyRequest or Account applies the difference
+between its old and new values to one or two rollup rows, so reading the
+totals costs O(buckets) instead of a GROUP BY over the whole table.
+Closed requests leave the rollups, so archiving them changes nothing.
+Bulk writes (bulk_create, queryset.update) bypass the signals; run
+"manage.py check_rollups --fix" after them. The rollups live on 'default'
+and cover every shard.
+'''
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+
+from core import sharding
+from core.money import Money
+from core.models import Account, AccountRollup, MoneyRequest, MoneyRequestRollup
+
+ZERO = Money(0)
+
+
+def moneyrequest_measures(state):
+    '''Return the bucket key and measures one money request contributes'''
+    if state['status'] == 'CLOSED':
+        return None, None
+    funded = state['lender_id'] is not None
+    key = (state['term'], state['frequency'])
+    return key, {
+        'count': 1,
+        'funded_count': int(funded),
+        'total_amount': state['amount'],
+        'outstanding_principal': state['amount'] if funded else ZERO,
+    }
+
+
+def account_measures(state):
+    '''Return the bucket key and measures one account contributes'''
+    return (state['type'],), {
+        'count': 1,
+        'total_balance': state['balance'],
+    }
+
+
+def _add(model, key_fields, key, measures, sign):
+    '''Add (sign=1) or subtract (sign=-1) measures on the bucket row for key'''
+    lookup = dict(zip(key_fields, key))
+    changes = {name: F(name) + sign * value for name, value in measures.items()}
+    if model.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(
+                **lookup,
+                **{name: sign * value for name, value in measures.items()},
+            )
+    except IntegrityError:
+        # Another writer created the bucket first
+        model.objects.filter(**lookup).update(**changes)
+
+
+def _apply(model, key_fields, measures_for, old, new):
+    '''Apply the change from old to new state, either may be None'''
+    old_key, old_measures = measures_for(old) if old else (None, None)
+    new_key, new_measures = measures_for(new) if new else (None, None)
+
+    if old_key == new_key and old_key is not None:
+        delta = {
+            name: new_measures[name] - old_measures[name]
+            for name in new_measures
+            if new_measures[name] != old_measures[name]
+        }
+        if delta:
+            _add(model, key_fields, new_key, delta, 1)
+        return
+
+    if old_key is not None:
+        _add(model, key_fields, old_key, old_measures, -1)
+    if new_key is not None:
+        _add(model, key_fields, new_key, new_measures, 1)
+
+
+def apply_moneyrequest(old, new):
+    '''Apply a money request change to the rollups'''
+    _apply(MoneyRequestRollup, ('term', 'frequency'), moneyrequest_measures, old, new)
+
+
+def apply_account(old, new):
+    '''Apply an account change to the rollups'''
+    _apply(AccountRollup, ('type',), account_measures, old, new)
+
+
+def _sum_shards(compute):
+    '''Return the measures compute(alias) returns, added up over the shards'''
+    totals = {}
+    for buckets in sharding.for_each_shard(compute):
+        for key, measures in buckets.items():
+            if key in totals:
+                totals[key] = {name: totals[key][name] + value for name, value in measures.items()}
+            else:
+                totals[key] = measures
+    return totals
+
+
+def _moneyrequest_buckets(alias):
+    '''Return the money request measures of one shard'''
+    queryset = MoneyRequest.objects.using(alias).exclude(status='CLOSED')
+    rows = queryset.values('term', 'frequency').annotate(
+        count=Count('id'),
+        funded_count=Count('id', filter=Q(lender__isnull=False)),
+        total_amount=Sum('amount'),
+        outstanding_principal=Sum('amount', filter=Q(lender__isnull=False)),
+    )
+    return {
+        (row['term'], row['frequency']): {
+            'count': row['count'],
+            'funded_count': row['funded_count'],
+            'total_amount': row['total_amount'] or ZERO,
+            'outstanding_principal': row['outstanding_principal'] or ZERO,
+        }
+        for row in rows
+    }
+
+
+def _account_buckets(alias):
+    '''Return the account measures of one shard'''
+    rows = Account.objects.using(alias).values('type').annotate(
+        count=Count('id'),
+        total_balance=Sum('balance'),
+    )
+    return {
+        (row['type'],): {
+            'count': row['count'],
+            'total_balance': row['total_balance'] or ZERO,
+        }
+        for row in rows
+    }
+
+
+def compute_moneyrequest_rollups():
+    '''Recompute the money request rollups from scratch'''
+    return _sum_shards(_moneyrequest_buckets)
+
+
+def compute_account_rollups():
+    '''Recompute the account rollups from scratch'''
+    return _sum_shards(_account_buckets)
+
+
+def _stored(model, key_fields, measure_fields):
+    '''Return the stored rollup rows keyed like the computed ones'''
+    return {
+        tuple(row[name] for name in key_fields): {name: row[name] for name in measure_fields}
+        for row in model.objects.values(*key_fields, *measure_fields)
+    }
+
+
+def _diff(stored, computed, empty):
+    '''Return (key, stored, computed) for every bucket that differs'''
+    differences = []
+    for key in sorted(set(stored) | set(computed), key=str):
+        have = stored.get(key, empty)
+        want = computed.get(key, empty)
+        if have != want:
+            differences.append((key, have, want))
+    return differences
+
+
+def diff_rollups():
+    '''Return the differences between the stored and recomputed rollups'''
+    moneyrequest_empty = {
+        'count': 0,
+        'funded_count': 0,
+        'total_amount': ZERO,
+        'outstanding_principal': ZERO,
+    }
+    account_empty = {'count': 0, 'total_balance': ZERO}
+    return {
+        'moneyrequest': _diff(
+            _stored(MoneyRequestRollup, ('term', 'frequency'), list(moneyrequest_empty)),
+            compute_moneyrequest_rollups(),
+            moneyrequest_empty,
+        ),
+        'account': _diff(
+            _stored(AccountRollup, ('type',), list(account_empty)),
+            compute_account_rollups(),
+            account_empty,
+        ),
+    }
+
+
+@transaction.atomic
+def rebuild_rollups():
+    '''Replace the stored rollups with ones recomputed from scratch'''
+    MoneyRequestRollup.objects.all().delete()
+    MoneyRequestRollup.objects.bulk_create([
+        MoneyRequestRollup(term=term, frequency=frequency, **measures)
+        for (term, frequency), measures in compute_moneyrequest_rollups().items()
+    ])
+    AccountRollup.objects.all().delete()
+    AccountRollup.objects.bulk_create([
+        AccountRollup(type=type, **measures)
+        for (type,), measures in compute_account_rollups().items()
+    ])
@@ -0,0 +1,49 @@
+'''
+Database routers
+'''
+from django.contrib.auth import get_user_model
+
+from core import sharding
+
+
+class ShardRouter:
+    '''Send the rows a user owns to the shard of that user, see core.sharding'''
+    def _route(self, model, write=False, **hints):
+        '''Return the shard for a sharded model, None for everything else
+
+        Writes look the owner's shard up afresh, a row loaded before its
+        owner moved is saved to the new shard.
+        '''
+        if not sharding.is_sharded(model):
+            return None
+        shards = sharding.get_shards()
+        if len(shards) == 1:
+            return shards[0]
+        locate = sharding.shard_for_write if write else sharding.shard_for_user
+        instance = hints.get('instance')
+        if isinstance(instance, get_user_model()):
+            # Related managers of a user, e.g. user.account_set
+            return locate(instance.pk)
+        if instance is not None and sharding.is_sharded(type(instance)):
+            if instance._state.db and not write:
+                return instance._state.db
+            owner = sharding.owner_id(instance)
+            if owner is not None:
+                return locate(owner)
+            return instance._state.db or sharding.current_shard()
+        return sharding.current_shard()
+
+    def db_for_read(self, model, **hints):
+        '''Return the database to read model from'''
+        return self._route(model, **hints)
+
+    def db_for_write(self, model, **hints):
+        '''Return the database to write model to'''
+        return self._route(model, write=True, **hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        '''Allow relations to users, every shard has copies of the ones it needs'''
+        User = get_user_model()
+        if isinstance(obj1, User) or isinstance(obj2, User):
+            return True
+        return None
@@ -0,0 +1,71 @@
+'''
+Build-time OpenAPI schema artifacts
+
+"manage.py build_schema" writes the schema in YAML and JSON to
+SCHEMA_ARTIFACT_DIR, and /api/schema/ serves those files as they are,
+with an ETag, instead of introspecting every view on each request.
+'''
+import hashlib
+import os
+from pathlib import Path
+
+from django.conf import settings
+
+# Constants
+FORMATS = {
+    'yaml': ('schema.yaml', 'application/vnd.oai.openapi'),
+    'json': ('schema.json', 'application/vnd.oai.openapi+json'),
+}
+
+_artifacts = {}
+
+
+def artifact_dir():
+    '''Return the directory holding the schema artifacts'''
+    return Path(getattr(settings, 'SCHEMA_ARTIFACT_DIR', settings.BASE_DIR / 'schema'))
+
+
+def generate_schema():
+    '''Generate the schema and return it rendered in every format'''
+    from drf_spectacular.generators import SchemaGenerator
+    from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+
+    schema = SchemaGenerator().get_schema(request=None, public=True)
+    return {
+        'yaml': OpenApiYamlRenderer().render(schema, renderer_context={}),
+        'json': OpenApiJsonRenderer().render(schema, renderer_context={}),
+    }
+
+
+def build_artifacts():
+    '''Write the schema artifacts and return their paths'''
+    directory = artifact_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for fmt, content in generate_schema().items():
+        path = directory / FORMATS[fmt][0]
+        tmp = path.with_suffix(path.suffix + '.tmp')
+        tmp.write_bytes(content)
+        os.replace(tmp, path)
+        paths.append(path)
+    return paths
+
+
+def load_artifact(fmt):
+    '''Return (content, etag) of an artifact, or None if it was not built
+
+    Files are read once and kept in memory until their mtime changes.
+    '''
+    path = artifact_dir() / FORMATS[fmt][0]
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    cached = _artifacts.get(path)
+    if cached is None or cached[0] != mtime:
+        content = path.read_bytes()
+        etag = '"%s"' % hashlib.sha256(content).hexdigest()[:32]
+        cached = (mtime, content, etag)
+        _artifacts[path] = cached
+    return cached[1], cached[2]
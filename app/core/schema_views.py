@@ -0,0 +1,14 @@
+'''
+Schema view used when the schema artifacts have not been built
+
+Loaded through core.views.lazy_view, so drf_spectacular's views are only
+imported on first use.
+'''
+from drf_spectacular.views import SpectacularAPIView
+
+from core.coalescing import coalesce
+
+
+class CoalescedSchemaView(SpectacularAPIView):
+    '''Generate the schema once for concurrent identical requests'''
+    get = coalesce(per_user=False)(SpectacularAPIView.get)
@@ -0,0 +1,234 @@
+'''
+Saved searches matched against new money requests
+
+Matching a new money request does not run every saved search. The saved
+searches are loaded into a SearchIndex, a segment tree over their amount
+ranges: the distinct bounds cut amounts into slots, and each search is
+stored in the O(log n) tree nodes that exactly cover its slots. The
+searches whose amount range holds an amount are those stored on the path
+from the leaf of its slot to the root, found in O(log n + k) for k
+searches; term and frequency are then checked on those k only.
+
+send_digests matches the money requests created since its watermark, the
+highest money request id it has processed on each shard, and sends every
+lender one email listing the open requests their searches matched.
+Watermarks are saved after the emails are sent, so a run that fails in
+between sends them again on the next run. Like reconcile_contracts, a
+request whose transaction commits after one with a higher id can fall
+below the watermark and is not matched.
+'''
+from collections import defaultdict
+
+import numpy as np
+
+from django.contrib.auth import get_user_model
+from django.core.mail import send_mass_mail
+
+from core import sharding
+from core.models import JobWatermark, MoneyRequest, SavedSearch
+from core.money import Money
+
+# Constants
+DIGEST_JOB = 'search_digests'
+DEFAULT_BATCH_SIZE = 1000
+DIGEST_MAX_ITEMS = 20
+# Upper bound of amounts and terms for searches without one, high + 1 must fit in int64
+NO_LIMIT = 2**62
+ANY_FREQUENCY = 0
+
+
+class SearchIndex:
+    '''Segment tree of saved searches over their amount ranges'''
+    def __init__(self, searches, names=(), frequencies=()):
+        '''Build the index from equally sized arrays, see to_arrays
+
+        searches holds id, owner, min_amount, max_amount, min_term,
+        max_term (bounds included) and frequency, a code from frequencies
+        starting at 1, ANY_FREQUENCY when blank.
+        '''
+        self.searches = searches
+        self.names = list(names)
+        self.frequencies = {frequency: code for code, frequency in enumerate(frequencies, 1)}
+        low, high = searches['min_amount'], searches['max_amount']
+        # Slot i holds the amounts from bounds[i] to bounds[i + 1] - 1
+        self.bounds = np.unique(np.concatenate([low, high + 1]))
+        self.size = 1 << max(0, len(self.bounds) - 1).bit_length()
+
+        # Walk up the tree for every search at once, collecting the nodes
+        # covering [start, stop) as a segment tree query would
+        start = np.searchsorted(self.bounds, low) + self.size
+        stop = np.searchsorted(self.bounds, high + 1) + self.size
+        members = np.arange(len(low))
+        node_parts, member_parts = [], []
+        while True:
+            active = start < stop
+            start, stop, members = start[active], stop[active], members[active]
+            if not len(members):
+                break
+            left = (start & 1) == 1
+            node_parts.append(start[left])
+            member_parts.append(members[left])
+            start = start + left
+            right = (stop & 1) == 1
+            stop = stop - right
+            node_parts.append(stop[right])
+            member_parts.append(members[right])
+            start, stop = start >> 1, stop >> 1
+
+        nodes = np.concatenate(node_parts) if node_parts else np.zeros(0, dtype=np.int64)
+        order = np.argsort(nodes, kind='stable')
+        self.members = np.concatenate(member_parts)[order] if member_parts else nodes
+        # Searches stored on node i are members[offsets[i]:offsets[i + 1]]
+        self.offsets = np.searchsorted(nodes[order], np.arange(2 * self.size + 1))
+        # Term and frequency laid out like members, so that checking the
+        # candidates reads a few contiguous runs rather than gathering them
+        self.stored = {
+            field: searches[field][self.members] for field in ('min_term', 'max_term', 'frequency')
+        }
+
+    def __len__(self):
+        return len(self.searches['id'])
+
+    def path(self, amount):
+        '''Return the slices of members stored on the nodes from amount's leaf to the root'''
+        slot = int(np.searchsorted(self.bounds, amount, side='right')) - 1
+        if slot < 0:
+            return []
+        node = slot + self.size
+        slices = []
+        while node:
+            slices.append(slice(self.offsets[node], self.offsets[node + 1]))
+            node >>= 1
+        return slices
+
+    def gather(self, array, slices):
+        '''Return the parts of array the slices select, end to end'''
+        if not slices:
+            return array[:0]
+        return np.concatenate([array[part] for part in slices])
+
+    def candidates(self, amount):
+        '''Return the positions of the searches whose amount range holds amount'''
+        return self.gather(self.members, self.path(amount))
+
+    def match(self, amount, term, frequency):
+        '''Return the positions of the searches a money request matches'''
+        slices = self.path(int(amount))
+        stored = self.stored
+        codes = self.gather(stored['frequency'], slices)
+        keep = (
+            (self.gather(stored['min_term'], slices) <= term)
+            & (self.gather(stored['max_term'], slices) >= term)
+            & ((codes == ANY_FREQUENCY) | (codes == self.frequencies.get(frequency, -1)))
+        )
+        return self.gather(self.members, slices)[keep]
+
+
+def to_arrays(rows):
+    '''Return the arrays, names and frequencies SearchIndex takes, from saved search rows
+
+    Rows are (id, owner, name, min amount, max amount, min term, max term,
+    frequency) with None for a missing bound.
+    '''
+    frequencies = sorted({row[7] for row in rows if row[7]})
+    codes = {frequency: code for code, frequency in enumerate(frequencies, 1)}
+
+    def column(i, missing):
+        return np.array([missing if row[i] is None else row[i] for row in rows], dtype=np.int64)
+
+    searches = {
+        'id': column(0, 0),
+        'owner': column(1, 0),
+        'min_amount': column(3, 0),
+        'max_amount': column(4, NO_LIMIT),
+        'min_term': column(5, 0),
+        'max_term': column(6, NO_LIMIT),
+        'frequency': np.array([codes.get(row[7], ANY_FREQUENCY) for row in rows], dtype=np.int64),
+    }
+    return searches, [row[2] for row in rows], frequencies
+
+
+def load_index():
+    '''Return a SearchIndex of every saved search'''
+    rows = list(
+        SavedSearch.objects.using(sharding.users_database()).order_by('id').values_list(
+            'id', 'owner_id', 'name', 'min_amount', 'max_amount', 'min_term', 'max_term', 'frequency',
+        )
+    )
+    return SearchIndex(*to_arrays(rows))
+
+
+def match_shard(alias, index, watermark, batch_size=DEFAULT_BATCH_SIZE):
+    '''Match the money requests of a shard past the watermark
+
+    Returns how many requests were checked and {lender id: {money request
+    id: (row, names of the matching searches)}}, and moves the watermark
+    without saving it.
+    '''
+    checked, matches = 0, defaultdict(dict)
+    while True:
+        # Served by the primary key index, whatever the number of requests
+        rows = list(
+            MoneyRequest.objects.using(alias)
+            .filter(id__gt=watermark.value)
+            .order_by('id')
+            .values_list('id', 'borrower_id', 'title', 'amount', 'term', 'frequency', 'status')[:batch_size]
+        )
+        if not rows:
+            break
+        for row in rows:
+            pk, borrower_id, _, amount, term, frequency, status = row
+            if status != 'OPEN':
+                continue
+            for position in index.match(amount, term, frequency):
+                owner = int(index.searches['owner'][position])
+                if owner == borrower_id:
+                    continue
+                _, names = matches[owner].setdefault(pk, (row, []))
+                names.append(index.names[position])
+        checked += len(rows)
+        watermark.value = rows[-1][0]
+        if len(rows) < batch_size:
+            break
+    return checked, matches
+
+
+def digest(email, moneyrequests):
+    '''Return the (subject, message, from, recipients) of a lender's digest'''
+    lines = [
+        f'- {title}: {Money(amount).to_decimal()} in {term} {frequency.lower()} payments '
+        f'(matches {", ".join(names)})'
+        for (_, _, title, amount, term, frequency, _), names in moneyrequests[:DIGEST_MAX_ITEMS]
+    ]
+    if len(moneyrequests) > DIGEST_MAX_ITEMS:
+        lines.append(f'and {len(moneyrequests) - DIGEST_MAX_ITEMS} more')
+    subject = f'{len(moneyrequests)} new money requests match your saved searches'
+    return subject, '\n'.join(lines), None, [email]
+
+
+def send_digests(batch_size=DEFAULT_BATCH_SIZE):
+    '''Match new money requests on every shard and email each lender a digest
+
+    Returns how many money requests were checked and how many digests sent.
+    '''
+    index = load_index()
+    users = sharding.users_database()
+    watermarks, checked, matches = [], 0, defaultdict(dict)
+    for alias in sharding.get_shards():
+        watermark, _ = JobWatermark.objects.using(users).get_or_create(job=DIGEST_JOB, alias=alias)
+        shard_checked, shard_matches = match_shard(alias, index, watermark, batch_size)
+        checked += shard_checked
+        for owner, moneyrequests in shard_matches.items():
+            matches[owner].update(moneyrequests)
+        watermarks.append(watermark)
+
+    emails = dict(get_user_model().objects.using(users).filter(id__in=matches).values_list('id', 'email'))
+    messages = [
+        digest(emails[owner], [moneyrequests[pk] for pk in sorted(moneyrequests)])
+        for owner, moneyrequests in matches.items() if owner in emails
+    ]
+    if messages:
+        send_mass_mail(messages)
+    for watermark in watermarks:
+        watermark.save(update_fields=['value', 'updated_at'])
+    return checked, len(messages)
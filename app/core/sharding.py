@@ -0,0 +1,424 @@
+'''
+Horizontal sharding of the rows a user owns
+
+Accounts, money requests (live or archived), contracts, payments and
+interest accruals are stored on the database of their owner, one of settings.SHARDS. Users,
+tokens, the shard map (UserShard) and job watermarks stay on the users
+database, 'default'. A new user is placed
+by user id modulo the number of shards and the placement is recorded, so
+adding shards later does not move anyone; move_user moves a user on.
+
+- ShardRouter sends a sharded row to the shard of its owner, on save()
+  and on objects.create(). Other querysets go to the shard activated for
+  the current request by ShardRoutingMixin, else to 'default'; use
+  using() or use_shard() outside requests.
+- Each shard keeps a copy of the users its rows point at, so foreign keys
+  still hold. Copies have no usable password and follow updates and
+  deletes of the user.
+- With several shards, primary keys come from IdBlock on the users
+  database so that they are unique across shards and survive moves.
+  bulk_create does not go through this, pass ids from allocate_ids.
+- for_each_shard and merge_sorted gather results from every shard, in
+  parallel threads unless a transaction is open.
+- The rollups stay on 'default', so a write to another shard and its
+  rollup change commit separately.
+- Each process keeps the shard map for SHARD_MAP_TTL seconds, but writes
+  look the shard up on the users database, and are refused with
+  UserMoving while move_user copies the user's rows. A save locks the
+  owner's row on its shard, move_user takes the same lock on the source
+  before copying, so a save that checked the map before the move either
+  commits before the copy or is refused. Reads in other
+  processes may go to the old shard until their map expires, which is
+  why move_user waits before deleting the old rows; set SHARD_MAP_TTL to
+  0, or restart the workers, while rebalancing if that is too long.
+
+With a single shard, the default, none of this costs a query.
+'''
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from core.models import (
+    Account,
+    ArchivedMoneyRequest,
+    Contract,
+    IdBlock,
+    InterestAccrual,
+    MoneyRequest,
+    Payment,
+    UserShard,
+)
+from core.usercache import LRUCache
+
+# Constants
+DEFAULT_MAP_TTL = 60
+MAP_SIZE = 100_000
+DEFAULT_ID_BLOCK_SIZE = 100
+# Sharded models in the order rows are copied, with the field naming
+# their owner and the other user foreign keys they hold
+SHARDED_MODELS = {
+    Account: ('user_id', ()),
+    MoneyRequest: ('borrower_id', ('lender_id',)),
+    ArchivedMoneyRequest: ('borrower_id', ('lender_id',)),
+    Contract: ('borrower_id', ('lender_id',)),
+    Payment: ('borrower_id', ()),
+    InterestAccrual: ('borrower_id', ()),
+}
+# Placeholder password of user copies, no hash matches it
+UNUSABLE_PASSWORD = '!'
+
+_current_shard = ContextVar('current_shard', default=None)
+_moving = ContextVar('moving_shard', default=False)
+_map = LRUCache()
+_replicated = set()
+_ids = {}
+_ids_lock = threading.Lock()
+
+
+class UserMoving(APIException):
+    '''The rows of the user are being moved to another shard'''
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Your data is being moved, retry in a moment.')
+    default_code = 'user_moving'
+
+
+def get_shards():
+    '''Return the aliases of the shard databases'''
+    return getattr(settings, 'SHARDS', ['default'])
+
+
+def users_database():
+    '''Return the alias of the database holding users and the shard map'''
+    return router.db_for_write(get_user_model())
+
+
+def is_sharded(model):
+    '''Return whether rows of model are spread over the shards'''
+    return model in SHARDED_MODELS
+
+
+def owner_id(instance):
+    '''Return the id of the user owning a sharded row'''
+    return getattr(instance, SHARDED_MODELS[type(instance)][0])
+
+
+def place(user_id):
+    '''Return the shard a new user goes to'''
+    shards = get_shards()
+    return shards[user_id % len(shards)]
+
+
+def shard_for_user(user_id):
+    '''Return the shard holding the rows of a user'''
+    shards = get_shards()
+    if len(shards) == 1:
+        return shards[0]
+    alias = _map.get(user_id)
+    if alias is None:
+        alias = UserShard.objects.using(users_database()).filter(
+            user_id=user_id,
+        ).values_list('alias', flat=True).first() or place(user_id)
+        _map.set(
+            user_id,
+            alias,
+            getattr(settings, 'SHARD_MAP_TTL', DEFAULT_MAP_TTL),
+            MAP_SIZE,
+        )
+    return alias
+
+
+def placement(user_id):
+    '''Return the shard of a user and whether it is moving, read from the users database'''
+    row = UserShard.objects.using(users_database()).filter(
+        user_id=user_id,
+    ).values_list('alias', 'moving').first()
+    return row or (place(user_id), False)
+
+
+def shard_for_write(user_id):
+    '''Return the shard the rows of a user are written to, raising UserMoving during a move
+
+    Unlike shard_for_user this always asks the users database, so a
+    write never lands on a shard the user has left.
+    '''
+    shards = get_shards()
+    if len(shards) == 1:
+        return shards[0]
+    alias, moving = placement(user_id)
+    if moving:
+        raise UserMoving()
+    _map.set(user_id, alias, getattr(settings, 'SHARD_MAP_TTL', DEFAULT_MAP_TTL), MAP_SIZE)
+    return alias
+
+
+def lock_user(alias, user_id):
+    '''Lock the row, or the copy, of a user on alias until the transaction ends'''
+    list(get_user_model()._base_manager.using(alias).select_for_update().filter(
+        pk=user_id,
+    ).values_list('pk', flat=True))
+
+
+def fence_write(alias, user_id):
+    '''Check inside the transaction of a write that the user's rows still go to alias
+
+    Raises UserMoving during a move, or once the user has left alias. The
+    user stays locked on alias until the write commits.
+    '''
+    lock_user(alias, user_id)
+    current, moving = placement(user_id)
+    if moving or current != alias:
+        raise UserMoving()
+
+
+def assign(user_id, alias, moving=False):
+    '''Record the shard of a user'''
+    UserShard.objects.using(users_database()).update_or_create(
+        user_id=user_id, defaults={'alias': alias, 'moving': moving},
+    )
+    _map.delete(user_id)
+
+
+def forget(user_id):
+    '''Drop what this process remembers about a user'''
+    _map.delete(user_id)
+    for alias in get_shards():
+        _replicated.discard((alias, user_id))
+
+
+def reset():
+    '''Forget the shard map, user copies and ids this process holds'''
+    _map.clear()
+    _replicated.clear()
+    with _ids_lock:
+        _ids.clear()
+
+
+def current_shard():
+    '''Return the shard activated for the current request, if any'''
+    return _current_shard.get()
+
+
+@contextmanager
+def use_shard(alias):
+    '''Route querysets of sharded models inside the block to alias'''
+    token = _current_shard.set(alias)
+    try:
+        yield alias
+    finally:
+        _current_shard.reset(token)
+
+
+def is_moving():
+    '''Return whether rows are being moved between shards'''
+    return _moving.get()
+
+
+class ShardRoutingMixin:
+    '''Route a view's queries to the shard of the authenticated user'''
+    def initial(self, request, *args, **kwargs):
+        '''Activate the user's shard once the request is authenticated'''
+        super().initial(request, *args, **kwargs) # type: ignore
+        if request.user.is_authenticated:
+            locate = shard_for_user if request.method in ('GET', 'HEAD', 'OPTIONS') else shard_for_write
+            self._shard_token = _current_shard.set(locate(request.user.pk))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        '''Deactivate the shard, this runs even when the view raised'''
+        token = getattr(self, '_shard_token', None)
+        if token is not None:
+            _current_shard.reset(token)
+            self._shard_token = None
+        return super().finalize_response(request, response, *args, **kwargs) # type: ignore
+
+
+def ensure_users(alias, user_ids):
+    '''Copy the users rows on alias point at, if it does not have them yet'''
+    if alias == users_database():
+        return
+    wanted = {user_id for user_id in user_ids if user_id is not None}
+    missing = {user_id for user_id in wanted if (alias, user_id) not in _replicated}
+    if not missing:
+        return
+    User = get_user_model()
+    missing -= set(User._base_manager.using(alias).filter(pk__in=missing).values_list('pk', flat=True))
+    if missing:
+        copies = list(User._base_manager.using(users_database()).filter(pk__in=missing))
+        for user in copies:
+            user.password = UNUSABLE_PASSWORD
+        User._base_manager.using(alias).bulk_create(copies, ignore_conflicts=True)
+    _replicated.update((alias, user_id) for user_id in wanted)
+
+
+def sync_user(user):
+    '''Bring the copies of a user on the other shards up to date'''
+    source = users_database()
+    User = get_user_model()
+    values = {
+        field.attname: getattr(user, field.attname)
+        for field in User._meta.concrete_fields
+        if not field.primary_key and field.name != 'password'
+        and field.attname not in user.get_deferred_fields()
+    }
+    for alias in get_shards():
+        if alias != source:
+            User._base_manager.using(alias).filter(pk=user.pk).update(**values)
+
+
+def delete_user_copies(user_id):
+    '''Delete the copies of a user, and with them the rows they own'''
+    source = users_database()
+    for alias in get_shards():
+        if alias != source:
+            get_user_model()._base_manager.using(alias).filter(pk=user_id).delete()
+    forget(user_id)
+
+
+def _start_id(model):
+    '''Return an id above every id of model on any shard'''
+    # Archived money requests keep the id they had
+    models = [model, ArchivedMoneyRequest] if model is MoneyRequest else [model]
+    highest = [
+        table._base_manager.using(alias).order_by('-pk').values_list('pk', flat=True).first() or 0
+        for table in models
+        for alias in get_shards()
+    ]
+    return max(highest) + 1
+
+
+def allocate_ids(model, count=1):
+    '''Return count primary keys for model that no shard has used'''
+    label = model._meta.label_lower
+    block_size = max(count, getattr(settings, 'SHARD_ID_BLOCK_SIZE', DEFAULT_ID_BLOCK_SIZE))
+    with _ids_lock:
+        ids = _ids.setdefault(label, iter(()))
+        taken = list(itertools.islice(ids, count))
+        if len(taken) < count:
+            blocks = IdBlock.objects.using(users_database())
+            with transaction.atomic(using=blocks.db):
+                # The UPDATE locks the row until the new end is read back
+                if not blocks.filter(model=label).update(next_id=F('next_id') + block_size):
+                    blocks.get_or_create(model=label, defaults={'next_id': _start_id(model)})
+                    blocks.filter(model=label).update(next_id=F('next_id') + block_size)
+                end = blocks.filter(model=label).values_list('next_id', flat=True).get()
+            ids = iter(range(end - block_size, end))
+            taken += list(itertools.islice(ids, count - len(taken)))
+            _ids[label] = ids
+    return taken
+
+
+def _run_closing(function, alias):
+    '''Run function(alias) in a worker thread and close its connection'''
+    try:
+        return function(alias)
+    finally:
+        connections[alias].close()
+
+
+def for_each_shard(function, shards=None):
+    '''Return [function(alias) for every shard], run in parallel when safe
+
+    Inside a transaction the shards are queried from the calling thread,
+    other threads would not see its uncommitted writes.
+    '''
+    shards = list(shards or get_shards())
+    if len(shards) == 1 or any(connections[alias].in_atomic_block for alias in shards):
+        return [function(alias) for alias in shards]
+    with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+        return list(executor.map(lambda alias: _run_closing(function, alias), shards))
+
+
+def merge_sorted(queryset, key, limit):
+    '''Return the first limit rows of queryset across all shards
+
+    queryset must be ordered consistently with key. Each shard returns
+    at most limit rows, the results are merged in key order.
+    '''
+    results = for_each_shard(lambda alias: list(queryset.using(alias)[:limit]))
+    return list(itertools.islice(heapq.merge(*results, key=key), limit))
+
+
+def _user_rows(model, alias, user_id):
+    '''Return the rows of model a user owns on alias'''
+    return model._base_manager.using(alias).filter(**{SHARDED_MODELS[model][0]: user_id})
+
+
+def _delete_rows(alias, user_id):
+    '''Delete the rows a user owns on alias, leaving the rollups alone'''
+    with transaction.atomic(using=alias):
+        for model in reversed(SHARDED_MODELS):
+            _user_rows(model, alias, user_id).delete()
+
+
+def _copy_rows(user_id, source, target):
+    '''Copy the rows of a user from source to target and return how many per model'''
+    referenced = {user_id}
+    for model, (owner, others) in SHARDED_MODELS.items():
+        for name in others:
+            referenced.update(_user_rows(model, source, user_id).values_list(name, flat=True))
+    ensure_users(target, referenced)
+
+    moved = {}
+    with transaction.atomic(using=target):
+        # Rows an earlier, failed move left behind
+        for model in reversed(SHARDED_MODELS):
+            _user_rows(model, target, user_id).delete()
+        for model in SHARDED_MODELS:
+            rows = list(_user_rows(model, source, user_id))
+            model._base_manager.using(target).bulk_create(rows)
+            moved[model._meta.object_name] = len(rows)
+    return moved
+
+
+def purge_user(user_id):
+    '''Delete the rows of a user from every shard but the one the map points at'''
+    keep = placement(user_id)[0]
+    token = _moving.set(True)
+    try:
+        for alias in get_shards():
+            if alias != keep:
+                _delete_rows(alias, user_id)
+    finally:
+        _moving.reset(token)
+
+
+def move_user(user_id, target, grace=0):
+    '''Move the rows of a user to another shard and return how many per model
+
+    The rows are copied and committed on target while writes for the
+    user are refused, then the map switches to target, then after grace
+    seconds the rows left on the old shard are deleted. A failed copy
+    leaves the user where it was; running the move again after any
+    failure finishes it.
+    '''
+    source = placement(user_id)[0]
+    moved = {}
+    if source != target:
+        assign(user_id, source, moving=True)
+        token = _moving.set(True)
+        try:
+            with transaction.atomic(using=source):
+                # Waits for the saves that checked the map before the flag was set
+                lock_user(source, user_id)
+                moved = _copy_rows(user_id, source, target)
+                assign(user_id, target)
+        except BaseException:
+            UserShard.objects.using(users_database()).filter(user_id=user_id).update(moving=False)
+            raise
+        finally:
+            _moving.reset(token)
+        # Other processes may still read the old shard from their map
+        time.sleep(grace)
+    purge_user(user_id)
+    return moved
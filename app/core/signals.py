@@ -0,0 +1,127 @@
+'''
+Signal handlers keeping derived data in step with model writes
+'''
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from core import rollups, sharding, usercache
+from core.models import (
+    Account,
+    ArchivedMoneyRequest,
+    Contract,
+    InterestAccrual,
+    MoneyRequest,
+    Payment,
+    User,
+)
+
+ROLLUP_APPLIERS = {
+    Account: rollups.apply_account,
+    MoneyRequest: rollups.apply_moneyrequest,
+}
+
+
+def _stored_state(instance):
+    '''Return the tracked values currently stored for instance'''
+    if instance._state.adding:
+        return None
+    state = instance.get_loaded_state()
+    if state is None:
+        # Loaded with deferred fields, read what the row holds now
+        state = type(instance).objects.using(instance._state.db).filter(
+            pk=instance.pk,
+        ).values(*instance.tracked_fields).first()
+    return state
+
+
+@receiver(pre_save, sender=Account)
+@receiver(pre_save, sender=MoneyRequest)
+def capture_old_state(sender, instance, raw=False, **kwargs):
+    '''Remember the stored values before they are overwritten'''
+    if raw:
+        return
+    instance._rollup_old_state = _stored_state(instance)
+
+
+@receiver(post_save, sender=Account)
+@receiver(post_save, sender=MoneyRequest)
+def update_rollups_on_save(sender, instance, raw=False, **kwargs):
+    '''Apply a created or updated row to the rollups'''
+    if raw:
+        return
+    new = instance.get_tracked_state()
+    ROLLUP_APPLIERS[sender](getattr(instance, '_rollup_old_state', None), new)
+
+
+@receiver(pre_delete, sender=Account)
+@receiver(pre_delete, sender=MoneyRequest)
+def capture_deleted_state(sender, instance, **kwargs):
+    '''Remember the values of a row about to be deleted'''
+    if sharding.is_moving():
+        return
+    instance._rollup_old_state = _stored_state(instance)
+
+
+@receiver(post_delete, sender=Account)
+@receiver(post_delete, sender=MoneyRequest)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    '''Remove a deleted row from the rollups, unless it moved to another shard'''
+    if sharding.is_moving():
+        return
+    ROLLUP_APPLIERS[sender](getattr(instance, '_rollup_old_state', None), None)
+
+
+@receiver(pre_save, sender=Account)
+@receiver(pre_save, sender=MoneyRequest)
+@receiver(pre_save, sender=ArchivedMoneyRequest)
+@receiver(pre_save, sender=Contract)
+@receiver(pre_save, sender=Payment)
+@receiver(pre_save, sender=InterestAccrual)
+def prepare_sharded_row(sender, instance, raw=False, using=None, **kwargs):
+    '''Give a new row an id unique across shards, copy the users it needs and fence the owner'''
+    if raw or len(sharding.get_shards()) == 1:
+        return
+    if instance.pk is None:
+        instance.pk = sharding.allocate_ids(sender)[0]
+    owner, others = sharding.SHARDED_MODELS[sender]
+    sharding.ensure_users(using, [getattr(instance, name) for name in (owner, *others)])
+    # ShardedRowMixin runs the save in a transaction, the lock lasts until it commits
+    sharding.fence_write(using, getattr(instance, owner))
+
+
+@receiver(post_save, sender=User)
+def place_user(sender, instance, created, raw=False, using=None, **kwargs):
+    '''Record the shard of a new user, or update its copies on the shards'''
+    if raw or len(sharding.get_shards()) == 1 or using != sharding.users_database():
+        return
+    if created:
+        sharding.assign(instance.pk, sharding.place(instance.pk))
+    else:
+        sharding.sync_user(instance)
+
+
+@receiver(post_delete, sender=User)
+def delete_user_copies(sender, instance, using=None, **kwargs):
+    '''Delete the copies of a deleted user, and the rows it owned, on the shards'''
+    if len(sharding.get_shards()) == 1 or using != sharding.users_database():
+        return
+    sharding.delete_user_copies(instance.pk)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    '''Drop a changed or deleted user from the user cache'''
+    user_id = instance.pk
+    usercache.invalidate_user(user_id)
+    transaction.on_commit(lambda: usercache.invalidate_user(user_id))
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    '''Stop a deleted API token from authenticating'''
+    key = instance.key
+    usercache.invalidate_token(key)
+    transaction.on_commit(lambda: usercache.invalidate_token(key))
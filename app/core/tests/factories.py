@@ -0,0 +1,60 @@
+'''
+Factories for creating test data in bulk
+
+Each factory issues a single INSERT for the whole batch, and users share one
+password hash computed up front instead of hashing per user. Accounts and
+money requests come from core.benchdata, which the bench commands use.
+'''
+from functools import lru_cache
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from core import models
+from core.benchdata import create_accounts, create_moneyrequests  # noqa: F401
+
+# Constants
+DEFAULT_PASSWORD = 'testing*123'
+
+
+@lru_cache(maxsize=None)
+def password_hash(password):
+    '''Return the hash of password, computed once per password'''
+    return make_password(password)
+
+
+def create_users(count, password=DEFAULT_PASSWORD, prefix='user', **params):
+    '''Create count users and return them'''
+    hashed = password_hash(password)
+    return get_user_model().objects.bulk_create([
+        get_user_model()(
+            email=f'{prefix}{i}@testing.com',
+            password=hashed,
+            **params,
+        )
+        for i in range(count)
+    ])
+
+
+def create_contracts(moneyrequests, lender, **params):
+    '''Create one contract per money request and return them'''
+    defaults = {
+        'frequency': 'WEEKLY',
+        'term': 7,
+        'due_date': timezone.localdate(),
+    }
+    defaults.update(params)
+
+    return models.Contract.objects.bulk_create([
+        models.Contract(
+            moneyrequest=moneyrequest,
+            borrower_id=moneyrequest.borrower_id,
+            lender=lender,
+            amount=moneyrequest.amount,
+            installment=moneyrequest.amount,
+            remaining_balance=moneyrequest.amount,
+            **defaults,
+        )
+        for moneyrequest in moneyrequests
+    ])
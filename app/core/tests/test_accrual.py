@@ -0,0 +1,118 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from core import accrual
+from core.models import Contract, InterestAccrual, JobWatermark
+from core.money import Money
+from core.tests import factories
+
+BUSINESS_DATE = date(2026, 3, 1)
+
+
+class AccrualTests(TestCase):
+    '''Test the daily interest accrual batch'''
+    def setUp(self):
+        '''Set up the test environment'''
+        self.lender = factories.create_users(1, prefix='lender')[0]
+        self.borrowers = factories.create_users(2, prefix='borrower')
+        moneyrequests = factories.create_moneyrequests(
+            self.borrowers, 3, lender=self.lender, status='FUNDED', amount=Decimal('1000.00'),
+        )
+        # 10% a year on 1000.00 is 27.3973 cents a day
+        self.contracts = factories.create_contracts(
+            moneyrequests, self.lender, rate=1000, start_date=date(2026, 1, 1),
+        )
+
+    def test_daily_interest(self):
+        '''Test the interest of a day is rounded to the cent, half away from zero'''
+        self.assertEqual(
+            list(accrual.daily_interest([100_000, 182_500, 100], [1000, 1000, 1000])),
+            [27, 50, 0],
+        )
+        # 1825.00 at 0.1% a year is exactly half a cent a day
+        self.assertEqual(list(accrual.daily_interest([182_500, 182_499], [10, 10])), [1, 0])
+
+    def test_accrue(self):
+        '''Test each active contract accrues one row recording what it was computed from'''
+        processed = accrual.accrue(BUSINESS_DATE)
+
+        self.assertEqual(processed, 3)
+        accruals = InterestAccrual.objects.order_by('contract_id')
+        self.assertEqual([row.contract_id for row in accruals], [c.id for c in self.contracts])
+        row = accruals[0]
+        self.assertEqual(row.amount, Money('0.27'))
+        self.assertEqual(row.balance, Money('1000.00'))
+        self.assertEqual(row.rate, 1000)
+        self.assertEqual(row.borrower_id, self.contracts[0].borrower_id)
+        self.assertEqual(row.business_date, BUSINESS_DATE)
+
+    def test_skips_contracts_not_accruing(self):
+        '''Test closed, not yet started, zero rate and paid off contracts accrue nothing'''
+        first, second, third = self.contracts
+        Contract.objects.filter(id=first.id).update(status='CLOSED')
+        Contract.objects.filter(id=second.id).update(start_date=date(2026, 3, 2))
+        Contract.objects.filter(id=third.id).update(rate=0)
+        moneyrequests = factories.create_moneyrequests(self.borrowers, 1, lender=self.lender)
+        paid_off = factories.create_contracts(moneyrequests, self.lender, rate=1000)[0]
+        Contract.objects.filter(id=paid_off.id).update(remaining_balance=0)
+
+        accrual.accrue(BUSINESS_DATE)
+
+        self.assertFalse(InterestAccrual.objects.exists())
+
+    def test_rerun_is_idempotent(self):
+        '''Test accruing a date twice, even without watermarks, writes each row once'''
+        accrual.accrue(BUSINESS_DATE)
+        self.assertEqual(accrual.accrue(BUSINESS_DATE), 0)
+        JobWatermark.objects.all().delete()
+
+        self.assertEqual(accrual.accrue(BUSINESS_DATE, chunk_size=2), 3)
+        self.assertEqual(InterestAccrual.objects.count(), 3)
+
+        accrual.accrue(date(2026, 3, 2))
+        self.assertEqual(InterestAccrual.objects.count(), 6)
+
+    def test_resume_after_failure(self):
+        '''Test a run that failed part way carries on after the last chunk written'''
+        post = accrual.post
+        calls = []
+
+        def fail_second_chunk(*args):
+            calls.append(args[2])
+            if len(calls) == 2:
+                raise RuntimeError('connection lost')
+            return post(*args)
+
+        with patch('core.accrual.post', side_effect=fail_second_chunk):
+            with self.assertRaises(RuntimeError):
+                accrual.accrue(BUSINESS_DATE, chunk_size=2)
+        self.assertEqual(InterestAccrual.objects.count(), 2)
+
+        self.assertEqual(accrual.accrue(BUSINESS_DATE, chunk_size=2), 1)
+        self.assertEqual(InterestAccrual.objects.count(), 3)
+
+    def test_partitions(self):
+        '''Test the id ranges cover every accruing contract once'''
+        ids = sorted(contract.id for contract in self.contracts)
+
+        bounds = accrual.partitions(BUSINESS_DATE, 2)
+
+        self.assertEqual(bounds[0][0], ids[0])
+        self.assertEqual(bounds[-1][1], ids[-1] + 1)
+        self.assertEqual(
+            sum(accrual.accrue_range(BUSINESS_DATE, *bound) for bound in bounds), 3,
+        )
+
+    def test_command(self):
+        '''Test the accrue_interest command'''
+        out = StringIO()
+
+        call_command('accrue_interest', '--date', '2026-03-01', stdout=out)
+
+        self.assertIn('Accrued 2026-03-01 on 3 contracts', out.getvalue())
+        self.assertEqual(InterestAccrual.objects.count(), 3)
@@ -1,8 +1,14 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.test import Client
 
+from core.admin import EstimatedCountPaginator
+from core.models import Account, MoneyRequest
+from core.tests import factories
+
 class AdminSiteTests(TestCase):
     '''Test the admin site'''
     def setUp(self):
@@ -39,4 +45,73 @@ class AdminSiteTests(TestCase):
         url = reverse('admin:core_user_add')
         res = self.client.get(url)
 
-        self.assertEqual(res.status_code, 200)
\ No newline at end of file
+        self.assertEqual(res.status_code, 200)
+
+class LargeTableAdminTests(TestCase):
+    '''Test the account and money request admin pages'''
+    def setUp(self):
+        '''Set up the test environment'''
+        self.client = Client()
+        self.admin_user = get_user_model().objects.create_superuser( # type: ignore
+            email='admin@testing.com',
+            password='testing*123',
+        )
+        self.client.force_login(self.admin_user)
+        self.users = factories.create_users(5)
+        factories.create_accounts(self.users)
+        factories.create_moneyrequests(self.users, 30)
+
+    def test_moneyrequests_listed(self):
+        '''Test that money requests are listed with their borrowers'''
+        url = reverse('admin:core_moneyrequest_changelist')
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertContains(res, self.users[0].email)
+
+    def test_changelist_queries_do_not_grow(self):
+        '''Test that the changelist does not query per row or count it all'''
+        url = reverse('admin:core_moneyrequest_changelist')
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+        factories.create_moneyrequests(self.users, 200)
+        with CaptureQueriesContext(connection) as large:
+            res = self.client.get(url, {'p': 2})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(large), len(small) + 1)
+        counts = [q['sql'] for q in large.captured_queries if 'COUNT(' in q['sql']]
+        self.assertTrue(all('LIMIT' in sql for sql in counts))
+
+    def test_moneyrequest_search(self):
+        '''Test the borrower email prefix search'''
+        url = reverse('admin:core_moneyrequest_changelist')
+        res = self.client.get(url, {'q': self.users[1].email})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.context['cl'].result_count, 6)
+
+    def test_change_pages(self):
+        '''Test that the account and money request edit pages work'''
+        account = Account.objects.first()
+        moneyrequest = MoneyRequest.objects.first()
+
+        res = self.client.get(reverse('admin:core_account_change', args=[account.id]))
+        self.assertEqual(res.status_code, 200)
+        res = self.client.get(reverse('admin:core_moneyrequest_change', args=[moneyrequest.id]))
+        self.assertEqual(res.status_code, 200)
+
+    def test_paginator_keeps_order(self):
+        '''Test that a page loaded by primary key keeps the ordering'''
+        queryset = MoneyRequest.objects.order_by('-id')
+        paginator = EstimatedCountPaginator(queryset, 10)
+
+        page = paginator.page(2)
+
+        self.assertEqual(paginator.count, 30)
+        self.assertEqual(
+            [obj.id for obj in page.object_list],
+            list(queryset.values_list('id', flat=True)[10:20]),
+        )
@@ -0,0 +1,98 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from core import archive, models, rollups
+
+
+def create_moneyrequest(borrower, **params):
+    '''Helper function to create a money request'''
+    defaults = {
+        'title': 'Test title',
+        'amount': Decimal('100.00'),
+        'frequency': 'WEEKLY',
+        'term': 7,
+    }
+    defaults.update(params)
+
+    return models.MoneyRequest.objects.create(borrower=borrower, **defaults)
+
+
+class ArchiveTests(TestCase):
+    '''Test archiving closed money requests'''
+    def setUp(self):
+        '''Set up the test environment'''
+        self.borrower = get_user_model().objects.create_user( # type: ignore
+            'borrower@testing.com',
+            'testing*123',
+        )
+        self.old = timezone.now() - timedelta(days=60)
+
+    def create_closed(self, closed_at, **params):
+        '''Create a money request closed at the given time'''
+        moneyrequest = create_moneyrequest(self.borrower, **params)
+        moneyrequest.close()
+        models.MoneyRequest.objects.filter(id=moneyrequest.id).update(closed_at=closed_at)
+        return moneyrequest
+
+    def test_close_leaves_rollups(self):
+        '''Test that a closed money request no longer counts in the rollups'''
+        moneyrequest = create_moneyrequest(self.borrower)
+        moneyrequest.close()
+
+        bucket = models.MoneyRequestRollup.objects.get(term=7, frequency='WEEKLY')
+        self.assertEqual(bucket.count, 0)
+        self.assertEqual(rollups.diff_rollups()['moneyrequest'], [])
+
+    def test_archive_moves_old_closed_requests(self):
+        '''Test that only requests closed before the cutoff are moved'''
+        old = [self.create_closed(self.old, title=f'Old {i}') for i in range(5)]
+        recent = self.create_closed(timezone.now())
+        open_request = create_moneyrequest(self.borrower)
+
+        archived = archive.archive_closed(batch_size=2)
+
+        self.assertEqual(archived, 5)
+        self.assertEqual(
+            set(models.MoneyRequest.objects.values_list('id', flat=True)),
+            {recent.id, open_request.id},
+        )
+        stored = models.ArchivedMoneyRequest.objects.get(id=old[3].id)
+        self.assertEqual(stored.title, 'Old 3')
+        self.assertEqual(stored.borrower, self.borrower)
+        self.assertEqual(stored.status, 'CLOSED')
+        self.assertIsNotNone(stored.archived_at)
+        self.assertEqual(rollups.diff_rollups()['moneyrequest'], [])
+
+    def test_archive_is_idempotent(self):
+        '''Test that rows already in the archive do not stop a rerun'''
+        moneyrequest = self.create_closed(self.old)
+        models.ArchivedMoneyRequest.objects.create(
+            id=moneyrequest.id,
+            borrower=self.borrower,
+            title=moneyrequest.title,
+            amount=moneyrequest.amount,
+            frequency=moneyrequest.frequency,
+            term=moneyrequest.term,
+            status='CLOSED',
+            version=moneyrequest.version,
+        )
+
+        self.assertEqual(archive.archive_closed(), 1)
+        self.assertFalse(models.MoneyRequest.objects.exists())
+        self.assertEqual(models.ArchivedMoneyRequest.objects.count(), 1)
+
+    def test_archive_command(self):
+        '''Test the archive command'''
+        self.create_closed(self.old)
+        out = StringIO()
+
+        call_command('archive_moneyrequests', days=30, stdout=out)
+
+        self.assertIn('Archived 1 money requests', out.getvalue())
+        self.assertEqual(models.ArchivedMoneyRequest.objects.count(), 1)
@@ -0,0 +1,251 @@
+import json
+import os
+import tempfile
+import threading
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import audit
+from core.models import Account, AuditEvent, MoneyRequest
+
+ME_URL = reverse('user:profile')
+MONEYREQUEST_URL = reverse('moneyrequest:moneyrequest-list')
+
+
+def account_url(account_id):
+    '''Return account detail URL'''
+    return reverse('account:account-detail', args=[account_id])
+
+
+def moneyrequest_url(moneyrequest_id):
+    '''Return money request detail URL'''
+    return reverse('moneyrequest:moneyrequest-detail', args=[moneyrequest_id])
+
+
+def create_user(**params):
+    '''Helper function to create a user'''
+    return get_user_model().objects.create_user(**params) # type: ignore
+
+
+def make_event(number):
+    '''Helper function to build an audit event'''
+    return {
+        'event_id': f'{number:032x}',
+        'actor_id': None,
+        'model': 'core.account',
+        'object_id': number,
+        'action': 'UPDATE',
+        'changes': {'income': [Decimal('1.00'), Decimal('2.00')]},
+        'created_at': timezone.now(),
+    }
+
+
+class AuditApiTests(TestCase):
+    '''Test the changes made through the API are audited'''
+    def setUp(self):
+        '''Set up the test environment'''
+        self.client = APIClient()
+        self.user = create_user(email='user@testing.com', password='testing*123', name='Before')
+        self.client.force_authenticate(self.user)
+
+    def test_account_update(self):
+        '''Test an account update records the fields it changed and who changed them'''
+        account = Account.objects.create(user=self.user, type='LENDER', income=Decimal('10.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.patch(account_url(account.id), {'income': '25.50', 'risk_appetite': 3})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        event = AuditEvent.objects.get()
+        self.assertEqual((event.model, event.object_id, event.action), ('core.account', account.id, 'UPDATE'))
+        self.assertEqual(event.actor, self.user)
+        self.assertEqual(event.changes['income'], ['10.00', '25.50'])
+        self.assertEqual(event.changes['risk_appetite'], [None, 3])
+        self.assertEqual(event.changes['version'], [1, 2])
+        self.assertNotIn('balance', event.changes)
+
+    def test_user_update_redacts_password(self):
+        '''Test a profile update records the new name and only that the password changed'''
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.patch(ME_URL, {'name': 'After', 'password': 'newpassword123'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        event = AuditEvent.objects.get()
+        self.assertEqual(event.model, 'core.user')
+        self.assertEqual(event.changes['name'], ['Before', 'After'])
+        self.assertEqual(event.changes['password'], [audit.REDACTED, audit.REDACTED])
+        self.assertNotIn('newpassword123', json.dumps(event.changes))
+
+    def test_moneyrequest_lifecycle(self):
+        '''Test creating, updating and deleting a money request are each audited'''
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(MONEYREQUEST_URL, {
+                'title': 'Title', 'amount': '100.00', 'frequency': 'WEEKLY', 'term': 4,
+            })
+            moneyrequest_id = res.data['id'] # type: ignore
+            self.client.patch(moneyrequest_url(moneyrequest_id), {'amount': '150.00'})
+            self.client.delete(moneyrequest_url(moneyrequest_id))
+
+        created, updated, deleted = AuditEvent.objects.order_by('id')
+        self.assertEqual(
+            [created.action, updated.action, deleted.action], ['CREATE', 'UPDATE', 'DELETE'],
+        )
+        self.assertEqual({created.object_id, updated.object_id, deleted.object_id}, {moneyrequest_id})
+        # Amounts are recorded in cents
+        self.assertEqual(created.changes['amount'], [None, 10000])
+        self.assertEqual(updated.changes['amount'], [10000, 15000])
+        self.assertEqual(deleted.changes['title'], ['Title', None])
+        self.assertFalse(MoneyRequest.objects.exists())
+
+    def test_rejected_update_not_audited(self):
+        '''Test an update refused with 412 leaves no audit event'''
+        account = Account.objects.create(user=self.user, type='LENDER')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.patch(account_url(account.id), {'risk_appetite': 2}, HTTP_IF_MATCH='"99"')
+
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertFalse(AuditEvent.objects.exists())
+
+    def test_rolled_back_change_not_audited(self):
+        '''Test events are handed over only when the transaction commits'''
+        account = Account.objects.create(user=self.user, type='LENDER')
+        with self.captureOnCommitCallbacks(execute=True), \
+                self.assertRaises(RuntimeError), transaction.atomic():
+            before = audit.snapshot(account)
+            account.risk_appetite = 4
+            account.save()
+            audit.record_update(self.user, account, before)
+            raise RuntimeError
+
+        self.assertFalse(AuditEvent.objects.exists())
+
+    @override_settings(AUDIT_MODE='off')
+    def test_off(self):
+        '''Test nothing is recorded when auditing is off'''
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(ME_URL, {'name': 'After'})
+
+        self.assertFalse(AuditEvent.objects.exists())
+
+    def test_background_mode_queues(self):
+        '''Test the request only queues the event in background mode'''
+        writer = audit.AuditWriter(write=lambda events: None)
+        with override_settings(AUDIT_MODE='background'), \
+                patch('core.audit.get_writer', return_value=writer), \
+                patch.object(writer, 'start'), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(ME_URL, {'name': 'After'})
+
+        self.assertFalse(AuditEvent.objects.exists())
+        self.assertEqual(writer.queue.get_nowait()['changes'], {'name': ['Before', 'After']})
+
+
+class AuditWriterTests(SimpleTestCase):
+    '''Test the queue and background thread writing audit events'''
+    def setUp(self):
+        '''Set up the test environment'''
+        self.batches = []
+        self.written = threading.Event()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.fallback_path = os.path.join(directory.name, 'audit.jsonl')
+
+    def write(self, events):
+        '''Collect the batches written'''
+        self.batches.append(events)
+        self.written.set()
+
+    def spilled(self):
+        '''Return the events in the fallback file'''
+        with open(self.fallback_path, encoding='utf-8') as file:
+            return [json.loads(line) for line in file]
+
+    def test_thread_writes_batches(self):
+        '''Test queued events are written together by the writer thread'''
+        writer = audit.AuditWriter(self.write, batch_size=3, interval=60, fallback_path=self.fallback_path)
+        self.addCleanup(writer.stop)
+
+        for number in range(3):
+            writer.put(make_event(number))
+
+        # A full batch wakes the thread before the interval
+        self.assertTrue(self.written.wait(5))
+        self.assertEqual([len(batch) for batch in self.batches], [3])
+
+    def test_stop_flushes(self):
+        '''Test stopping the writer, as at process exit, writes what is still queued'''
+        writer = audit.AuditWriter(self.write, interval=60, fallback_path=self.fallback_path)
+        writer.put(make_event(1))
+
+        writer.stop()
+
+        self.assertEqual([[event['object_id'] for event in batch] for batch in self.batches], [[1]])
+
+    def test_full_queue_spills(self):
+        '''Test an event that does not fit in the queue goes to the fallback file'''
+        writer = audit.AuditWriter(self.write, size=1, interval=60, fallback_path=self.fallback_path)
+        with patch.object(writer, 'start'):
+            writer.put(make_event(1))
+            writer.put(make_event(2))
+
+        self.assertEqual([event['object_id'] for event in self.spilled()], [2])
+        self.assertEqual(writer.spilled, 1)
+
+    def test_failed_write_spills(self):
+        '''Test a batch the database rejects goes to the fallback file'''
+        def fail(events):
+            raise RuntimeError('database unavailable')
+
+        writer = audit.AuditWriter(fail, interval=60, fallback_path=self.fallback_path)
+        with patch.object(writer, 'start'):
+            writer.put(make_event(1))
+        with self.assertLogs('core.audit', 'ERROR'):
+            self.assertEqual(writer.flush(), 1)
+
+        self.assertEqual(self.spilled()[0]['changes'], {'income': ['1.00', '2.00']})
+
+
+class ReplayTests(TestCase):
+    '''Test loading the fallback file'''
+    def setUp(self):
+        '''Set up the test environment'''
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.fallback_path = os.path.join(directory.name, 'audit.jsonl')
+        self.writer = audit.AuditWriter(audit.write_events, fallback_path=self.fallback_path)
+
+    def test_replay(self):
+        '''Test replaying stores the spilled events once and removes the file'''
+        self.writer.spill([make_event(1), make_event(2)])
+        audit.write_events([make_event(1)])
+        out = StringIO()
+
+        call_command('replay_audit', '--path', self.fallback_path, stdout=out)
+
+        self.assertIn('Replayed 2 audit events', out.getvalue())
+        self.assertEqual(AuditEvent.objects.count(), 2)
+        self.assertEqual(AuditEvent.objects.get(object_id=2).changes['income'], ['1.00', '2.00'])
+        self.assertFalse(os.path.exists(self.fallback_path))
+        self.assertEqual(audit.replay(self.fallback_path), 0)
+
+    def test_replay_resumes_interrupted_run(self):
+        '''Test a file left by a replay that failed is loaded along with the new one'''
+        self.writer.spill([make_event(1)])
+        with patch('core.audit.write_events', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            audit.replay(self.fallback_path)
+        self.writer.spill([make_event(2)])
+
+        self.assertEqual(audit.replay(self.fallback_path), 2)
+        self.assertEqual(AuditEvent.objects.count(), 2)
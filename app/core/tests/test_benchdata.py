@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from core import benchdata
+from core.models import Account, MoneyRequest
+
+
+class BenchDataTests(TestCase):
+    '''Test the data helpers of the bench commands'''
+    def test_refuses_without_debug_or_database(self):
+        '''Test bench data is only written with DEBUG on or a named database'''
+        with self.assertRaises(CommandError):
+            benchdata.check_database(None)
+        with self.assertRaises(CommandError):
+            benchdata.check_database('elsewhere')
+
+        self.assertEqual(benchdata.check_database('default'), 'default')
+        with override_settings(DEBUG=True):
+            self.assertEqual(benchdata.check_database(None), 'default')
+
+    def test_users_cannot_log_in(self):
+        '''Test bench users get an unusable password'''
+        user = benchdata.create_users(1, prefix='bench-')[0]
+
+        self.assertTrue(user.email.endswith(f'@{benchdata.BENCH_DOMAIN}'))
+        self.assertFalse(get_user_model().objects.get(id=user.id).has_usable_password())
+
+    def test_delete_users(self):
+        '''Test deleting bench users removes their rows and leaves other users alone'''
+        kept = get_user_model().objects.create_user(email='bench-0@testing.com', password='testing*123') # type: ignore
+        users = benchdata.create_users(3, prefix='bench-')
+        benchdata.create_accounts(users)
+        benchdata.create_moneyrequests(users, 5)
+
+        self.assertEqual(benchdata.delete_users('bench-', batch_size=2), 3)
+        self.assertEqual(list(get_user_model().objects.all()), [kept])
+        self.assertFalse(Account.objects.exists())
+        self.assertFalse(MoneyRequest.objects.exists())
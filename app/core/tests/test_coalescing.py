@@ -0,0 +1,222 @@
+import tempfile
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+
+from core import coalescing
+from core.tests import factories
+
+DASHBOARD_URL = reverse('moneyrequest:lender-dashboard')
+SCHEMA_URL = reverse('schema')
+CONCURRENT_CALLS = 8
+
+
+def create_user(**params):
+    '''Helper function to create a user'''
+    return get_user_model().objects.create_user(**params) # type: ignore
+
+
+def wait_for(condition, timeout=5):
+    '''Wait until condition() holds, fail after timeout seconds'''
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('Timed out waiting')
+        time.sleep(0.001)
+
+
+def run_concurrently(count, target):
+    '''Start count threads calling target(i), return them and the list their results fill'''
+    results = [None] * count
+
+    def run(i):
+        results[i] = target(i)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+class ReportView(APIView):
+    '''Slow view counting its computations'''
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    computations = 0
+    release = threading.Event()
+
+    @coalescing.coalesce(per_user=False)
+    def get(self, request):
+        '''Return the report once released'''
+        type(self).computations += 1
+        self.release.wait(5)
+        return Response({'total': 42}, headers={'X-Report': 'yes'})
+
+
+class SingleFlightTests(SimpleTestCase):
+    '''Test concurrent callers share one computation'''
+    def setUp(self):
+        '''Set up the test environment'''
+        self.flight = coalescing.SingleFlight()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def compute(self):
+        '''Count the call and block until released'''
+        self.calls += 1
+        self.release.wait(5)
+        return {'value': self.calls}
+
+    def test_concurrent_calls_compute_once(self):
+        '''Test callers arriving while the first computes wait for its result'''
+        threads, results = run_concurrently(
+            CONCURRENT_CALLS, lambda i: self.flight.do('key', self.compute),
+        )
+
+        wait_for(lambda: self.flight.waiting() == CONCURRENT_CALLS - 1)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [{'value': 1}] * CONCURRENT_CALLS)
+        self.assertEqual(self.flight.stats(), {'computed': 1, 'shared': CONCURRENT_CALLS - 1})
+
+    def test_errors_shared_not_kept(self):
+        '''Test waiters get the error of the computation and the next call retries'''
+        def fail():
+            self.release.wait(5)
+            raise RuntimeError('unavailable')
+
+        errors = []
+
+        def call(i):
+            try:
+                self.flight.do('key', fail, ttl=60)
+            except RuntimeError as error:
+                errors.append(error)
+
+        threads, _ = run_concurrently(3, call)
+        wait_for(lambda: self.flight.waiting() == 2)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(self.flight.do('key', lambda: 'ok', ttl=60), 'ok')
+
+    def test_ttl(self):
+        '''Test results are kept for ttl seconds, and not at all without one'''
+        self.release.set()
+
+        self.flight.do('kept', self.compute, ttl=60)
+        self.flight.do('kept', self.compute, ttl=60)
+        self.flight.do('not kept', self.compute)
+        self.flight.do('not kept', self.compute)
+
+        self.assertEqual(self.calls, 3)
+        self.assertEqual(self.flight.stats()['cache_hits'], 1)
+
+    def test_uncacheable_result(self):
+        '''Test a result cacheable refuses is computed again'''
+        self.release.set()
+
+        for _ in range(2):
+            self.flight.do('key', self.compute, ttl=60, cacheable=lambda result: False)
+
+        self.assertEqual(self.calls, 2)
+
+
+class CoalescedViewTests(SimpleTestCase):
+    '''Test identical concurrent requests to a decorated view'''
+    def setUp(self):
+        '''Set up the test environment'''
+        coalescing.reset()
+        self.addCleanup(coalescing.reset)
+        ReportView.computations = 0
+        ReportView.release.clear()
+        self.factory = APIRequestFactory()
+
+    def test_concurrent_requests_compute_once(self):
+        '''Test N concurrent requests produce one computation and N full responses'''
+        view = ReportView.as_view()
+
+        def request(i):
+            response = view(self.factory.get('/report/', {'year': 2026}))
+            return response.render()
+
+        threads, responses = run_concurrently(CONCURRENT_CALLS, request)
+        wait_for(lambda: coalescing.waiting() == CONCURRENT_CALLS - 1)
+        ReportView.release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(ReportView.computations, 1)
+        self.assertEqual(len({id(response) for response in responses}), CONCURRENT_CALLS)
+        for response in responses:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data, {'total': 42})
+            self.assertEqual(response['X-Report'], 'yes')
+            self.assertEqual(response.content, b'{"total":42}')
+            self.assertTrue(response['Content-Type'].startswith('application/json'))
+
+    def test_different_requests_not_shared(self):
+        '''Test requests with another query string compute their own response'''
+        ReportView.release.set()
+        view = ReportView.as_view()
+
+        view(self.factory.get('/report/', {'year': 2025}))
+        view(self.factory.get('/report/', {'year': 2026}))
+
+        self.assertEqual(ReportView.computations, 2)
+
+
+@override_settings(COALESCE_CACHE_TTL=60)
+class CoalescedEndpointTests(TestCase):
+    '''Test the views coalescing their requests'''
+    def setUp(self):
+        '''Set up the test environment'''
+        coalescing.reset()
+        self.addCleanup(coalescing.reset)
+        self.client = APIClient()
+        self.lender = create_user(email='lender@testing.com', password='testing*123')
+        self.client.force_authenticate(self.lender)
+
+    def test_dashboard_cached_per_user(self):
+        '''Test a repeated dashboard request is served without queries, for its user only'''
+        borrower = factories.create_users(1, prefix='borrower')[0]
+        factories.create_moneyrequests([borrower], 2, lender=self.lender, status='FUNDED')
+
+        first = self.client.get(DASHBOARD_URL)
+        with self.assertNumQueries(0):
+            second = self.client.get(DASHBOARD_URL)
+        other = APIClient()
+        other.force_authenticate(borrower)
+        res = other.get(DASHBOARD_URL)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data) # type: ignore
+        self.assertEqual(first.data['totals']['count'], 2) # type: ignore
+        self.assertEqual(res.data['totals']['count'], 0) # type: ignore
+
+    def test_schema_fallback_generated_once(self):
+        '''Test the schema is generated once per format when no artifact was built'''
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        with self.settings(SCHEMA_ARTIFACT_DIR=tmpdir.name):
+            first = self.client.get(SCHEMA_URL)
+            second = self.client.get(SCHEMA_URL)
+            json = self.client.get(SCHEMA_URL, {'format': 'json'})
+
+        self.assertEqual(second.content, first.content)
+        self.assertTrue(json.content.startswith(b'{'))
+        self.assertEqual(coalescing.stats(), {'computed': 2, 'cache_hits': 1})
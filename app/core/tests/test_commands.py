@@ -1,29 +1,147 @@
+import threading
+import time
 from unittest.mock import patch
 
 from psycopg import OperationalError as PsycopgOperationalError
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connections
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
 
+from core import health
+from core.management.commands.wait_for_db import MAX_DELAY, backoff
 
-@patch('core.management.commands.wait_for_db.Command.check')
+
+@patch('core.health.check_database')
 class CommandTests(SimpleTestCase):
     '''Test the command line functions'''
     def test_wait_for_db_ready(self, patched_check):
         '''Test waiting for db when db is available'''
-        patched_check.return_value = True
+        patched_check.return_value = None
 
-        call_command('wait_for_db')
+        call_command('wait_for_db', database=['default'])
 
-        patched_check.assert_called_once_with(databases=['default'])
+        patched_check.assert_called_once_with('default')
 
     @patch('time.sleep')
     def test_wait_for_db_not_ready(self, patched_sleep, patched_check):
         '''Test waiting for db when db is not available'''
-        patched_check.side_effect = [OperationalError, PsycopgOperationalError, True]
+        patched_check.side_effect = [OperationalError, PsycopgOperationalError, None]
 
-        call_command('wait_for_db')
+        call_command('wait_for_db', database=['default'])
 
         self.assertEqual(patched_check.call_count, 3)
-        patched_check.assert_called_with(databases=['default'])
\ No newline at end of file
+        patched_check.assert_called_with('default')
+        self.assertEqual(patched_sleep.call_count, 2)
+
+    @patch('core.health.connections')
+    @patch('time.sleep')
+    def test_wait_for_db_probes_only_pending(
+        self, patched_sleep, patched_connections, patched_check,
+    ):
+        '''Test that databases already up are not probed again'''
+        down_once = [OperationalError]
+
+        def check(alias):
+            if alias == 'replica' and down_once:
+                raise down_once.pop()
+
+        patched_check.side_effect = check
+
+        call_command('wait_for_db', database=['default', 'replica'])
+
+        probed = [call.args[0] for call in patched_check.call_args_list]
+        self.assertEqual(sorted(probed), ['default', 'replica', 'replica'])
+
+    @patch('time.sleep')
+    @patch('time.monotonic')
+    def test_wait_for_db_timeout(self, patched_monotonic, patched_sleep, patched_check):
+        '''Test that the command gives up after the timeout'''
+        patched_check.side_effect = OperationalError
+        patched_monotonic.side_effect = [0, 0, 1, 1, 2]
+
+        with self.assertRaises(CommandError):
+            call_command('wait_for_db', database=['default'], timeout=2)
+
+        self.assertEqual(patched_check.call_count, 2)
+        for call in patched_sleep.call_args_list:
+            self.assertLessEqual(call.args[0], 1)
+
+    def test_backoff_is_bounded(self, patched_check):
+        '''Test that the backoff grows from milliseconds and is capped'''
+        with patch('random.uniform', side_effect=lambda low, high: high):
+            self.assertEqual(backoff(0), 0.05)
+            self.assertEqual(backoff(3), 0.4)
+            self.assertEqual(backoff(30), MAX_DELAY)
+
+
+class HealthEndpointTests(TestCase):
+    '''Test the liveness and readiness endpoints'''
+    def test_liveness(self):
+        '''Test that liveness does not touch the database'''
+        with self.assertNumQueries(0):
+            res = self.client.get(reverse('health-live'))
+
+        self.assertEqual(res.status_code, 200)
+
+    def test_readiness(self):
+        '''Test that readiness reports every database'''
+        res = self.client.get(reverse('health-ready'))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['databases'], {alias: 'ok' for alias in connections})
+
+    @patch('core.health.check_database', side_effect=OperationalError('down'))
+    def test_readiness_unavailable(self, patched_check):
+        '''Test that readiness returns 503 when a database is down'''
+        with self.assertLogs('core.views', 'WARNING') as logs:
+            res = self.client.get(reverse('health-ready'))
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.json()['databases'], {alias: 'unavailable' for alias in connections})
+        self.assertNotIn('down', res.content.decode())
+        self.assertIn('down', logs.output[0])
+
+    def test_probe_databases_in_parallel(self):
+        '''Test that several databases are probed from worker threads'''
+        with patch('core.health.check_database') as patched_check:
+            with patch('core.health.connections'):
+                errors = health.probe_databases(['default', 'replica'], timeout=1)
+
+        self.assertEqual(errors, {'default': None, 'replica': None})
+        self.assertEqual(patched_check.call_count, 2)
+
+    def test_probe_single_database_times_out(self):
+        '''Test that one database hanging is reported once the timeout is up'''
+        release = threading.Event()
+        self.addCleanup(release.set)
+        with patch('core.health.check_database', side_effect=lambda alias: release.wait(5)):
+            with patch('core.health.connections'):
+                start = time.monotonic()
+                errors = health.probe_databases(['default'], timeout=0.1)
+                elapsed = time.monotonic() - start
+                # Let the probe finish before another test probes 'default'
+                release.set()
+                health._running['default'].result(5)
+
+        self.assertEqual(errors, {'default': 'timed out'})
+        self.assertLess(elapsed, 2)
+
+    def test_hung_database_probed_once(self):
+        '''Test that probes of a database that hangs share the one still running'''
+        release = threading.Event()
+        self.addCleanup(release.set)
+        with patch('core.health.check_database', side_effect=lambda alias: release.wait(5)) as patched_check:
+            with patch('core.health.connections'):
+                for _ in range(3):
+                    errors = health.probe_databases(['replica'], timeout=0.05)
+                calls = patched_check.call_count
+                release.set()
+                answered = health.probe_databases(['replica'], timeout=5)
+
+        self.assertEqual(errors, {'replica': 'timed out'})
+        self.assertEqual(calls, 1)
+        self.assertEqual(answered, {'replica': None})
@@ -0,0 +1,80 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core import models
+from core.money import Money
+
+
+class OptimisticConcurrencyTests(TestCase):
+    '''Test versioned saves of accounts and money requests'''
+    def setUp(self):
+        '''Set up the test environment'''
+        self.borrower = get_user_model().objects.create_user( # type: ignore
+            'borrower@testing.com',
+            'testing*123',
+        )
+        self.moneyrequest = models.MoneyRequest.objects.create(
+            borrower=self.borrower,
+            title='Test title',
+            amount=Decimal('100.00'),
+            frequency='WEEKLY',
+            term=7,
+        )
+
+    def load(self):
+        '''Load a fresh copy of the money request'''
+        return models.MoneyRequest.objects.get(id=self.moneyrequest.id)
+
+    def test_update_writes_changed_columns_only(self):
+        '''Test that save() updates only the changed columns and the version'''
+        moneyrequest = self.load()
+        moneyrequest.title = 'New title'
+
+        with CaptureQueriesContext(connection) as queries:
+            moneyrequest.save()
+
+        update = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "core_moneyrequest"')]
+        self.assertEqual(len(update), 1)
+        self.assertIn('"title"', update[0])
+        self.assertNotIn('"amount"', update[0])
+        self.assertIn('"version" = 1', update[0].split('WHERE')[1])
+        self.assertFalse(any('FOR UPDATE' in q['sql'] for q in queries))
+        self.assertEqual(moneyrequest.version, 2)
+
+    def test_unchanged_save_is_a_noop(self):
+        '''Test that saving an unchanged instance issues no UPDATE'''
+        moneyrequest = self.load()
+
+        with self.assertNumQueries(0):
+            moneyrequest.save()
+
+        self.assertEqual(moneyrequest.version, 1)
+
+    def test_concurrent_updates_do_not_lose_writes(self):
+        '''Test that the second of two interleaved writers is rejected'''
+        first = self.load()
+        second = self.load()
+
+        first.title = 'First title'
+        first.save()
+        second.amount = Decimal('200.00')
+        with self.assertRaises(models.ConcurrentUpdateError):
+            second.save()
+
+        self.assertEqual(second.version, 1)
+        stored = self.load()
+        self.assertEqual(stored.title, 'First title')
+        self.assertEqual(stored.amount, Money('100.00'))
+        self.assertEqual(stored.version, 2)
+
+        second.refresh_from_db()
+        second.amount = Decimal('200.00')
+        second.save()
+
+        stored = self.load()
+        self.assertEqual((stored.title, stored.amount), ('First title', Money('200.00')))
+        self.assertEqual(stored.version, 3)
@@ -0,0 +1,147 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from core import contracts
+from core.models import Contract, JobWatermark, Payment
+from core.money import Money
+from core.tests import factories
+
+
+class ContractClosureTests(TestCase):
+    '''Test applying payments and closing paid off contracts'''
+    def setUp(self):
+        '''Set up the test environment'''
+        self.lender = factories.create_users(1, prefix='lender')[0]
+        self.borrowers = factories.create_users(2, prefix='borrower')
+        self.moneyrequests = factories.create_moneyrequests(
+            self.borrowers, 2, lender=self.lender, status='FUNDED', amount=Decimal('100.00'),
+        )
+        self.contracts = factories.create_contracts(self.moneyrequests, self.lender)
+
+    def pay(self, contract, amount):
+        '''Return an unsaved payment of amount against contract'''
+        return Payment(contract=contract, amount=Money(amount))
+
+    def test_open_contract(self):
+        '''Test a contract starts with the full amount to pay'''
+        moneyrequest = factories.create_moneyrequests(
+            self.borrowers, 1, lender=self.lender, amount=Decimal('100.00'), term=3,
+        )[0]
+
+        contract = contracts.open_contract(moneyrequest, start=date(2026, 1, 1))
+
+        self.assertEqual(contract.remaining_balance, Money('100.00'))
+        self.assertEqual(contract.installment, Money('33.33'))
+        self.assertEqual(contract.due_date, date(2026, 1, 8))
+        self.assertEqual(contract.status, 'ACTIVE')
+
+    def test_payment_decrements_balance(self):
+        '''Test a partial payment lowers the balance and keeps the contract active'''
+        closed = contracts.apply_payments([self.pay(self.contracts[0], '40.00')])
+
+        contract = Contract.objects.get(id=self.contracts[0].id)
+        self.assertEqual(closed, [])
+        self.assertEqual(contract.remaining_balance, Money('60.00'))
+        self.assertEqual(contract.status, 'ACTIVE')
+        self.assertEqual(Payment.objects.get().borrower_id, contract.borrower_id)
+
+    def test_paid_off_contract_closed_in_batch(self):
+        '''Test a contract paid off by a batch is closed by that batch'''
+        first, second = self.contracts
+        closed = contracts.apply_payments([
+            self.pay(first, '60.00'),
+            self.pay(second, '10.00'),
+            self.pay(first, '40.00'),
+        ])
+
+        self.assertEqual(closed, [first.id])
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'CLOSED')
+        self.assertIsNotNone(first.closed_at)
+        self.assertEqual(Contract.objects.get(id=second.id).remaining_balance, Money('90.00'))
+
+    def test_overpayment_closes(self):
+        '''Test paying more than is left closes the contract'''
+        closed = contracts.apply_payments([self.pay(self.contracts[0], '150.00')])
+
+        self.assertEqual(closed, [self.contracts[0].id])
+
+    def test_closure_cost_independent_of_contracts(self):
+        '''Test that applying payments does not scan the other contracts'''
+        moneyrequests = factories.create_moneyrequests(self.borrowers, 2000, lender=self.lender)
+        factories.create_contracts(moneyrequests, self.lender)
+        payments = [self.pay(contract, '100.00') for contract in self.contracts]
+
+        # Savepoint, insert, decrement, select paid off, close, release
+        with self.assertNumQueries(6):
+            closed = contracts.apply_payments(payments)
+
+        self.assertEqual(sorted(closed), sorted(contract.id for contract in self.contracts))
+
+
+class ReconcileTests(TestCase):
+    '''Test the reconciliation backstop'''
+    def setUp(self):
+        '''Set up the test environment'''
+        self.lender = factories.create_users(1, prefix='lender')[0]
+        self.borrowers = factories.create_users(2, prefix='borrower')
+        moneyrequests = factories.create_moneyrequests(
+            self.borrowers, 3, lender=self.lender, status='FUNDED', amount=Decimal('100.00'),
+        )
+        self.contracts = factories.create_contracts(moneyrequests, self.lender)
+
+    def bypass(self, contract, amount):
+        '''Insert a payment without going through apply_payments'''
+        Payment.objects.bulk_create([
+            Payment(contract=contract, borrower_id=contract.borrower_id, amount=Money(amount)),
+        ])
+
+    def test_reconcile_closes_bypassed_payments(self):
+        '''Test reconcile recomputes balances from payments and closes paid off contracts'''
+        self.bypass(self.contracts[0], '100.00')
+        self.bypass(self.contracts[1], '25.00')
+
+        checked, closed = contracts.reconcile()
+
+        self.assertEqual((checked, closed), (2, [self.contracts[0].id]))
+        self.assertEqual(Contract.objects.get(id=self.contracts[1].id).remaining_balance, Money('75.00'))
+        self.assertEqual(Contract.objects.get(id=self.contracts[2].id).remaining_balance, Money('100.00'))
+        self.assertEqual(JobWatermark.objects.get().value, Payment.objects.latest('id').id)
+
+    def test_reconcile_starts_at_watermark(self):
+        '''Test a second run only looks at payments made since the first'''
+        self.bypass(self.contracts[0], '10.00')
+        contracts.reconcile()
+        self.bypass(self.contracts[1], '10.00')
+
+        checked, _ = contracts.reconcile()
+
+        self.assertEqual(checked, 1)
+        self.assertEqual(contracts.reconcile(), (0, []))
+        self.assertEqual(contracts.reconcile(full=True)[0], 2)
+
+    def test_reconcile_cost_independent_of_contracts(self):
+        '''Test reconcile does not scan contracts without new payments'''
+        contracts.reconcile()
+        moneyrequests = factories.create_moneyrequests(self.borrowers, 2000, lender=self.lender)
+        factories.create_contracts(moneyrequests, self.lender)
+        self.bypass(self.contracts[0], '100.00')
+
+        # Watermark, payments, savepoint, recompute, select paid off, close,
+        # release, watermark update
+        with self.assertNumQueries(8):
+            contracts.reconcile()
+
+    def test_command(self):
+        '''Test the reconcile_contracts command'''
+        self.bypass(self.contracts[0], '100.00')
+        out = StringIO()
+
+        call_command('reconcile_contracts', stdout=out)
+
+        self.assertIn('Checked 1 contracts, closed 1', out.getvalue())
+        self.assertEqual(Contract.objects.get(id=self.contracts[0].id).status, 'CLOSED')
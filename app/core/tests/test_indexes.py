@@ -0,0 +1,103 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection, IntegrityError, transaction
+from django.test import TestCase
+
+from core import models
+from core.tests.factories import create_users, create_accounts
+
+
+def explain(queryset):
+    '''Return the query plan of a queryset, refreshing planner statistics'''
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+        if connection.vendor == 'postgresql':
+            # The seeded tables are small enough for a seq scan to win
+            cursor.execute('SET LOCAL enable_seqscan = off')
+    return queryset.explain()
+
+
+class IndexTests(TestCase):
+    '''Test that the hot queries use their indexes'''
+    @classmethod
+    def setUpTestData(cls):
+        '''Seed enough rows for the planner to prefer the indexes'''
+        users = create_users(50)
+        cls.user = users[0]
+        create_accounts(users * 40)
+        models.MoneyRequest.objects.bulk_create([
+            models.MoneyRequest(
+                borrower=users[i % 50],
+                lender=users[(i + 1) % 50] if i % 4 == 0 else None,
+                title=f'Request {i}',
+                amount=Decimal(i % 1000 + 1),
+                frequency='WEEKLY',
+                term=i % 52 + 1,
+            )
+            for i in range(4000)
+        ])
+
+    def test_account_list_uses_index(self):
+        '''Test listing accounts by user uses the composite index'''
+        plan = explain(models.Account.objects.filter(user=self.user).order_by('-id'))
+
+        self.assertIn('account_user_id_desc_idx', plan)
+
+    def test_moneyrequest_list_uses_index(self):
+        '''Test listing money requests by borrower uses the composite index'''
+        plan = explain(
+            models.MoneyRequest.objects.filter(borrower=self.user).order_by('-id')
+        )
+
+        self.assertIn('moneyreq_borrower_id_desc_idx', plan)
+
+    def test_lender_dashboard_uses_index(self):
+        '''Test listing money requests by lender uses the composite index'''
+        plan = explain(
+            models.MoneyRequest.objects.filter(lender=self.user).order_by('-id')
+        )
+
+        self.assertIn('moneyreq_lender_id_desc_idx', plan)
+
+    def test_open_moneyrequest_filter_uses_partial_index(self):
+        '''Test filtering open requests by term and amount uses the partial index'''
+        plan = explain(models.MoneyRequest.objects.filter(
+            lender__isnull=True,
+            term=12,
+            amount__gte=Decimal('500'),
+        ))
+
+        self.assertIn('moneyreq_open_term_amount_idx', plan)
+
+
+class ConstraintTests(TestCase):
+    '''Test the database check constraints'''
+    def setUp(self):
+        '''Set up the test environment'''
+        self.user = get_user_model().objects.create_user( # type: ignore
+            'borrower@testing.com',
+            'testing*123',
+        )
+
+    def test_amount_must_be_positive(self):
+        '''Test that a non positive amount is rejected by the database'''
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            models.MoneyRequest.objects.create(
+                borrower=self.user,
+                title='Test title',
+                amount=Decimal('0.00'),
+                frequency='WEEKLY',
+                term=7,
+            )
+
+    def test_term_must_be_positive(self):
+        '''Test that a non positive term is rejected by the database'''
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            models.MoneyRequest.objects.create(
+                borrower=self.user,
+                title='Test title',
+                amount=Decimal('100.00'),
+                frequency='WEEKLY',
+                term=0,
+            )
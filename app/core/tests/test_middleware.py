@@ -0,0 +1,94 @@
+import gzip
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import SimpleTestCase, RequestFactory, override_settings
+
+from core.middleware import CompressionMiddleware, accepted_encodings, choose_compressor
+
+PAYLOAD = b'{"title": "Test title", "amount": "777.77"}' * 100
+
+
+def get_response(response):
+    '''Return a compression middleware wrapping a fixed response'''
+    return CompressionMiddleware(lambda request: response)
+
+
+@override_settings(COMPRESSION_MIN_SIZE=200)
+class CompressionMiddlewareTests(SimpleTestCase):
+    '''Test the response compression middleware'''
+    def setUp(self):
+        '''Set up the test environment'''
+        self.factory = RequestFactory()
+        self.request = self.factory.get('/', HTTP_ACCEPT_ENCODING='gzip')
+
+    def test_compresses_json(self):
+        '''Test that a large JSON response is gzipped'''
+        response = HttpResponse(PAYLOAD, content_type='application/json')
+
+        res = get_response(response)(self.request)
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.content), PAYLOAD)
+        self.assertEqual(res['Content-Length'], str(len(res.content)))
+        self.assertIn('Accept-Encoding', res['Vary'])
+
+    def test_small_response_not_compressed(self):
+        '''Test that responses below the threshold are sent as is'''
+        response = HttpResponse(b'{}', content_type='application/json')
+
+        res = get_response(response)(self.request)
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(res.content, b'{}')
+
+    def test_content_type_not_allowed(self):
+        '''Test that content types outside the allowlist are not compressed'''
+        response = HttpResponse(PAYLOAD, content_type='application/msgpack')
+
+        res = get_response(response)(self.request)
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+    def test_html_not_compressed(self):
+        '''Test that HTML pages, which may carry CSRF tokens, are sent as is'''
+        response = HttpResponse(PAYLOAD, content_type='text/html; charset=utf-8')
+
+        res = get_response(response)(self.request)
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+    def test_client_without_gzip(self):
+        '''Test that nothing is compressed when the client does not accept it'''
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING='identity')
+        response = HttpResponse(PAYLOAD, content_type='application/json')
+
+        res = get_response(response)(request)
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+    def test_streaming_response_compressed_per_chunk(self):
+        '''Test that streaming responses are compressed chunk by chunk'''
+        chunks = [PAYLOAD[:1000], PAYLOAD[1000:]]
+        response = StreamingHttpResponse(iter(chunks), content_type='application/json')
+
+        res = get_response(response)(self.request)
+        parts = list(res.streaming_content)
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertGreaterEqual(len(parts), 2)
+        self.assertEqual(gzip.decompress(b''.join(parts)), PAYLOAD)
+
+    def test_accepted_encodings(self):
+        '''Test parsing the Accept-Encoding header'''
+        self.assertEqual(
+            accepted_encodings('gzip;q=1.0, br;q=0, zstd'),
+            {'gzip', 'zstd'},
+        )
+
+    def test_wildcard_keeps_refused_encodings(self):
+        '''Test "*" does not bring back an encoding refused with q=0'''
+        compressor = choose_compressor('gzip;q=0, *')
+
+        self.assertNotEqual(getattr(compressor, 'encoding', None), 'gzip')
+        self.assertIsNone(choose_compressor('gzip;q=0, br;q=0, zstd;q=0, *'))
+        self.assertEqual(choose_compressor('*').encoding, choose_compressor('zstd, br, gzip').encoding)
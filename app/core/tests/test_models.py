@@ -88,4 +88,18 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(lend_account), lend_account.user.email)
 
+    def test_account_str_without_user(self):
+        '''Test an account without a user to show falls back to its id'''
+        self.assertEqual(str(models.Account()), 'Account object (None)')
+        self.assertEqual(str(models.Account(id=5, user_id=999)), 'Account object (5)')
+
+    def test_account_str_uses_loaded_user(self):
+        '''Test an account loaded with its user does not look the user up again'''
+        user = get_user_model().objects.create_user('owner@testing.com', 'testing*123') # type: ignore
+        models.Account.objects.create(user=user)
+        account = models.Account.objects.select_related('user').get()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(str(account), 'owner@testing.com')
+
 
@@ -0,0 +1,107 @@
+from decimal import Decimal
+
+import numpy as np
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase, TestCase
+
+from rest_framework import serializers
+
+from core import money
+from core.fields import MoneyField, MoneySerializerField
+from core.models import MoneyRequest
+from core.money import Money
+
+
+def create_user(**params):
+    '''Helper function to create a user'''
+    return get_user_model().objects.create_user(**params) # type: ignore
+
+
+class MoneyTests(SimpleTestCase):
+    '''Test the Money type and the vectorized helpers'''
+    def test_ints_are_cents(self):
+        '''Test that ints are cents and everything else is an amount'''
+        self.assertEqual(Money(77777), 77777)
+        self.assertEqual(Money('777.77'), 77777)
+        self.assertEqual(Money(Decimal('777.77')), 77777)
+        self.assertEqual(Money(777.77), 77777)
+        self.assertEqual(Money(77777).to_decimal(), Decimal('777.77'))
+
+    def test_rounds_half_up(self):
+        '''Test that fractions of a cent round half away from zero'''
+        self.assertEqual(Money('0.005'), 1)
+        self.assertEqual(Money('-0.005'), -1)
+        self.assertEqual(Money('0.0049'), 0)
+
+    def test_arithmetic_in_cents(self):
+        '''Test that arithmetic is plain int arithmetic on cents'''
+        total = Money('1.10') + Money('2.20') - 5
+
+        self.assertEqual(total, Money('3.25'))
+        self.assertEqual(Money(total).to_decimal(), Decimal('3.25'))
+        self.assertEqual(Money('2.50') * 3, Money('7.50'))
+
+    def test_str_is_cents(self):
+        '''Test that str() keeps the int form database drivers rely on'''
+        self.assertEqual(str(Money('1.23')), '123')
+        self.assertEqual(repr(Money('1.23')), "Money('1.23')")
+
+    def test_apply_rate(self):
+        '''Test applying basis points rounds like Decimal does'''
+        cents = np.array([77777, 100, -100, 5])
+        rate = 125  # 1.25%
+
+        result = money.apply_rate(cents, rate)
+
+        expected = [
+            Money(Decimal(value) / 100 * Decimal('0.0125')) for value in cents.tolist()
+        ]
+        self.assertEqual(result.tolist(), expected)
+
+    def test_allocate(self):
+        '''Test that allocated parts add up to the total'''
+        parts = money.allocate(100, [1, 1, 1])
+
+        self.assertEqual(parts.tolist(), [34, 33, 33])
+        self.assertEqual(money.allocate(1001, [3, 1]).sum(), 1001)
+
+    def test_to_cents_and_back(self):
+        '''Test converting between amounts and arrays of cents'''
+        cents = money.to_cents([Decimal('1.50'), Money(25), 7])
+
+        self.assertEqual(cents.dtype, np.int64)
+        self.assertEqual(money.to_decimals(cents), [Decimal('1.50'), Decimal('0.25'), Decimal('0.07')])
+
+
+class MoneyFieldTests(TestCase):
+    '''Test storing and serializing Money'''
+    def test_round_trip(self):
+        '''Test an amount is stored as cents and read back as Money'''
+        borrower = create_user(email='borrower@testing.com', password='testing*123')
+        MoneyRequest.objects.create(
+            borrower=borrower, title='Title', amount=Decimal('777.77'), frequency='WEEKLY', term=7,
+        )
+
+        moneyrequest = MoneyRequest.objects.get()
+
+        self.assertIsInstance(moneyrequest.amount, Money)
+        self.assertEqual(moneyrequest.amount, 77777)
+        self.assertEqual(MoneyRequest.objects.filter(amount__gt=Decimal('777.76')).count(), 1)
+
+    def test_invalid_value(self):
+        '''Test that a value that is not an amount is a validation error'''
+        with self.assertRaises(ValidationError):
+            MoneyField().to_python('not money')
+
+    def test_serializer_field(self):
+        '''Test the serializer field reads and writes decimal strings'''
+        field = MoneySerializerField(min_value=Decimal('0.01'))
+
+        self.assertEqual(field.to_representation(Money(77777)), '777.77')
+        self.assertEqual(field.to_representation(Money(1) + Money(2)), '0.03')
+        self.assertEqual(field.run_validation('777.77'), Money(77777))
+        self.assertIsInstance(field.run_validation('1'), Money)
+        with self.assertRaises(serializers.ValidationError):
+            field.run_validation('0.00')
@@ -0,0 +1,135 @@
+import sys
+from collections import deque
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import profiling
+
+MONEYREQUEST_URL = reverse('moneyrequest:moneyrequest-list')
+
+
+def create_user(**params):
+    '''Helper function to create a user'''
+    return get_user_model().objects.create_user(**params) # type: ignore
+
+
+@override_settings(PROFILING_SAMPLE_INTERVAL=0.0005)
+class ProfilingMiddlewareTests(TestCase):
+    '''Test the request profiling middleware'''
+    def setUp(self):
+        '''Set up the test environment'''
+        profiling.clear_profiles()
+        self.addCleanup(profiling.clear_profiles)
+        self.client = APIClient()
+        self.staff = create_user(email='staff@testing.com', password='testing*123')
+        self.staff.is_staff = True
+        self.staff.save()
+        self.user = create_user(email='user@testing.com', password='testing*123')
+
+    def get_with_token(self, user, **headers):
+        '''GET the money request list authenticated by token'''
+        token = Token.objects.create(user=user)
+        return self.client.get(
+            MONEYREQUEST_URL,
+            HTTP_AUTHORIZATION=f'Token {token.key}',
+            **headers,
+        )
+
+    def test_not_profiled_by_default(self):
+        '''Test that requests are not profiled without the header'''
+        res = self.get_with_token(self.staff)
+
+        self.assertNotIn('X-Profile-Id', res)
+        self.assertEqual(profiling.get_profiles(), [])
+
+    def test_header_ignored_for_non_staff(self):
+        '''Test that only staff can ask for a profile'''
+        res = self.get_with_token(self.user, HTTP_X_PROFILE='sample')
+
+        self.assertNotIn('X-Profile-Id', res)
+        self.assertEqual(profiling.get_profiles(), [])
+
+    def test_staff_profile(self):
+        '''Test that a staff request is profiled and broken down'''
+        res = self.get_with_token(self.staff, HTTP_X_PROFILE='sample')
+
+        record = profiling.get_profile(int(res['X-Profile-Id']))
+        self.assertEqual(record['path'], MONEYREQUEST_URL)
+        self.assertEqual(record['user'], self.staff.email)
+        self.assertGreater(record['queries'], 0)
+        breakdown = record['breakdown']
+        self.assertEqual(set(breakdown), {'total', 'database', 'view', 'render', 'other'})
+        self.assertGreater(breakdown['database'], 0)
+        self.assertAlmostEqual(
+            breakdown['total'],
+            sum(value for name, value in breakdown.items() if name != 'total'),
+        )
+
+    def test_cprofile_mode(self):
+        '''Test that cProfile statistics are kept in cprofile mode'''
+        res = self.get_with_token(self.staff, HTTP_X_PROFILE='cprofile')
+
+        record = profiling.get_profile(int(res['X-Profile-Id']))
+        self.assertEqual(record['mode'], 'cprofile')
+        self.assertIn('cumulative', record['stats'])
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0)
+    def test_sampled_requests(self):
+        '''Test that requests are profiled at the sampling rate'''
+        res = self.client.get(reverse('health-live'))
+
+        self.assertIn('X-Profile-Id', res)
+        self.assertEqual(profiling.get_profiles()[0]['mode'], 'sample')
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0)
+    def test_ring_buffer_is_bounded(self):
+        '''Test that only the last profiles are kept'''
+        with patch.object(profiling, '_profiles', deque(maxlen=2)):
+            ids = [self.client.get(reverse('health-live'))['X-Profile-Id'] for _ in range(3)]
+
+            self.assertEqual(
+                [str(record['id']) for record in profiling.get_profiles()],
+                ids[:0:-1],
+            )
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0)
+    def test_admin_pages(self):
+        '''Test that staff can list, view and export profiles'''
+        profile_id = self.client.get(reverse('health-live'))['X-Profile-Id']
+        record = profiling.get_profile(int(profile_id))
+        record['stacks'] = {'app:main;app:view': 3}
+        record['categories'] = {'other': 3}
+        self.client.force_login(self.staff)
+
+        res = self.client.get(reverse('profile-list'))
+        self.assertContains(res, '/health/live/')
+        res = self.client.get(reverse('profile-detail', args=[profile_id]))
+        self.assertContains(res, 'app:main;app:view')
+        res = self.client.get(reverse('profile-collapsed', args=[profile_id]))
+        self.assertEqual(res.content, b'app:main;app:view 3\n')
+
+    def test_admin_pages_staff_only(self):
+        '''Test that the profile pages need a staff login'''
+        self.client.force_login(self.user)
+
+        res = self.client.get(reverse('profile-list'))
+
+        self.assertEqual(res.status_code, 302)
+
+
+class StackTests(TestCase):
+    '''Test the stack helpers'''
+    def test_collapse_and_categorize(self):
+        '''Test that a frame becomes a root to leaf stack'''
+        frame = sys._getframe()
+
+        stack = profiling.collapse(frame)
+
+        self.assertTrue(stack.endswith(f'{__name__}:test_collapse_and_categorize'))
+        self.assertEqual(profiling.categorize(frame), 'other')
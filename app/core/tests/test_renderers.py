@@ -0,0 +1,52 @@
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import msgpack
+
+from django.test import SimpleTestCase
+
+from rest_framework.renderers import JSONRenderer
+
+from core.renderers import ORJSONRenderer, MessagePackRenderer
+
+
+class RendererTests(SimpleTestCase):
+    '''Test the fast API renderers'''
+    def setUp(self):
+        '''Set up the test environment'''
+        self.data = [
+            {
+                'id': 1,
+                'title': 'Test title é',
+                'amount': Decimal('777.77'),
+                'created': datetime(2024, 7, 14, 22, 9, tzinfo=timezone.utc),
+            },
+        ]
+
+    def test_orjson_matches_default_renderer(self):
+        '''Test that orjson output decodes to the same value as the default'''
+        fast = ORJSONRenderer().render(self.data)
+        default = JSONRenderer().render(self.data)
+
+        self.assertEqual(json.loads(fast)[0]['title'], json.loads(default)[0]['title'])
+        self.assertEqual(json.loads(fast)[0]['id'], 1)
+
+    def test_orjson_keeps_decimal_exact(self):
+        '''Test that decimals are rendered as exact strings'''
+        res = json.loads(ORJSONRenderer().render({'balance': Decimal('0.10')}))
+
+        self.assertEqual(res['balance'], '0.10')
+
+    def test_msgpack_roundtrip(self):
+        '''Test that MessagePack output decodes with decimals as strings'''
+        res = msgpack.unpackb(MessagePackRenderer().render(self.data))
+
+        self.assertEqual(res[0]['amount'], '777.77')
+        self.assertEqual(res[0]['title'], self.data[0]['title'])
+        self.assertEqual(res[0]['created'], '2024-07-14T22:09:00Z')
+
+    def test_render_none(self):
+        '''Test that empty responses render to no bytes'''
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+        self.assertEqual(MessagePackRenderer().render(None), b'')
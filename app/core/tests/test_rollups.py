@@ -0,0 +1,99 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core import models, rollups
+from core.money import Money
+
+
+def create_moneyrequest(borrower, **params):
+    '''Helper function to create a money request'''
+    defaults = {
+        'title': 'Test title',
+        'amount': Decimal('100.00'),
+        'frequency': 'WEEKLY',
+        'term': 7,
+    }
+    defaults.update(params)
+
+    return models.MoneyRequest.objects.create(borrower=borrower, **defaults)
+
+
+class RollupTests(TestCase):
+    '''Test the incrementally maintained rollups'''
+    def setUp(self):
+        '''Set up the test environment'''
+        self.borrower = get_user_model().objects.create_user( # type: ignore
+            'borrower@testing.com',
+            'testing*123',
+        )
+        self.lender = get_user_model().objects.create_user( # type: ignore
+            'lender@testing.com',
+            'testing*123',
+        )
+
+    def assertConsistent(self):
+        '''Assert the stored rollups match a full recomputation'''
+        self.assertEqual(rollups.diff_rollups(), {'moneyrequest': [], 'account': []})
+
+    def test_create_updates_bucket(self):
+        '''Test that creating money requests adds to their bucket'''
+        create_moneyrequest(self.borrower)
+        create_moneyrequest(self.borrower, amount=Decimal('50.00'))
+
+        bucket = models.MoneyRequestRollup.objects.get(term=7, frequency='WEEKLY')
+        self.assertEqual(bucket.count, 2)
+        self.assertEqual(bucket.total_amount, Money('150.00'))
+        self.assertConsistent()
+
+    def test_update_moves_between_buckets(self):
+        '''Test that changing term and funding moves the totals'''
+        moneyrequest = create_moneyrequest(self.borrower)
+        moneyrequest = models.MoneyRequest.objects.get(id=moneyrequest.id)
+        moneyrequest.term = 12
+        moneyrequest.lender = self.lender
+        moneyrequest.save()
+
+        old = models.MoneyRequestRollup.objects.get(term=7, frequency='WEEKLY')
+        new = models.MoneyRequestRollup.objects.get(term=12, frequency='WEEKLY')
+        self.assertEqual(old.count, 0)
+        self.assertEqual(new.funded_count, 1)
+        self.assertEqual(new.outstanding_principal, Money('100.00'))
+        self.assertConsistent()
+
+    def test_update_with_deferred_fields(self):
+        '''Test updating an instance loaded with .only() keeps totals right'''
+        moneyrequest = create_moneyrequest(self.borrower)
+        moneyrequest = models.MoneyRequest.objects.only('id', 'title').get(id=moneyrequest.id)
+        moneyrequest.amount = Decimal('300.00')
+        moneyrequest.save()
+
+        self.assertConsistent()
+
+    def test_delete_and_cascade(self):
+        '''Test that deletes, including cascades, are subtracted'''
+        create_moneyrequest(self.borrower)
+        models.Account.objects.create(user=self.borrower, balance=Decimal('10.00'))
+        create_moneyrequest(self.lender).delete()
+
+        self.borrower.delete()
+
+        self.assertFalse(models.MoneyRequestRollup.objects.filter(count__gt=0).exists())
+        self.assertFalse(models.AccountRollup.objects.filter(count__gt=0).exists())
+        self.assertConsistent()
+
+    def test_check_rollups_command(self):
+        '''Test the command reports drift and fixes it'''
+        create_moneyrequest(self.borrower)
+        models.MoneyRequest.objects.update(amount=Decimal('999.00'))
+
+        with self.assertRaises(CommandError):
+            call_command('check_rollups', stdout=StringIO())
+
+        call_command('check_rollups', '--fix', stdout=StringIO())
+
+        self.assertConsistent()
@@ -0,0 +1,95 @@
+import json
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import schema
+from core.management.commands.profile_startup import group_by_app, parse_importtime
+
+SCHEMA_URL = reverse('schema')
+
+
+class PrecomputedSchemaTests(TestCase):
+    '''Test serving the prebuilt OpenAPI schema'''
+    def setUp(self):
+        '''Set up the test environment'''
+        self.client = APIClient()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        settings_override = override_settings(SCHEMA_ARTIFACT_DIR=tmpdir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_serves_artifact_with_etag(self):
+        '''Test that the built YAML schema is served with an ETag'''
+        schema.build_artifacts()
+
+        res = self.client.get(SCHEMA_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['Content-Type'].startswith('application/vnd.oai.openapi'))
+        self.assertIn(b'openapi:', res.content)
+        self.assertTrue(res['ETag'])
+
+    def test_not_modified(self):
+        '''Test that a matching If-None-Match returns 304'''
+        schema.build_artifacts()
+        etag = self.client.get(SCHEMA_URL)['ETag']
+
+        res = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+
+    def test_not_modified_compressed(self):
+        '''Test that the weak ETag of a compressed schema still returns 304'''
+        schema.build_artifacts()
+        etag = self.client.get(SCHEMA_URL, HTTP_ACCEPT_ENCODING='gzip')['ETag']
+
+        res = self.client.get(SCHEMA_URL, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertTrue(etag.startswith('W/'))
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_json_format(self):
+        '''Test that the JSON artifact is served for ?format=json'''
+        schema.build_artifacts()
+
+        res = self.client.get(SCHEMA_URL, {'format': 'json'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('/api/moneyrequest/moneyrequests/', json.loads(res.content)['paths'])
+
+    def test_falls_back_without_artifact(self):
+        '''Test that the schema is generated when no artifact was built'''
+        res = self.client.get(SCHEMA_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn(b'openapi', res.content)
+
+
+class ProfileStartupTests(TestCase):
+    '''Test the import time report helpers'''
+    def test_group_by_app(self):
+        '''Test that modules are counted against the longest app prefix'''
+        output = '\n'.join([
+            'import time: self [us] | cumulative | imported package',
+            'import time:       100 |        100 |   rest_framework.fields',
+            'import time:        50 |         50 |     rest_framework.authtoken.models',
+            'import time:        30 |         30 | numpy.core',
+            'import time:         7 |          7 | core',
+        ])
+
+        totals = group_by_app(
+            parse_importtime(output),
+            ['rest_framework', 'rest_framework.authtoken', 'core'],
+        )
+
+        self.assertEqual(totals['rest_framework'], 100)
+        self.assertEqual(totals['rest_framework.authtoken'], 50)
+        self.assertEqual(totals['core'], 7)
+        self.assertEqual(totals['numpy'], 30)
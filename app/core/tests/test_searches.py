@@ -0,0 +1,128 @@
+from decimal import Decimal
+from io import StringIO
+
+import numpy as np
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from core import searches
+from core.models import JobWatermark, SavedSearch
+from core.tests import factories
+
+
+class SearchIndexTests(SimpleTestCase):
+    '''Test the segment tree finds the same searches as checking them all'''
+    def test_matches_brute_force(self):
+        '''Test the index agrees with checking every search, bounds included'''
+        rng = np.random.default_rng(1)
+        rows = []
+        for pk in range(1, 501):
+            low = int(rng.integers(1, 1000))
+            high = low + int(rng.integers(0, 300))
+            rows.append((
+                pk, pk, f'search {pk}',
+                None if pk % 17 == 0 else low,
+                None if pk % 13 == 0 else high,
+                None if pk % 11 == 0 else int(rng.integers(1, 10)),
+                None if pk % 7 == 0 else int(rng.integers(10, 30)),
+                ['', 'WEEKLY', 'MONTHLY'][pk % 3],
+            ))
+        index = searches.SearchIndex(*searches.to_arrays(rows))
+
+        for amount in [*rng.integers(1, 1400, 200), 1, 999, 1298]:
+            for term, frequency in ((5, 'WEEKLY'), (20, 'MONTHLY'), (40, 'DAILY')):
+                expected = [
+                    position for position, (_, _, _, low, high, min_term, max_term, freq) in enumerate(rows)
+                    if (low is None or low <= amount) and (high is None or amount <= high)
+                    and (min_term is None or min_term <= term) and (max_term is None or term <= max_term)
+                    and freq in ('', frequency)
+                ]
+                found = index.match(amount, term, frequency)
+                self.assertEqual(sorted(found.tolist()), expected)
+
+    def test_shared_bounds(self):
+        '''Test ranges ending where another starts each hold their own end'''
+        rows = [
+            (1, 1, 'low', 100, 200, None, None, ''),
+            (2, 1, 'high', 200, 300, None, None, ''),
+            (3, 1, 'point', 200, 200, None, None, ''),
+        ]
+        index = searches.SearchIndex(*searches.to_arrays(rows))
+
+        self.assertEqual(sorted(index.candidates(199).tolist()), [0])
+        self.assertEqual(sorted(index.candidates(200).tolist()), [0, 1, 2])
+        self.assertEqual(sorted(index.candidates(201).tolist()), [1])
+        self.assertEqual(index.candidates(99).tolist(), [])
+        self.assertEqual(index.candidates(301).tolist(), [])
+
+    def test_empty(self):
+        '''Test an index without searches matches nothing'''
+        index = searches.SearchIndex(*searches.to_arrays([]))
+
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.match(100, 7, 'WEEKLY').tolist(), [])
+
+
+class DigestTests(TestCase):
+    '''Test lenders are emailed the new money requests their searches match'''
+    def setUp(self):
+        '''Set up the test environment'''
+        self.lender, self.other_lender = factories.create_users(2, prefix='lender')
+        self.borrower = factories.create_users(1, prefix='borrower')[0]
+        SavedSearch.objects.create(
+            owner=self.lender, name='Small weekly',
+            min_amount=Decimal('100.00'), max_amount=Decimal('1000.00'), frequency='WEEKLY',
+        )
+        SavedSearch.objects.create(owner=self.lender, name='Short', max_term=10)
+        SavedSearch.objects.create(owner=self.other_lender, name='Large', min_amount=Decimal('5000.00'))
+
+    def test_send_digests(self):
+        '''Test each lender gets one email listing the open requests that match'''
+        factories.create_moneyrequests([self.borrower], 2, amount=Decimal('500.00'), term=7)
+        factories.create_moneyrequests([self.borrower], 1, amount=Decimal('9000.00'), term=20)
+        factories.create_moneyrequests([self.borrower], 1, amount=Decimal('500.00'), status='FUNDED')
+
+        checked, sent = searches.send_digests()
+
+        self.assertEqual((checked, sent), (4, 2))
+        emails = {message.to[0]: message for message in mail.outbox}
+        self.assertEqual(set(emails), {self.lender.email, self.other_lender.email})
+        lender_email = emails[self.lender.email]
+        self.assertIn('2 new money requests', lender_email.subject)
+        self.assertIn('matches Small weekly, Short', lender_email.body)
+        self.assertNotIn('9000.00', lender_email.body)
+        self.assertIn('9000.00', emails[self.other_lender.email].body)
+
+    def test_rerun_sends_nothing(self):
+        '''Test requests already matched are not sent again'''
+        factories.create_moneyrequests([self.borrower], 1, amount=Decimal('500.00'))
+        searches.send_digests()
+
+        self.assertEqual(searches.send_digests(), (0, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(JobWatermark.objects.get(job=searches.DIGEST_JOB).value, self.borrower.borrower.get().id)
+
+    def test_own_requests_excluded(self):
+        '''Test a lender is not told about the requests they made themselves'''
+        factories.create_moneyrequests([self.lender], 1, amount=Decimal('500.00'))
+
+        self.assertEqual(searches.send_digests(), (1, 0))
+        self.assertEqual(mail.outbox, [])
+
+    def test_batches(self):
+        '''Test requests spread over several batches are all matched'''
+        factories.create_moneyrequests([self.borrower], 5, amount=Decimal('500.00'))
+
+        self.assertEqual(searches.send_digests(batch_size=2), (5, 1))
+        self.assertIn('5 new money requests', mail.outbox[0].subject)
+
+    def test_command(self):
+        '''Test the command reports what it checked and sent'''
+        factories.create_moneyrequests([self.borrower], 1, amount=Decimal('500.00'))
+        out = StringIO()
+
+        call_command('send_search_digests', stdout=out)
+
+        self.assertIn('Checked 1 money requests, sent 1 digests', out.getvalue())
@@ -0,0 +1,251 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import DatabaseError, connections
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import contracts, rollups, sharding
+from core.models import Account, Contract, MoneyRequest, Payment, UserShard
+from core.money import Money
+
+ACCOUNTS_URL = reverse('account:account-list')
+MONEYREQUESTS_URL = reverse('moneyrequest:moneyrequest-list')
+MARKETPLACE_URL = reverse('moneyrequest:marketplace')
+DASHBOARD_URL = reverse('moneyrequest:lender-dashboard')
+SHARDS = ['default', 'shard1', 'shard2']
+
+
+def create_user(**params):
+    '''Helper function to create a user'''
+    return get_user_model().objects.create_user(**params) # type: ignore
+
+
+def create_moneyrequest(borrower, **params):
+    '''Helper function to create a money request'''
+    defaults = {
+        'title': 'Test title',
+        'amount': Decimal('100.00'),
+        'frequency': 'WEEKLY',
+        'term': 7,
+    }
+    defaults.update(params)
+    return MoneyRequest.objects.create(borrower=borrower, **defaults)
+
+
+@override_settings(SHARDS=SHARDS)
+class ShardingTests(TestCase):
+    '''Test spreading user owned rows over several databases'''
+    databases = set(SHARDS)
+
+    def setUp(self):
+        '''Set up the test environment'''
+        sharding.reset()
+        self.addCleanup(sharding.reset)
+        self.client = APIClient()
+        self.users = []
+        for alias in SHARDS:
+            user = create_user(email=f'{alias}@testing.com', password='testing*123')
+            sharding.assign(user.pk, alias)
+            self.users.append(user)
+
+    def test_new_users_placed(self):
+        '''Test that a new user gets a recorded shard'''
+        user = create_user(email='new@testing.com', password='testing*123')
+
+        alias = UserShard.objects.get(user=user).alias
+        self.assertEqual(alias, sharding.place(user.pk))
+        self.assertEqual(sharding.shard_for_user(user.pk), alias)
+
+    def test_rows_written_to_owner_shard(self):
+        '''Test that the API stores and lists rows on the owner's shard'''
+        user = self.users[1]
+        self.client.force_authenticate(user)
+
+        res = self.client.post(ACCOUNTS_URL, {'type': 'LENDER'})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        res = self.client.post(MONEYREQUESTS_URL, {
+            'title': 'Car', 'amount': '250.00', 'frequency': 'WEEKLY', 'term': 4,
+        })
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        self.assertFalse(Account.objects.using('default').exists())
+        self.assertEqual(Account.objects.using('shard1').get().user_id, user.pk)
+        self.assertEqual(MoneyRequest.objects.using('shard1').get().title, 'Car')
+        copy = get_user_model().objects.using('shard1').get(pk=user.pk)
+        self.assertFalse(copy.check_password('testing*123'))
+        self.assertEqual(len(self.client.get(ACCOUNTS_URL).data), 1) # type: ignore
+        self.assertEqual(len(self.client.get(MONEYREQUESTS_URL).data), 1) # type: ignore
+
+    def test_ids_unique_across_shards(self):
+        '''Test that primary keys come from one allocator'''
+        ids = [create_moneyrequest(user).pk for user in self.users for _ in range(2)]
+
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_user_changes_reach_copies(self):
+        '''Test that shard copies follow updates and deletes of the user'''
+        user = self.users[2]
+        create_moneyrequest(user)
+        user.name = 'Renamed'
+        user.save()
+
+        self.assertEqual(get_user_model().objects.using('shard2').get(pk=user.pk).name, 'Renamed')
+        user.delete()
+        self.assertFalse(MoneyRequest.objects.using('shard2').exists())
+
+    def test_marketplace_gathers_shards(self):
+        '''Test that the marketplace merges open requests from every shard'''
+        for amount, user in zip(['300.00', '100.00', '200.00'], self.users):
+            create_moneyrequest(user, amount=Decimal(amount))
+        create_moneyrequest(self.users[0], amount=Decimal('50.00'), term=12)
+        self.client.force_authenticate(self.users[0])
+
+        res = self.client.get(MARKETPLACE_URL, {'term': 7, 'limit': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['amount'] for row in res.data], ['100.00', '200.00']) # type: ignore
+        self.assertEqual(res.data[0]['borrower'], { # type: ignore
+            'id': self.users[1].pk,
+            'name': self.users[1].name,
+        })
+
+    def test_lender_dashboard_gathers_shards(self):
+        '''Test that the dashboard covers requests funded on every shard'''
+        lender = self.users[0]
+        for user in self.users[1:]:
+            create_moneyrequest(user, lender=lender, status='FUNDED')
+        self.client.force_authenticate(lender)
+
+        res = self.client.get(DASHBOARD_URL)
+
+        self.assertEqual(res.data['totals']['count'], 2) # type: ignore
+        self.assertEqual(res.data['totals']['total_amount'], '200.00') # type: ignore
+        self.assertEqual(len(res.data['borrowers']), 2) # type: ignore
+        self.assertEqual(len(res.data['moneyrequests']), 2) # type: ignore
+
+    def test_rollups_cover_shards(self):
+        '''Test that the rollups on default count rows of every shard'''
+        for user in self.users:
+            create_moneyrequest(user)
+
+        self.assertEqual(rollups.diff_rollups(), {'moneyrequest': [], 'account': []})
+        self.assertEqual(rollups.compute_moneyrequest_rollups()[(7, 'WEEKLY')]['count'], 3)
+
+    def test_move_user(self):
+        '''Test moving a user's rows to another shard'''
+        user, lender = self.users[1], self.users[0]
+        Account.objects.create(user=user)
+        request = create_moneyrequest(user, lender=lender, status='FUNDED')
+
+        call_command('move_user_shard', user.email, 'shard2', '--grace', '0', stdout=open('/dev/null', 'w'))
+
+        self.assertFalse(MoneyRequest.objects.using('shard1').exists())
+        self.assertEqual(MoneyRequest.objects.using('shard2').get().pk, request.pk)
+        self.assertEqual(sharding.shard_for_user(user.pk), 'shard2')
+        self.assertTrue(get_user_model().objects.using('shard2').filter(pk=lender.pk).exists())
+        self.assertEqual(rollups.diff_rollups(), {'moneyrequest': [], 'account': []})
+        self.client.force_authenticate(user)
+        res = self.client.get(reverse('moneyrequest:moneyrequest-detail', args=[request.pk]))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_failed_move_keeps_source(self):
+        '''Test the rows stay on the source when the copy fails to commit on the target'''
+        user = self.users[1]
+        account = Account.objects.create(user=user)
+        create_moneyrequest(user)
+        target = connections['shard2']
+        savepoint_commit = target.savepoint_commit
+        calls = []
+
+        def fail_first_commit(sid):
+            calls.append(sid)
+            if len(calls) == 1:
+                raise DatabaseError('commit failed')
+            return savepoint_commit(sid)
+
+        with mock.patch.object(target, 'savepoint_commit', side_effect=fail_first_commit):
+            with self.assertRaises(DatabaseError):
+                sharding.move_user(user.pk, 'shard2')
+
+        self.assertEqual(Account.objects.using('shard1').get().pk, account.pk)
+        self.assertEqual(MoneyRequest.objects.using('shard1').count(), 1)
+        self.assertFalse(MoneyRequest.objects.using('shard2').exists())
+        self.assertEqual(sharding.placement(user.pk), ('shard1', False))
+
+        sharding.move_user(user.pk, 'shard2')
+
+        self.assertFalse(MoneyRequest.objects.using('shard1').exists())
+        self.assertEqual(Account.objects.using('shard2').get().pk, account.pk)
+
+    def test_writes_refused_while_moving(self):
+        '''Test a user's writes get 503 while their rows are being moved'''
+        user = self.users[1]
+        sharding.assign(user.pk, 'shard1', moving=True)
+        self.client.force_authenticate(user)
+
+        res = self.client.post(MONEYREQUESTS_URL, {
+            'title': 'Test title', 'amount': '100.00', 'frequency': 'WEEKLY', 'term': 7,
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        with self.assertRaises(sharding.UserMoving):
+            Account.objects.create(user=user)
+        self.assertFalse(MoneyRequest.objects.using('shard1').exists())
+
+    def test_write_during_move_refused(self):
+        '''Test a save routed to the source before the move is refused, not lost to the purge'''
+        user = self.users[1]
+        create_moneyrequest(user)
+        late = MoneyRequest(borrower=user, title='Late', amount=Decimal('5.00'), frequency='WEEKLY', term=7)
+        copy_rows = sharding._copy_rows
+
+        def copy_with_write(*args):
+            # The save checked the map before the move set the flag
+            with self.assertRaises(sharding.UserMoving):
+                MoneyRequest(
+                    borrower=user, title='During', amount=Decimal('5.00'), frequency='WEEKLY', term=7,
+                ).save(using='shard1')
+            return copy_rows(*args)
+
+        with mock.patch.object(sharding, '_copy_rows', side_effect=copy_with_write):
+            moved = sharding.move_user(user.pk, 'shard2')
+        with self.assertRaises(sharding.UserMoving):
+            late.save(using='shard1')
+
+        self.assertEqual(moved['MoneyRequest'], 1)
+        self.assertFalse(MoneyRequest.objects.using('shard1').exists())
+        self.assertEqual(MoneyRequest.objects.using('shard2').get().title, 'Test title')
+
+    def test_write_ignores_stale_map(self):
+        '''Test a write goes to the user's current shard, not the one this process remembers'''
+        user = self.users[1]
+        self.assertEqual(sharding.shard_for_user(user.pk), 'shard1')
+        UserShard.objects.filter(user=user).update(alias='shard2')
+
+        account = Account.objects.create(user=user)
+
+        self.assertEqual(account._state.db, 'shard2')
+        self.assertEqual(sharding.shard_for_user(user.pk), 'shard2')
+
+    def test_contracts_follow_borrower(self):
+        '''Test that contracts and payments live and move with their borrower'''
+        user, lender = self.users[1], self.users[0]
+        contract = contracts.open_contract(create_moneyrequest(user, lender=lender, status='FUNDED'))
+        contracts.apply_payments([Payment(contract=contract, amount=Decimal('40.00'))])
+
+        self.assertEqual(contract._state.db, 'shard1')
+        self.assertEqual(Payment.objects.using('shard1').get().contract_id, contract.pk)
+        self.assertEqual(contracts.reconcile(), (1, []))
+
+        sharding.move_user(user.pk, 'shard2')
+
+        self.assertFalse(Contract.objects.using('shard1').exists())
+        moved = Contract.objects.using('shard2').get()
+        self.assertEqual(moved.remaining_balance, Money('60.00'))
+        self.assertEqual(Payment.objects.using('shard2').count(), 1)
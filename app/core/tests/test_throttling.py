@@ -0,0 +1,60 @@
+from django.test import SimpleTestCase
+
+from core import throttling
+
+
+class TokenBucketTests(SimpleTestCase):
+    '''Test the token bucket throttle store'''
+    def setUp(self):
+        '''Set up the test environment'''
+        self.store = throttling.LocalBucketStore(max_buckets=2)
+
+    def test_parse_rate(self):
+        '''Test parsing a rate into capacity and refill per second'''
+        self.assertEqual(throttling.parse_rate('60/min'), (60, 1.0))
+        self.assertEqual(throttling.parse_rate('10/s'), (10, 10.0))
+        self.assertIsNone(throttling.parse_rate(None))
+
+    def test_bucket_allows_burst_then_waits(self):
+        '''Test that a bucket allows its capacity then returns a wait'''
+        for _ in range(3):
+            self.assertEqual(self.store.take('a', 3, 1.0, now=100.0), 0)
+
+        wait = self.store.take('a', 3, 1.0, now=100.0)
+
+        self.assertAlmostEqual(wait, 1.0)
+
+    def test_bucket_refills_over_time(self):
+        '''Test that tokens come back at the refill rate'''
+        for _ in range(3):
+            self.store.take('a', 3, 1.0, now=100.0)
+
+        self.assertGreater(self.store.take('a', 3, 1.0, now=100.5), 0)
+        self.assertEqual(self.store.take('a', 3, 1.0, now=101.5), 0)
+
+    def test_buckets_are_separate_per_key(self):
+        '''Test that each key has its own budget'''
+        self.store.take('a', 1, 1.0, now=100.0)
+
+        self.assertGreater(self.store.take('a', 1, 1.0, now=100.0), 0)
+        self.assertEqual(self.store.take('b', 1, 1.0, now=100.0), 0)
+
+    def test_store_is_bounded(self):
+        '''Test that idle full buckets are pruned when the store is full'''
+        self.store.take('a', 1, 1.0, now=100.0)
+        self.store.take('b', 1, 1.0, now=100.0)
+        self.store.take('c', 1, 1.0, now=200.0)
+
+        self.assertLessEqual(len(self.store.buckets), 2)
+        self.assertIn('c', self.store.buckets)
+
+    def test_full_store_evicts_least_recently_used(self):
+        '''Test that new keys evict the least recently used bucket, not every bucket'''
+        self.store.take('limited', 1, 1.0, now=100.0)
+        self.store.take('a', 1, 1.0, now=100.0)
+        self.store.take('limited', 1, 1.0, now=100.0)
+
+        self.store.take('b', 1, 1.0, now=100.0)
+
+        self.assertEqual(list(self.store.buckets), ['limited', 'b'])
+        self.assertGreater(self.store.take('limited', 1, 1.0, now=100.0), 0)
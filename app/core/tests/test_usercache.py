@@ -0,0 +1,168 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import usercache
+
+PROFILE_URL = reverse('user:profile')
+
+
+def create_user(**params):
+    '''Helper function to create a user'''
+    return get_user_model().objects.create_user(**params) # type: ignore
+
+
+@override_settings(USER_CACHE_TTL=30, USER_CACHE_SIZE=100)
+class UserCacheTests(TestCase):
+    '''Test the user cache'''
+    def setUp(self):
+        '''Set up the test environment'''
+        usercache.reset()
+        self.addCleanup(usercache.reset)
+        self.user = create_user(email='user@testing.com', password='testing*123', name='Tester')
+
+    def test_get_user_is_cached(self):
+        '''Test that a user is read from the database once'''
+        usercache.get_user(self.user.id)
+
+        with self.assertNumQueries(0):
+            user = usercache.get_user(self.user.id)
+
+        self.assertEqual(user.email, self.user.email)
+        self.assertEqual(usercache.stats()['local_hits'], 1)
+        self.assertEqual(usercache.stats()['hit_ratio'], 0.5)
+
+    def test_password_not_cached(self):
+        '''Test that the password hash stays out of the cache'''
+        user = usercache.get_user(self.user.id)
+
+        self.assertIn('password', user.get_deferred_fields())
+        self.assertTrue(user.check_password('testing*123'))
+
+    def test_missing_user(self):
+        '''Test that unknown ids are not cached'''
+        self.assertIsNone(usercache.get_user(self.user.id + 1))
+        self.assertIsNone(usercache.get_user(self.user.id + 1))
+
+        self.assertEqual(usercache.stats()['misses'], 2)
+
+    def test_save_invalidates(self):
+        '''Test that saving a user drops the cached copy'''
+        usercache.get_user(self.user.id)
+        self.user.name = 'Renamed'
+        self.user.save()
+
+        self.assertEqual(usercache.get_user(self.user.id).name, 'Renamed')
+
+    def test_request_scope_identity_map(self):
+        '''Test that a request sees one instance per user'''
+        with usercache.request_scope():
+            first = usercache.get_user(self.user.id)
+            second = usercache.get_user(self.user.id)
+
+        self.assertIs(first, second)
+        self.assertIsNot(usercache.get_user(self.user.id), first)
+        self.assertEqual(usercache.stats()['request_hits'], 1)
+
+    @override_settings(USER_CACHE_SIZE=1)
+    def test_least_recently_used_evicted(self):
+        '''Test that the process tier is bounded'''
+        other = create_user(email='other@testing.com', password='testing*123')
+        usercache.get_user(self.user.id)
+        usercache.get_user(other.id)
+
+        with self.assertNumQueries(1):
+            usercache.get_user(self.user.id)
+
+    def test_entries_expire(self):
+        '''Test that entries are reloaded after the TTL'''
+        usercache.get_user(self.user.id)
+
+        with patch('core.usercache.time.monotonic', return_value=10**9):
+            with self.assertNumQueries(1):
+                usercache.get_user(self.user.id)
+
+    @override_settings(USER_CACHE_TTL=0)
+    def test_disabled(self):
+        '''Test that a TTL of 0 turns the cache off'''
+        usercache.get_user(self.user.id)
+
+        with self.assertNumQueries(1):
+            usercache.get_user(self.user.id)
+
+    @override_settings(
+        USER_CACHE_SHARED_ALIAS='default',
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    )
+    def test_shared_tier(self):
+        '''Test that other processes find users in the shared cache'''
+        usercache.get_user(self.user.id)
+        usercache._local.clear()
+
+        with self.assertNumQueries(0):
+            usercache.get_user(self.user.id)
+
+        self.assertEqual(usercache.stats()['shared_hits'], 1)
+        self.user.save()
+        usercache._local.clear()
+        with self.assertNumQueries(1):
+            usercache.get_user(self.user.id)
+
+
+@override_settings(USER_CACHE_TTL=30)
+class CachedTokenAuthenticationTests(TestCase):
+    '''Test token authentication through the user cache'''
+    def setUp(self):
+        '''Set up the test environment'''
+        usercache.reset()
+        self.addCleanup(usercache.reset)
+        self.user = create_user(email='user@testing.com', password='testing*123', name='Tester')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_warm_profile_read_without_queries(self):
+        '''Test that a warm profile read does not touch the database'''
+        self.client.get(PROFILE_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(PROFILE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email) # type: ignore
+
+    def test_update_invalidates(self):
+        '''Test that updating the profile is visible on the next read'''
+        self.client.get(PROFILE_URL)
+
+        self.client.patch(PROFILE_URL, {'name': 'Renamed', 'password': 'newpass*123'})
+        res = self.client.get(PROFILE_URL)
+
+        self.assertEqual(res.data['name'], 'Renamed') # type: ignore
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('newpass*123'))
+
+    def test_inactive_user_rejected(self):
+        '''Test that deactivating a user takes effect immediately'''
+        self.client.get(PROFILE_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(PROFILE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_rejected(self):
+        '''Test that a deleted token stops authenticating'''
+        self.client.get(PROFILE_URL)
+        self.token.delete()
+
+        res = self.client.get(PROFILE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,182 @@
+'''
+Token bucket throttling for the API
+
+Each client gets a bucket per throttle scope that refills continuously at
+the configured rate. Checking a request is a couple of float operations on
+an in-process dict, so it never touches the database. A shared backend
+backed by the Django cache can be enabled with THROTTLE_BUCKET_BACKEND so
+that several worker processes share one budget.
+'''
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+# Constants
+DEFAULT_MAX_BUCKETS = 100_000
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    '''Parse a rate like "10/min" into (capacity, refill per second)'''
+    if rate is None:
+        return None
+    num, period = rate.split('/')
+    capacity = int(num)
+    duration = PERIODS[period[0]]
+    return capacity, capacity / duration
+
+
+class TokenBucket:
+    '''A single token bucket, refilled lazily on each take'''
+    __slots__ = ('tokens', 'stamp', 'lock')
+
+    def __init__(self, capacity, now):
+        self.tokens = float(capacity)
+        self.stamp = now
+        self.lock = threading.Lock()
+
+    def take(self, capacity, refill, now):
+        '''Take a token and return 0, or return the seconds until one is free'''
+        with self.lock:
+            tokens = min(capacity, self.tokens + (now - self.stamp) * refill)
+            self.stamp = now
+            if tokens >= 1:
+                self.tokens = tokens - 1
+                return 0.0
+            self.tokens = tokens
+            return (1 - tokens) / refill
+
+
+class LocalBucketStore:
+    '''In-process bucket store, one lock per bucket
+
+    Buckets are kept in order of last use. When the store is full, buckets
+    that have refilled are dropped first, then the least recently used, so
+    a flood of new keys cannot reset the clients being limited.
+    '''
+    def __init__(self, max_buckets=DEFAULT_MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, key, capacity, refill, now):
+        '''Take a token from the bucket for key'''
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                if len(self.buckets) >= self.max_buckets:
+                    self.prune(capacity, refill, now)
+                bucket = self.buckets[key] = TokenBucket(capacity, now)
+            else:
+                self.buckets.move_to_end(key)
+        return bucket.take(capacity, refill, now)
+
+    def prune(self, capacity, refill, now):
+        '''Drop buckets that have refilled completely, then the least recently used
+
+        Called with the store lock held.
+        '''
+        full_after = capacity / refill
+        for key, bucket in list(self.buckets.items()):
+            if now - bucket.stamp >= full_after:
+                del self.buckets[key]
+        while len(self.buckets) >= self.max_buckets:
+            self.buckets.popitem(last=False)
+
+    def reset(self):
+        '''Forget all buckets'''
+        with self.lock:
+            self.buckets.clear()
+
+
+class CacheBucketStore:
+    '''Bucket store shared between processes through the Django cache
+
+    The read-modify-write is not atomic across processes, so a burst may
+    let a few extra requests through; the budget still holds over time.
+    '''
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        '''Return the configured cache'''
+        return caches[self.alias]
+
+    def take(self, key, capacity, refill, now):
+        '''Take a token from the bucket stored under key'''
+        cache_key = f'throttle:{key}'
+        tokens, stamp = self.cache.get(cache_key, (float(capacity), now))
+        tokens = min(capacity, tokens + (now - stamp) * refill)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / refill
+        self.cache.set(cache_key, (tokens, now), timeout=int(capacity / refill) + 1)
+        return wait
+
+    def reset(self):
+        '''Shared buckets expire on their own'''
+
+
+local_store = LocalBucketStore()
+
+
+def get_store():
+    '''Return the bucket store selected by THROTTLE_BUCKET_BACKEND'''
+    backend = getattr(settings, 'THROTTLE_BUCKET_BACKEND', 'local')
+    if backend == 'local':
+        return local_store
+    if backend == 'cache':
+        return CacheBucketStore(getattr(settings, 'THROTTLE_BUCKET_CACHE', 'default'))
+    raise ImproperlyConfigured(f'Unknown THROTTLE_BUCKET_BACKEND "{backend}"')
+
+
+class ScopedTokenBucketThrottle(BaseThrottle):
+    '''Throttle a view by its throttle_scope using a token bucket
+
+    Authenticated clients are keyed by user, anonymous clients by IP, and
+    each scope has its own budget in DEFAULT_THROTTLE_RATES.
+    '''
+    scope_attr = 'throttle_scope'
+    timer = time.time
+
+    def __init__(self):
+        self.wait_time = 0.0
+
+    def get_rate(self, scope):
+        '''Return the configured rate for scope'''
+        return api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+
+    def get_cache_key(self, request, view, scope):
+        '''Return the bucket key for this client and scope'''
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            ident = f'user:{user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        return f'{scope}:{ident}'
+
+    def allow_request(self, request, view):
+        '''Take a token from the client's bucket'''
+        scope = getattr(view, self.scope_attr, None)
+        parsed = parse_rate(self.get_rate(scope)) if scope else None
+        if parsed is None:
+            return True
+
+        capacity, refill = parsed
+        key = self.get_cache_key(request, view, scope)
+        self.wait_time = get_store().take(key, capacity, refill, self.timer())
+        return self.wait_time == 0
+
+    def wait(self):
+        '''Seconds until the next request is allowed, sent as Retry-After'''
+        return self.wait_time
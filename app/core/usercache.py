@@ -0,0 +1,228 @@
+'''
+Cache of user rows and API token owners
+
+Users are looked up by id through three tiers before the database:
+1. a per request identity map, so a request sees one instance per user
+2. a process LRU holding at most USER_CACHE_SIZE users for USER_CACHE_TTL
+   seconds
+3. optionally the Django cache named by USER_CACHE_SHARED_ALIAS, shared
+   by every worker process
+API token keys are mapped to their user id the same way, minus the
+identity map. Saving or deleting a user, and deleting a token, removes it
+from this process and from the shared tier, again once the transaction
+commits so that a concurrent read cannot cache the old row. Other
+processes can keep an old copy in their LRU for up to USER_CACHE_TTL
+seconds, and so can this one if the transaction that read a row it had
+just written rolls back.
+
+The password hash is never cached. Instances come with the password
+deferred, so it is loaded when read and left alone by save().
+'''
+import hashlib
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+
+# Constants
+DEFAULT_SIZE = 10_000
+DEFAULT_TTL = 30
+KEY_PREFIX = 'usercache'
+EXCLUDED_FIELDS = ('password',)
+
+_identity_map = ContextVar('usercache_identity_map', default=None)
+
+
+class LRUCache:
+    '''Thread safe LRU mapping whose entries expire after a while'''
+    def __init__(self):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        '''Return the value for key, or None if missing or expired'''
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl, size):
+        '''Store value for key, evicting the least recently used entries'''
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        '''Forget key'''
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        '''Forget everything'''
+        with self._lock:
+            self._data.clear()
+
+
+_local = LRUCache()
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(event):
+    '''Count a cache event'''
+    with _stats_lock:
+        _stats[event] += 1
+
+
+def stats():
+    '''Return the hit counts per tier and the overall hit ratio'''
+    with _stats_lock:
+        counts = dict(_stats)
+    hits = sum(value for name, value in counts.items() if name.endswith('_hits'))
+    lookups = hits + counts.get('misses', 0)
+    return {**counts, 'hit_ratio': hits / lookups if lookups else None}
+
+
+def reset():
+    '''Empty the process cache and the statistics'''
+    _local.clear()
+    with _stats_lock:
+        _stats.clear()
+
+
+def get_ttl():
+    '''Return how long users stay cached, 0 disables the process and shared tiers'''
+    return getattr(settings, 'USER_CACHE_TTL', DEFAULT_TTL)
+
+
+def _store_local(cache_key, value):
+    '''Store a value in the process tier'''
+    _local.set(cache_key, value, get_ttl(), getattr(settings, 'USER_CACHE_SIZE', DEFAULT_SIZE))
+
+
+def shared_cache():
+    '''Return the shared cache tier, or None if it is disabled'''
+    alias = getattr(settings, 'USER_CACHE_SHARED_ALIAS', None)
+    return caches[alias] if alias else None
+
+
+@contextmanager
+def request_scope():
+    '''Give the code inside its own identity map'''
+    token = _identity_map.set({})
+    try:
+        yield
+    finally:
+        _identity_map.reset(token)
+
+
+def cached_field_names():
+    '''Return the user columns kept in the cache'''
+    return [
+        field.attname for field in get_user_model()._meta.concrete_fields
+        if field.name not in EXCLUDED_FIELDS
+    ]
+
+
+def _user_key(user_id):
+    '''Return the cache key of a user'''
+    return f'{KEY_PREFIX}:user:{user_id}'
+
+
+def _token_key(key):
+    '''Return the cache key of a token, without the token itself'''
+    return f'{KEY_PREFIX}:token:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def _lookup(cache_key, load):
+    '''Return a value from the process or shared tier, else load and store it'''
+    ttl = get_ttl()
+    if ttl <= 0:
+        return load()
+
+    value = _local.get(cache_key)
+    if value is not None:
+        _count('local_hits')
+        return value
+
+    shared = shared_cache()
+    if shared is not None:
+        value = shared.get(cache_key)
+        if value is not None:
+            _count('shared_hits')
+            _store_local(cache_key, value)
+            return value
+
+    _count('misses')
+    value = load()
+    if value is not None:
+        _store_local(cache_key, value)
+        if shared is not None:
+            shared.set(cache_key, value, ttl)
+    return value
+
+
+def get_user(user_id):
+    '''Return the user with the given id, or None if there is none'''
+    identity_map = _identity_map.get()
+    if identity_map is not None and user_id in identity_map:
+        _count('request_hits')
+        return identity_map[user_id]
+
+    User = get_user_model()
+    names = cached_field_names()
+    values = _lookup(
+        _user_key(user_id),
+        lambda: User.objects.filter(pk=user_id).values_list(*names).first(),
+    )
+    if values is None:
+        return None
+    user = User.from_db(router.db_for_read(User), names, values)
+    if identity_map is not None:
+        identity_map[user_id] = user
+    return user
+
+
+def get_token_user_id(key):
+    '''Return the id of the user owning an API token, or None'''
+    from rest_framework.authtoken.models import Token
+
+    return _lookup(
+        _token_key(key),
+        lambda: Token.objects.filter(key=key).values_list('user_id', flat=True).first(),
+    )
+
+
+def invalidate_user(user_id):
+    '''Forget a user in every tier this process can reach'''
+    key = _user_key(user_id)
+    _local.delete(key)
+    shared = shared_cache()
+    if shared is not None:
+        shared.delete(key)
+    identity_map = _identity_map.get()
+    if identity_map is not None:
+        identity_map.pop(user_id, None)
+
+
+def invalidate_token(key):
+    '''Forget the owner of an API token'''
+    cache_key = _token_key(key)
+    _local.delete(cache_key)
+    shared = shared_cache()
+    if shared is not None:
+        shared.delete(cache_key)
@@ -0,0 +1,151 @@
+import logging
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse
+from django.shortcuts import render
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from django.utils.module_loading import import_string
+from django.views import View
+from django.views.decorators.cache import never_cache
+
+from core import health, profiling, schema
+
+# Constants
+DEFAULT_HEALTH_CHECK_TIMEOUT = 2.0
+
+logger = logging.getLogger(__name__)
+
+
+def lazy_view(dotted_path, **initkwargs):
+    '''Return a view that imports its class-based view on first use
+
+    Meant for DRF views, which are CSRF exempt themselves.
+    '''
+    view = None
+
+    def wrapper(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = import_string(dotted_path).as_view(**initkwargs)
+        return view(request, *args, **kwargs)
+
+    wrapper.csrf_exempt = True # type: ignore
+    return wrapper
+
+
+def strip_weak(etag):
+    '''Return an entity tag without its weak indicator'''
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def etag_matches(etag, header):
+    '''Return True if an If-None-Match header lists etag
+
+    The comparison is weak, as RFC 9110 requires for If-None-Match, so the
+    W/ tag CompressionMiddleware gives compressed responses still matches.
+    '''
+    tags = parse_etags(header)
+    return '*' in tags or strip_weak(etag) in {strip_weak(tag) for tag in tags}
+
+
+class PrecomputedSchemaView(View):
+    '''Serve the OpenAPI schema built by "manage.py build_schema"
+
+    Falls back to generating it with drf_spectacular when the artifact has
+    not been built, once for concurrent requests, see core.coalescing.
+    '''
+    fallback = staticmethod(lazy_view('core.schema_views.CoalescedSchemaView'))
+
+    def get_format(self, request):
+        '''Return the requested format, YAML unless JSON is asked for'''
+        if request.GET.get('format') == 'json':
+            return 'json'
+        if 'json' in request.headers.get('Accept', ''):
+            return 'json'
+        return 'yaml'
+
+    def get(self, request, *args, **kwargs):
+        '''Return the schema artifact'''
+        fmt = self.get_format(request)
+        artifact = schema.load_artifact(fmt)
+        if artifact is None:
+            return self.fallback(request, *args, **kwargs)
+
+        content, etag = artifact
+        if etag_matches(etag, request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type=schema.FORMATS[fmt][1])
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Accept',))
+        return response
+
+
+@never_cache
+def liveness(request):
+    '''Return 200 while the process can serve requests'''
+    return JsonResponse({'status': 'ok'})
+
+
+@never_cache
+def readiness(request):
+    '''Return 200 when every database answers, 503 otherwise
+
+    The endpoint is public, so errors are logged rather than returned.
+    '''
+    timeout = getattr(settings, 'HEALTH_CHECK_TIMEOUT', DEFAULT_HEALTH_CHECK_TIMEOUT)
+    errors = health.probe_databases(timeout=timeout)
+    for alias, error in errors.items():
+        if error:
+            logger.warning('Database %s unavailable: %s', alias, error)
+    ready = not any(errors.values())
+    return JsonResponse(
+        {
+            'status': 'ok' if ready else 'unavailable',
+            'databases': {alias: 'unavailable' if error else 'ok' for alias, error in errors.items()},
+        },
+        status=200 if ready else 503,
+    )
+
+
+@staff_member_required
+def profile_list(request):
+    '''List the stored request profiles'''
+    return render(request, 'core/profile_list.html', {
+        **admin.site.each_context(request),
+        'title': 'Request profiles',
+        'profiles': profiling.get_profiles(),
+    })
+
+
+@staff_member_required
+def profile_detail(request, profile_id):
+    '''Show one request profile'''
+    record = profiling.get_profile(profile_id)
+    if record is None:
+        raise Http404('Profile not found')
+    total_samples = sum(record['categories'].values())
+    return render(request, 'core/profile_detail.html', {
+        **admin.site.each_context(request),
+        'title': f'Profile {profile_id}: {record["method"]} {record["path"]}',
+        'profile': record,
+        'categories': [
+            (name, count, count * 100 / total_samples)
+            for name, count in sorted(record['categories'].items(), key=lambda item: -item[1])
+        ],
+        'top_stacks': sorted(record['stacks'].items(), key=lambda item: -item[1])[:20],
+    })
+
+
+@staff_member_required
+def profile_collapsed(request, profile_id):
+    '''Export the stack samples of a profile as collapsed stack text'''
+    record = profiling.get_profile(profile_id)
+    if record is None:
+        raise Http404('Profile not found')
+    response = HttpResponse(profiling.collapsed_stacks(record), content_type='text/plain')
+    response['Content-Disposition'] = f'attachment; filename="profile-{profile_id}.folded"'
+    return response
@@ -0,0 +1,12 @@
+from rest_framework import serializers
+
+from account.serializers import AccountSerializer
+from moneyrequest.serializers import MoneyRequestSerializer
+from user.serializers import UserSerializer
+
+
+class HomeSerializer(serializers.Serializer):
+    '''Serializer for everything the first screen of the app shows'''
+    profile = UserSerializer()
+    accounts = AccountSerializer(many=True)
+    moneyrequests = MoneyRequestSerializer(many=True)
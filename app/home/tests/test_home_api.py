@@ -0,0 +1,74 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import usercache
+from core.tests import factories
+
+HOME_URL = reverse('home:home')
+PROFILE_URL = reverse('user:profile')
+ACCOUNTS_URL = reverse('account:account-list')
+MONEYREQUESTS_URL = reverse('moneyrequest:moneyrequest-list')
+
+
+def create_user(**params):
+    '''Helper function to create a user'''
+    return get_user_model().objects.create_user(**params) # type: ignore
+
+
+class PublicHomeApiTests(TestCase):
+    '''Test unauthenticated home requests'''
+    def test_auth_required(self):
+        '''Test auth is required for the home screen'''
+        res = APIClient().get(HOME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateHomeApiTests(TestCase):
+    '''Test the home screen endpoint'''
+    def setUp(self):
+        '''Set up the test environment'''
+        usercache.reset()
+        self.addCleanup(usercache.reset)
+        self.user = create_user(email='user@testing.com', password='testing*123', name='Tester')
+        self.client = APIClient()
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        factories.create_accounts([self.user, self.user], balance=Decimal('10.00'))
+        factories.create_moneyrequests([self.user], 15)
+        other = create_user(email='other@testing.com', password='testing*123')
+        factories.create_accounts([other])
+        factories.create_moneyrequests([other], 3)
+
+    def test_matches_separate_calls(self):
+        '''Test that home returns what the three separate endpoints return'''
+        res = self.client.get(HOME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['profile'], self.client.get(PROFILE_URL).data) # type: ignore
+        self.assertEqual(res.data['accounts'], self.client.get(ACCOUNTS_URL).data) # type: ignore
+        self.assertEqual(
+            res.data['moneyrequests'], # type: ignore
+            self.client.get(MONEYREQUESTS_URL).data[:10], # type: ignore
+        )
+
+    def test_limit(self):
+        '''Test that ?limit= picks how many money requests are returned'''
+        res = self.client.get(HOME_URL, {'limit': 3})
+
+        self.assertEqual(len(res.data['moneyrequests']), 3) # type: ignore
+
+    @override_settings(USER_CACHE_TTL=30)
+    def test_fixed_query_count(self):
+        '''Test that a warm home request runs one query per list'''
+        self.client.get(HOME_URL)
+
+        with self.assertNumQueries(2):
+            self.client.get(HOME_URL)
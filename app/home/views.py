@@ -0,0 +1,50 @@
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.authentication import CachedTokenAuthentication
+from core.models import Account, MoneyRequest
+from core.sharding import ShardRoutingMixin
+from home import serializers
+
+# Constants
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+# Create your views here.
+class HomeView(ShardRoutingMixin, APIView):
+    '''Profile, accounts and latest money requests in one round trip'''
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_limit(self):
+        '''Return how many money requests to include, from ?limit='''
+        try:
+            limit = int(self.request.query_params.get('limit', DEFAULT_LIMIT))
+        except ValueError:
+            limit = DEFAULT_LIMIT
+        return max(1, min(limit, MAX_LIMIT))
+
+    @extend_schema(
+        parameters=[OpenApiParameter('limit', OpenApiTypes.INT, description='Money requests')],
+        responses=serializers.HomeSerializer,
+    )
+    def get(self, request):
+        '''Return the profile, accounts and latest money requests in two queries'''
+        # The user cache usually authenticates without a query
+        user = request.user
+        data = {
+            'profile': user,
+            'accounts': Account.objects.filter(user=user).order_by('-id'),
+            'moneyrequests': (
+                MoneyRequest.objects
+                .filter(borrower=user)
+                .only('id', 'title', 'amount', 'frequency', 'term')
+                .order_by('-id')[:self.get_limit()]
+            ),
+        }
+        return Response(serializers.HomeSerializer(data).data)
@@ -1,10 +1,44 @@
+from decimal import Decimal
+
+from django.utils.translation import gettext as _
+
 from rest_framework import serializers
 
-from core.models import MoneyRequest
+from core.fields import MoneySerializerField
+from core.models import Account, MoneyRequest, SavedSearch
+from user.serializers import UserNameSerializer, UserSummarySerializer
+
+# Constants
+EXPANDABLE_FIELDS = ['borrower', 'lender']
+MARKETPLACE_DEFAULT_LIMIT = 50
+MARKETPLACE_MAX_LIMIT = 500
+
+
+class DynamicFieldsMixin:
+    '''Trim and expand serializer fields from the "fields" and "expand" context
 
+    "fields" keeps only the named fields, unknown names are ignored and
+    all fields are kept when none is known. "expand" replaces the named
+    user foreign keys with a nested summary of the user.
+    '''
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        context = self.context
 
-class MoneyRequestSerializer(serializers.ModelSerializer):
+        for name in context.get('expand', ()):
+            self.fields[name] = UserSummarySerializer(read_only=True) # type: ignore
+
+        fields = set(context.get('fields') or ()) & set(self.fields) # type: ignore
+        if fields:
+            for name in set(self.fields) - fields: # type: ignore
+                self.fields.pop(name) # type: ignore
+
+
+class MoneyRequestSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     '''Serializer for the money request object'''
+    # Mirrors the amount check constraint so bad input is a 400
+    amount = MoneySerializerField(min_value=Decimal('0.01'))
+
     class Meta:
         '''Meta class for the money request serializer'''
         model = MoneyRequest
@@ -16,11 +50,130 @@ class MoneyRequestSerializer(serializers.ModelSerializer):
             'term'
         ]
         read_only_fields = ['id']
+        # Mirror the database check constraints so bad input is a 400
+        extra_kwargs = {
+            'term': {'min_value': 1},
+        }
 
 
 class MoneyRequestDetailSerializer(MoneyRequestSerializer):
     '''Serializer for the money request detail object'''
     class Meta(MoneyRequestSerializer.Meta):
         '''Meta class for the money request detail serializer'''
-        fields = MoneyRequestSerializer.Meta.fields + ['borrower', 'lender', 'description']
-        read_only_fields = MoneyRequestSerializer.Meta.read_only_fields + ['borrower', 'lender']
\ No newline at end of file
+        fields = MoneyRequestSerializer.Meta.fields + [
+            'borrower',
+            'lender',
+            'description',
+            'status',
+            'closed_at',
+            'version',
+        ]
+        read_only_fields = MoneyRequestSerializer.Meta.read_only_fields + [
+            'borrower',
+            'lender',
+            'status',
+            'closed_at',
+            'version',
+        ]
+
+
+class FundedMoneyRequestSerializer(MoneyRequestSerializer):
+    '''Serializer for a money request funded by the lender'''
+    borrower = UserSummarySerializer(read_only=True)
+
+    class Meta(MoneyRequestSerializer.Meta):
+        '''Meta class for the funded money request serializer'''
+        fields = MoneyRequestSerializer.Meta.fields + ['borrower', 'status', 'closed_at']
+        read_only_fields = fields
+
+
+class MarketplaceMoneyRequestSerializer(MoneyRequestSerializer):
+    '''Serializer for an open money request in the marketplace'''
+    # Every lender sees these, so no email address
+    borrower = UserNameSerializer(read_only=True)
+
+    class Meta(MoneyRequestSerializer.Meta):
+        '''Meta class for the marketplace money request serializer'''
+        fields = MoneyRequestSerializer.Meta.fields + ['borrower']
+        read_only_fields = fields
+
+
+class MarketplaceFilterSerializer(serializers.Serializer):
+    '''Serializer for the marketplace query parameters'''
+    term = serializers.IntegerField(required=False, min_value=1)
+    min_amount = MoneySerializerField(required=False)
+    max_amount = MoneySerializerField(required=False)
+    limit = serializers.IntegerField(
+        required=False, default=MARKETPLACE_DEFAULT_LIMIT, min_value=1, max_value=MARKETPLACE_MAX_LIMIT,
+    )
+
+
+class BorrowerSummarySerializer(serializers.Serializer):
+    '''Serializer for what a lender has funded one borrower'''
+    id = serializers.IntegerField(source='borrower')
+    email = serializers.EmailField(source='borrower__email')
+    name = serializers.CharField(source='borrower__name')
+    count = serializers.IntegerField()
+    total_amount = MoneySerializerField()
+
+
+class LenderAccountSerializer(serializers.ModelSerializer):
+    '''Serializer for a lender account balance'''
+    balance = MoneySerializerField(read_only=True)
+
+    class Meta:
+        '''Meta class for the lender account serializer'''
+        model = Account
+        fields = ['id', 'type', 'balance', 'risk_appetite']
+        read_only_fields = fields
+
+
+class LenderTotalsSerializer(serializers.Serializer):
+    '''Serializer for the totals of everything a lender has funded'''
+    count = serializers.IntegerField()
+    funded_count = serializers.IntegerField()
+    total_amount = MoneySerializerField()
+    outstanding_principal = MoneySerializerField()
+
+
+class LenderDashboardSerializer(serializers.Serializer):
+    '''Serializer for the lender dashboard'''
+    totals = LenderTotalsSerializer()
+    accounts = LenderAccountSerializer(many=True)
+    borrowers = BorrowerSummarySerializer(many=True)
+    moneyrequests = FundedMoneyRequestSerializer(many=True)
+
+
+class SavedSearchSerializer(serializers.ModelSerializer):
+    '''Serializer for a lender's saved search'''
+    min_amount = MoneySerializerField(required=False, allow_null=True, min_value=Decimal('0.01'))
+    max_amount = MoneySerializerField(required=False, allow_null=True, min_value=Decimal('0.01'))
+
+    class Meta:
+        '''Meta class for the saved search serializer'''
+        model = SavedSearch
+        fields = [
+            'id',
+            'name',
+            'min_amount',
+            'max_amount',
+            'min_term',
+            'max_term',
+            'frequency',
+            'created_at',
+        ]
+        read_only_fields = ['id', 'created_at']
+        extra_kwargs = {
+            'min_term': {'min_value': 1},
+            'max_term': {'min_value': 1},
+        }
+
+    def validate(self, attrs):
+        '''Check that each range has its lower bound first'''
+        for low, high in (('min_amount', 'max_amount'), ('min_term', 'max_term')):
+            low_value = attrs.get(low, getattr(self.instance, low, None))
+            high_value = attrs.get(high, getattr(self.instance, high, None))
+            if low_value is not None and high_value is not None and low_value > high_value:
+                msg = _('%(low)s must not be greater than %(high)s') % {'low': low, 'high': high}
+                raise serializers.ValidationError({low: msg}, code='invalid')
+        return attrs
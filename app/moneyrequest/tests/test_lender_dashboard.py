@@ -0,0 +1,113 @@
+from contextlib import ExitStack
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import sharding
+from core.tests import factories
+
+DASHBOARD_URL = reverse('moneyrequest:lender-dashboard')
+SHARDS = ['default', 'shard1', 'shard2']
+
+
+def create_user(**params):
+    '''Helper function to create a user'''
+    return get_user_model().objects.create_user(**params) # type: ignore
+
+
+class PublicLenderDashboardTests(TestCase):
+    '''Test unauthenticated lender dashboard requests'''
+    def test_auth_required(self):
+        '''Test auth is required to view the dashboard'''
+        res = APIClient().get(DASHBOARD_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class LenderDashboardTests(TestCase):
+    '''Test the lender dashboard'''
+    databases = set(SHARDS)
+
+    def setUp(self):
+        '''Set up the test environment'''
+        self.client = APIClient()
+        self.lender = create_user(email='lender@testing.com', password='testing*123')
+        self.client.force_authenticate(self.lender)
+        self.borrowers = factories.create_users(3, prefix='borrower')
+        factories.create_accounts([self.lender], type='LENDER', balance=Decimal('500.00'))
+
+    def test_empty_dashboard(self):
+        '''Test a user who funded nothing gets empty lists and zero totals'''
+        res = self.client.get(DASHBOARD_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['totals']['count'], 0) # type: ignore
+        self.assertEqual(res.data['totals']['total_amount'], '0.00') # type: ignore
+        self.assertEqual(res.data['moneyrequests'], []) # type: ignore
+        self.assertEqual(res.data['accounts'][0]['balance'], '500.00') # type: ignore
+
+    def test_dashboard_contents(self):
+        '''Test totals, borrower summaries and requests of the lender only'''
+        factories.create_moneyrequests(
+            self.borrowers[:2], 4, lender=self.lender, status='FUNDED', amount=Decimal('100.00'),
+        )
+        factories.create_moneyrequests(
+            self.borrowers[:1], 1, lender=self.lender, status='CLOSED', amount=Decimal('50.00'),
+        )
+        factories.create_moneyrequests(self.borrowers, 3)
+
+        res = self.client.get(DASHBOARD_URL)
+
+        totals = res.data['totals'] # type: ignore
+        self.assertEqual(totals['count'], 5)
+        self.assertEqual(totals['funded_count'], 4)
+        self.assertEqual(totals['total_amount'], '450.00')
+        self.assertEqual(totals['outstanding_principal'], '400.00')
+        borrowers = res.data['borrowers'] # type: ignore
+        self.assertEqual(
+            [(row['email'], row['count'], row['total_amount']) for row in borrowers],
+            [(self.borrowers[0].email, 3, '250.00'), (self.borrowers[1].email, 2, '200.00')],
+        )
+        moneyrequests = res.data['moneyrequests'] # type: ignore
+        self.assertEqual(len(moneyrequests), 5)
+        self.assertEqual(moneyrequests[0]['status'], 'CLOSED')
+        self.assertEqual(moneyrequests[0]['borrower']['email'], self.borrowers[0].email)
+
+    def test_limit(self):
+        '''Test that ?limit= caps the listed requests but not the totals'''
+        factories.create_moneyrequests(self.borrowers, 5, lender=self.lender, status='FUNDED')
+
+        res = self.client.get(DASHBOARD_URL, {'limit': 2})
+
+        self.assertEqual(len(res.data['moneyrequests']), 2) # type: ignore
+        self.assertEqual(res.data['totals']['count'], 5) # type: ignore
+
+    def test_constant_query_count(self):
+        '''Test the query count on every shard does not grow with 10k funded requests'''
+        borrowers = factories.create_users(500, prefix='many')
+        factories.create_moneyrequests(borrowers, 10_000, lender=self.lender, status='FUNDED')
+        sharding.reset()
+        self.addCleanup(sharding.reset)
+
+        with self.settings(SHARDS=SHARDS), ExitStack() as stack:
+            sharding.assign(self.lender.pk, 'default')
+            queries = {alias: stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in SHARDS}
+            res = self.client.get(DASHBOARD_URL)
+
+        # Three per shard, plus the shard map and the accounts of the lender
+        self.assertEqual({alias: len(captured) for alias, captured in queries.items()}, {
+            'default': 5,
+            'shard1': 3,
+            'shard2': 3,
+        })
+
+        self.assertEqual(res.data['totals']['count'], 10_000) # type: ignore
+        self.assertEqual(len(res.data['moneyrequests']), 100) # type: ignore
+        self.assertEqual(len(res.data['borrowers']), 100) # type: ignore
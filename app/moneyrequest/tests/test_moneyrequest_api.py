@@ -1,12 +1,20 @@
 from decimal import Decimal
+
+import msgpack
+
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import MoneyRequest
+from core import archive
+from core.models import ArchivedMoneyRequest, MoneyRequest
+from core.money import Money
 
 from moneyrequest.serializers import (
     MoneyRequestSerializer,
@@ -83,6 +91,19 @@ class PrivateMoneyRequestApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data) # type: ignore
 
+    def test_retrieve_moneyrequests_msgpack(self):
+        '''Test retrieving money requests rendered as MessagePack'''
+        create_moneyrequest(borrower=self.borrower)
+
+        res = self.client.get(
+            reverse(MONEYREQUEST_URL),
+            HTTP_ACCEPT='application/msgpack',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(res.content), res.data) # type: ignore
+
     def test_moneyrequests_limited_to_user(self):
         '''Test that money requests are limited to the authenticated user'''
         borrower2 = create_borrower(
@@ -111,6 +132,65 @@ class PrivateMoneyRequestApiTests(TestCase):
         serializer = MoneyRequestDetailSerializer(moneyrequest)
         self.assertEqual(res.data, serializer.data) # type: ignore
 
+    def test_sparse_fields(self):
+        '''Test that ?fields= trims the output and the selected columns'''
+        create_moneyrequest(borrower=self.borrower)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(reverse(MONEYREQUEST_URL), {'fields': 'id,amount'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(res.data[0]), {'id', 'amount'}) # type: ignore
+        sql = queries.captured_queries[-1]['sql']
+        self.assertIn('"amount"', sql)
+        self.assertNotIn('"title"', sql)
+
+    def test_unknown_fields_ignored(self):
+        '''Test that unknown ?fields= names are ignored, leaving all fields if none is known'''
+        create_moneyrequest(borrower=self.borrower)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(reverse(MONEYREQUEST_URL), {'fields': 'bogus'})
+        trimmed = self.client.get(reverse(MONEYREQUEST_URL), {'fields': 'id,bogus'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(res.data[0]), set(MoneyRequestSerializer.Meta.fields)) # type: ignore
+        self.assertEqual(set(trimmed.data[0]), {'id'}) # type: ignore
+
+    def test_expand_users(self):
+        '''Test that ?expand= inlines users with a single query'''
+        lender = create_lender(
+            email='lender@testing.com',
+            password='testing*123',
+            name='Lender',
+        )
+        for _ in range(3):
+            create_moneyrequest(borrower=self.borrower, lender=lender)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(
+                reverse(MONEYREQUEST_URL),
+                {'fields': 'id,borrower,lender', 'expand': 'borrower,lender'},
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 3) # type: ignore
+        self.assertEqual(res.data[0]['lender'], { # type: ignore
+            'id': lender.id,
+            'email': lender.email,
+            'name': lender.name,
+        })
+        self.assertEqual(res.data[0]['borrower']['email'], self.borrower.email) # type: ignore
+
+    def test_expand_detail(self):
+        '''Test expanding the borrower on the detail endpoint'''
+        moneyrequest = create_moneyrequest(borrower=self.borrower)
+
+        res = self.client.get(detail_url(moneyrequest.id), {'expand': 'borrower'}) # type: ignore
+
+        self.assertEqual(res.data['borrower']['id'], self.borrower.id) # type: ignore
+        self.assertIsNone(res.data['lender']) # type: ignore
+
     def test_create_basic_moneyrequest(self):
         '''Test creating a money request'''
         payload = {
@@ -124,10 +204,24 @@ class PrivateMoneyRequestApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
         moneyrequest = MoneyRequest.objects.get(id=res.data['id']) # type: ignore
+        self.assertEqual(moneyrequest.amount, Money(payload.pop('amount')))
         for k,v in payload.items():
             self.assertEqual(getattr(moneyrequest, k), v)
         self.assertEqual(moneyrequest.borrower, self.borrower)
 
+    def test_create_moneyrequest_invalid_amount(self):
+        '''Test creating a money request with a non positive amount fails'''
+        payload = {
+            'title': 'Test title',
+            'amount': Decimal('0.00'),
+            'frequency': 'WEEKLY',
+            'term': 7,
+        }
+        res = self.client.post(reverse(MONEYREQUEST_URL), payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(MoneyRequest.objects.count(), 0)
+
     def test_partial_update_moneyrequest(self):
         '''Test updating a money request with patch'''
         moneyrequest = create_moneyrequest(borrower=self.borrower)
@@ -140,10 +234,27 @@ class PrivateMoneyRequestApiTests(TestCase):
         moneyrequest.refresh_from_db()
         self.assertEqual(moneyrequest.title, payload['title'])
         self.assertEqual(moneyrequest.borrower, self.borrower)
-        self.assertEqual(moneyrequest.amount, Decimal('777.77'))
+        self.assertEqual(moneyrequest.amount, Money('777.77'))
         self.assertEqual(moneyrequest.frequency, 'WEEKLY')
         self.assertEqual(moneyrequest.term, 7)
 
+    def test_update_with_if_match(self):
+        '''Test that a stale If-Match is rejected and a fresh one accepted'''
+        moneyrequest = create_moneyrequest(borrower=self.borrower)
+        url = detail_url(moneyrequest.id) # type: ignore
+
+        etag = self.client.get(url)['ETag']
+        res = self.client.patch(url, {'title': 'First'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+        res = self.client.patch(url, {'term': 12}, HTTP_IF_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        moneyrequest.refresh_from_db()
+        self.assertEqual(moneyrequest.title, 'First')
+        self.assertEqual(moneyrequest.term, 7)
+
     def test_full_update_moneyrequest(self):
         '''Test updating a money request with put'''
         moneyrequest = create_moneyrequest(borrower=self.borrower)
@@ -160,6 +271,7 @@ class PrivateMoneyRequestApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         moneyrequest.refresh_from_db()
+        self.assertEqual(moneyrequest.amount, Money(payload.pop('amount')))
         for k,v in payload.items():
             self.assertEqual(getattr(moneyrequest, k), v)
         self.assertEqual(moneyrequest.borrower, self.borrower)
@@ -202,4 +314,44 @@ class PrivateMoneyRequestApiTests(TestCase):
         res = self.client.delete(url)
 
         self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
-        self.assertEqual(MoneyRequest.objects.count(), 1)
\ No newline at end of file
+        self.assertEqual(MoneyRequest.objects.count(), 1)
+
+    def test_view_archived_moneyrequest(self):
+        '''Test that an archived money request is still readable'''
+        moneyrequest = create_moneyrequest(borrower=self.borrower)
+        moneyrequest.close()
+        expected = MoneyRequestDetailSerializer(moneyrequest).data
+        archive.archive_closed(before=timezone.now())
+
+        res = self.client.get(detail_url(moneyrequest.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, expected)
+        self.assertEqual(res['ETag'], f'"{moneyrequest.version}"')
+        self.assertFalse(MoneyRequest.objects.exists())
+
+    def test_archived_moneyrequest_read_only(self):
+        '''Test that archived money requests are not listed or changed'''
+        moneyrequest = create_moneyrequest(borrower=self.borrower)
+        moneyrequest.close()
+        archive.archive_closed(before=timezone.now())
+
+        res = self.client.get(reverse(MONEYREQUEST_URL))
+        self.assertEqual(res.data, [])
+        res = self.client.patch(detail_url(moneyrequest.id), {'title': 'New title'})
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(ArchivedMoneyRequest.objects.get().title, 'Test title')
+
+    def test_view_other_archived_moneyrequest(self):
+        '''Test that another user's archived money request is not found'''
+        new_borrower = create_borrower(
+            email='newborrower@borrow.com',
+            password='borrow*123',
+        )
+        moneyrequest = create_moneyrequest(borrower=new_borrower)
+        moneyrequest.close()
+        archive.archive_closed(before=timezone.now())
+
+        res = self.client.get(detail_url(moneyrequest.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,87 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import SavedSearch
+from core.money import Money
+
+SEARCH_URL = reverse('moneyrequest:savedsearch-list')
+
+
+def detail_url(search_id):
+    '''Return saved search detail URL'''
+    return reverse('moneyrequest:savedsearch-detail', args=[search_id])
+
+
+def create_user(**params):
+    '''Helper function to create a user'''
+    return get_user_model().objects.create_user(**params) # type: ignore
+
+
+class PublicSavedSearchApiTests(TestCase):
+    '''Test the public saved search API'''
+    def setUp(self):
+        '''Set up the test environment'''
+        self.client = APIClient()
+
+    def test_auth_required(self):
+        '''Test that authentication is required'''
+        res = self.client.get(SEARCH_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateSavedSearchApiTests(TestCase):
+    '''Test the private saved search API'''
+    def setUp(self):
+        '''Set up the test environment'''
+        self.client = APIClient()
+        self.user = create_user(email='lender@testing.com', password='testing*123')
+        self.client.force_authenticate(self.user)
+
+    def test_create_search(self):
+        '''Test creating a saved search owned by the authenticated user'''
+        payload = {'name': 'Weekly', 'min_amount': '100.00', 'max_amount': '500.00', 'frequency': 'WEEKLY'}
+
+        res = self.client.post(SEARCH_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        search = SavedSearch.objects.get(id=res.data['id']) # type: ignore
+        self.assertEqual(search.owner, self.user)
+        self.assertEqual(search.min_amount, Money('100.00'))
+        self.assertIsNone(search.max_term)
+        self.assertEqual(res.data['max_amount'], '500.00') # type: ignore
+
+    def test_inverted_range_rejected(self):
+        '''Test a range with its lower bound above the upper one is rejected'''
+        res = self.client.post(SEARCH_URL, {'name': 'Bad', 'min_term': 10, 'max_term': 5})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('min_term', res.data) # type: ignore
+
+    def test_partial_update_checks_stored_bound(self):
+        '''Test a partial update is checked against the bound it leaves unchanged'''
+        search = SavedSearch.objects.create(owner=self.user, name='Search', max_amount=Decimal('50.00'))
+
+        res = self.client.patch(detail_url(search.id), {'min_amount': '60.00'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('min_amount', res.data) # type: ignore
+
+    def test_searches_limited_to_user(self):
+        '''Test that users only list and change their own saved searches'''
+        other = create_user(email='other@testing.com', password='testing*123')
+        other_search = SavedSearch.objects.create(owner=other, name='Other')
+        SavedSearch.objects.create(owner=self.user, name='Mine')
+
+        res = self.client.get(SEARCH_URL)
+        delete = self.client.delete(detail_url(other_search.id))
+
+        self.assertEqual([search['name'] for search in res.data], ['Mine']) # type: ignore
+        self.assertEqual(delete.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(SavedSearch.objects.filter(id=other_search.id).exists())
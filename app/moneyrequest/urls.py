@@ -7,9 +7,12 @@ from moneyrequest import views
 
 router = DefaultRouter()
 router.register('moneyrequests', views.MoneyRequestViewSet)
+router.register('searches', views.SavedSearchViewSet)
 
 app_name = 'moneyrequest'
 
 urlpatterns = [
+    path('lender/dashboard/', views.LenderDashboardView.as_view(), name='lender-dashboard'),
+    path('marketplace/', views.MarketplaceView.as_view(), name='marketplace'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,21 +1,101 @@
+import heapq
+import itertools
+
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema
 from rest_framework import viewsets
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from core.models import MoneyRequest
+from core import audit, sharding
+from core.authentication import CachedTokenAuthentication
+from core.coalescing import coalesce
+from core.concurrency import ConditionalUpdateMixin
+from core.fields import MoneyField
+from core.models import Account, ArchivedMoneyRequest, MoneyRequest, SavedSearch
+from core.sharding import ShardRoutingMixin
 from moneyrequest import serializers
 
+# Constants
+DASHBOARD_DEFAULT_LIMIT = 100
+DASHBOARD_MAX_LIMIT = 1000
+
 # Create your views here.
-class MoneyRequestViewSet(viewsets.ModelViewSet):
+class MoneyRequestViewSet(ShardRoutingMixin, ConditionalUpdateMixin, viewsets.ModelViewSet):
     '''Manage money requests in the database'''
     serializer_class = serializers.MoneyRequestDetailSerializer
     queryset = MoneyRequest.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
+    def _params_to_list(self, name):
+        '''Return a comma separated query param as a list'''
+        value = self.request.query_params.get(name, '')
+        return [item.strip() for item in value.split(',') if item.strip()]
+
+    def get_fields(self):
+        '''Return the known fields requested with ?fields=, only for reads'''
+        if self.request.method not in SAFE_METHODS:
+            return []
+        known = set(self.get_serializer_class().Meta.fields)
+        known.update(name for name in self._params_to_list('expand') if name in serializers.EXPANDABLE_FIELDS)
+        return [name for name in self._params_to_list('fields') if name in known]
+
+    def get_expand(self):
+        '''Return the user fields requested with ?expand=, only for reads'''
+        if self.request.method not in SAFE_METHODS:
+            return []
+        fields = self.get_fields()
+        return [
+            name for name in self._params_to_list('expand')
+            if name in serializers.EXPANDABLE_FIELDS and (not fields or name in fields)
+        ]
+
     def get_queryset(self):
         '''Return objects for the current authenticated user only'''
-        return self.queryset.filter(borrower=self.request.user).order_by('-id')
+        queryset = self.queryset.filter(borrower=self.request.user).order_by('-id')
+
+        expand = self.get_expand()
+        if expand:
+            queryset = queryset.select_related(*expand)
+
+        fields = self.get_fields()
+        if fields:
+            model_fields = {f.name for f in MoneyRequest._meta.concrete_fields}
+            only = ['id', 'version'] + [name for name in fields if name in model_fields]
+            for name in expand:
+                only += [name, f'{name}__id', f'{name}__email', f'{name}__name']
+            queryset = queryset.only(*only)
+
+        return queryset
+
+    def get_object(self):
+        '''Return the money request, looking in the archive for reads'''
+        try:
+            return super().get_object()
+        except Http404:
+            if self.action != 'retrieve':
+                raise
+        queryset = ArchivedMoneyRequest.objects.filter(borrower=self.request.user)
+        expand = self.get_expand()
+        if expand:
+            queryset = queryset.select_related(*expand)
+        instance = get_object_or_404(queryset, pk=self.kwargs[self.lookup_field])
+        self.check_object_permissions(self.request, instance)
+        self._etag_instance = instance
+        return instance
+
+    def get_serializer_context(self):
+        '''Pass the requested fields and expansions to the serializer'''
+        context = super().get_serializer_context()
+        context['fields'] = self.get_fields()
+        context['expand'] = self.get_expand()
+        return context
 
     def get_serializer_class(self):
         '''Return appropriate serializer class'''
@@ -27,4 +107,154 @@ class MoneyRequestViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         '''Create a new money request'''
-        serializer.save(borrower=self.request.user)
\ No newline at end of file
+        serializer.save(borrower=self.request.user)
+        audit.record_create(self.request.user, serializer.instance)
+
+    def perform_update(self, serializer):
+        '''Update a money request, recording the fields that changed'''
+        before = audit.snapshot(serializer.instance)
+        super().perform_update(serializer)
+        audit.record_update(self.request.user, serializer.instance, before)
+
+    def perform_destroy(self, instance):
+        '''Delete a money request, recording what it was'''
+        before = audit.snapshot(instance)
+        super().perform_destroy(instance)
+        audit.record_delete(self.request.user, instance, before)
+
+
+class SavedSearchViewSet(viewsets.ModelViewSet):
+    '''Manage the saved searches new money requests are matched against'''
+    serializer_class = serializers.SavedSearchSerializer
+    queryset = SavedSearch.objects.all()
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        '''Return the saved searches of the current authenticated user only'''
+        return self.queryset.filter(owner=self.request.user).order_by('-id')
+
+    def perform_create(self, serializer):
+        '''Create a new saved search'''
+        serializer.save(owner=self.request.user)
+
+
+class LenderDashboardView(APIView):
+    '''What the authenticated user has funded, in a fixed number of queries'''
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_limit(self):
+        '''Return how many requests and borrowers to list, from ?limit='''
+        try:
+            limit = int(self.request.query_params.get('limit', DASHBOARD_DEFAULT_LIMIT))
+        except ValueError:
+            limit = DASHBOARD_DEFAULT_LIMIT
+        return max(1, min(limit, DASHBOARD_MAX_LIMIT))
+
+    def funded_on(self, alias, limit):
+        '''Return the totals, top borrowers and latest requests the user funded on a shard'''
+        funded = MoneyRequest.objects.using(alias).filter(lender=self.request.user)
+        totals = funded.aggregate(
+            count=Count('id'),
+            funded_count=Count('id', filter=Q(status='FUNDED')),
+            total_amount=Coalesce(Sum('amount'), 0, output_field=MoneyField()),
+            outstanding_principal=Coalesce(
+                Sum('amount', filter=Q(status='FUNDED')), 0, output_field=MoneyField(),
+            ),
+        )
+        borrowers = list(
+            funded
+            .values('borrower', 'borrower__email', 'borrower__name')
+            .annotate(count=Count('id'), total_amount=Sum('amount'))
+            .order_by('-total_amount', 'borrower')[:limit]
+        )
+        moneyrequests = list(
+            funded
+            .select_related('borrower')
+            .only(
+                'id', 'title', 'amount', 'frequency', 'term', 'status', 'closed_at',
+                'borrower__id', 'borrower__email', 'borrower__name',
+            )
+            .order_by('-id')[:limit]
+        )
+        return totals, borrowers, moneyrequests
+
+    @extend_schema(
+        parameters=[OpenApiParameter('limit', OpenApiTypes.INT, description='Rows per list')],
+        responses=serializers.LenderDashboardSerializer,
+    )
+    @coalesce()
+    def get(self, request):
+        '''Return totals, accounts, top borrowers and the latest funded requests
+
+        Three queries per shard plus one whatever the number of funded
+        requests, each served by the (lender, -id) or (user, -id) index.
+        Borrowers live on one shard each, so their summaries need no merging.
+        Repeated requests of a user share one computation, see core.coalescing.
+        '''
+        limit = self.get_limit()
+        results = sharding.for_each_shard(lambda alias: self.funded_on(alias, limit))
+
+        totals = {}
+        for shard_totals, _, _ in results:
+            for name, value in shard_totals.items():
+                totals[name] = totals.get(name, 0) + value
+        borrowers = sorted(
+            itertools.chain.from_iterable(borrowers for _, borrowers, _ in results),
+            key=lambda row: (-row['total_amount'], row['borrower']),
+        )[:limit]
+        moneyrequests = list(itertools.islice(
+            heapq.merge(*(rows for _, _, rows in results), key=lambda row: -row.id),
+            limit,
+        ))
+        accounts = Account.objects.using(sharding.shard_for_user(request.user.pk)).filter(
+            user=request.user, type='LENDER',
+        ).order_by('-id')
+
+        data = {
+            'totals': totals,
+            'accounts': accounts,
+            'borrowers': borrowers,
+            'moneyrequests': moneyrequests,
+        }
+        return Response(serializers.LenderDashboardSerializer(data).data)
+
+
+class MarketplaceView(APIView):
+    '''Open money requests of every borrower, gathered from all shards'''
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('term', OpenApiTypes.INT),
+            OpenApiParameter('min_amount', OpenApiTypes.DECIMAL),
+            OpenApiParameter('max_amount', OpenApiTypes.DECIMAL),
+            OpenApiParameter('limit', OpenApiTypes.INT, description='Rows to return'),
+        ],
+        responses=serializers.MarketplaceMoneyRequestSerializer(many=True),
+    )
+    def get(self, request):
+        '''Return open requests, smallest amount first, one query per shard'''
+        filters = serializers.MarketplaceFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        params = filters.validated_data
+
+        # Served by the partial (term, amount) index on open requests
+        queryset = MoneyRequest.objects.filter(lender__isnull=True, status='OPEN')
+        if params.get('term') is not None:
+            queryset = queryset.filter(term=params['term'])
+        if params.get('min_amount') is not None:
+            queryset = queryset.filter(amount__gte=params['min_amount'])
+        if params.get('max_amount') is not None:
+            queryset = queryset.filter(amount__lte=params['max_amount'])
+        queryset = queryset.select_related('borrower').only(
+            'id', 'title', 'amount', 'frequency', 'term',
+            'borrower__id', 'borrower__name',
+        ).order_by('amount', 'id')
+
+        rows = sharding.merge_sorted(
+            queryset, key=lambda row: (row.amount, row.id), limit=params['limit'],
+        )
+        return Response(serializers.MarketplaceMoneyRequestSerializer(rows, many=True).data)
@@ -6,6 +6,8 @@ from django.utils.translation import gettext as _
 
 from rest_framework import serializers
 
+from core import audit
+
 class UserSerializer(serializers.ModelSerializer):
     '''Serializer for the user object'''
     class Meta:
@@ -26,15 +28,37 @@ class UserSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         '''Update a user, setting the password correctly and return it'''
         password = validated_data.pop('password', None)
+        before = audit.snapshot(instance)
         user = super().update(instance, validated_data)
 
         if password:
             user.set_password(password)
             user.save()
 
+        audit.record_update(
+            audit.get_actor(self.context), user, before, redacted=['password'] if password else [],
+        )
         return user
 
 
+class UserSummarySerializer(serializers.ModelSerializer):
+    '''Serializer for a public summary of a user'''
+    class Meta:
+        '''Meta class for the user summary serializer'''
+        model = get_user_model()
+        fields = ['id', 'email', 'name']
+        read_only_fields = fields
+
+
+class UserNameSerializer(serializers.ModelSerializer):
+    '''Serializer for a user shown to other users, without contact details'''
+    class Meta:
+        '''Meta class for the user name serializer'''
+        model = get_user_model()
+        fields = ['id', 'name']
+        read_only_fields = fields
+
+
 class AuthTokenSerializer(serializers.Serializer):
     '''Serializer for the user authentication object'''
     email = serializers.EmailField()
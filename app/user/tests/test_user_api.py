@@ -1,10 +1,12 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.throttling import local_store
+
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
 PROFILE_URL = reverse('user:profile')
@@ -163,4 +165,49 @@ class PrivateUserApiTests(TestCase):
         self.user.refresh_from_db()
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
-        self.assertEqual(res.status_code, status.HTTP_200_OK)
\ No newline at end of file
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+@override_settings(REST_FRAMEWORK={
+    'DEFAULT_THROTTLE_RATES': {'auth_token': '2/min', 'signup': '1/min'},
+})
+class ThrottledUserApiTests(TestCase):
+    '''Test rate limiting on the public users API'''
+    def setUp(self):
+        '''Set up the test environment'''
+        local_store.reset()
+        self.addCleanup(local_store.reset)
+        self.client = APIClient()
+
+    def test_token_requests_throttled(self):
+        '''Test that the token endpoint returns 429 with Retry-After'''
+        payload = {
+            'email': 'test@testing.com',
+            'password': 'testing*123',
+        }
+        for _ in range(2):
+            res = self.client.post(TOKEN_URL, payload)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '30')
+
+    def test_budgets_separate_per_endpoint(self):
+        '''Test that exhausting signup does not throttle token requests'''
+        payload = {
+            'email': 'tester@testing.com',
+            'password': 'testing*123',
+            'name': 'Tester',
+        }
+        self.client.post(CREATE_USER_URL, payload)
+        res = self.client.post(CREATE_USER_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        res = self.client.post(TOKEN_URL, {
+            'email': payload['email'],
+            'password': payload['password'],
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
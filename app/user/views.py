@@ -1,7 +1,10 @@
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
+from core.authentication import CachedTokenAuthentication
+from core.throttling import ScopedTokenBucketThrottle
+
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer,
@@ -11,16 +14,20 @@ from user.serializers import (
 class CreateUserView(generics.CreateAPIView):
     '''Create a new user in the system'''
     serializer_class = UserSerializer
+    throttle_classes = [ScopedTokenBucketThrottle]
+    throttle_scope = 'signup'
 
 class CreateTokenView(ObtainAuthToken):
     '''Create a new auth token for user'''
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = [ScopedTokenBucketThrottle]
+    throttle_scope = 'auth_token'
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     '''Manage the authenticated user'''
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):